@@ -1,19 +1,143 @@
+import threading
 import numpy as np
-from sklearn.ensemble import IsolationForest
+try:
+    from sklearn.ensemble import IsolationForest
+except ImportError:  # stream mode and saved (flattened) forests work without sklearn
+    IsolationForest = None
+from streaming_detector import HalfSpaceTrees, MicroBatchScorer
+from clock import SYSTEM_CLOCK
+import model_store
+
+MAX_MODEL_HISTORY = 5  # versions kept for rollback
 
 class AnomalyDetector:
-    def __init__(self):
-        self.model = IsolationForest(contamination=0.1, random_state=42)
+    def __init__(self, mode='batch', contamination=0.1, window_size=250, n_trees=25, max_depth=10, clock=None):
+        self.mode = mode  # 'batch' (IsolationForest, scored as a FlatForest) or 'stream' (Half-Space Trees)
+        self.clock = clock or SYSTEM_CLOCK
+        self.contamination = contamination
+        self.model_params = {"contamination": contamination, "random_state": 42}
+        self.model = IsolationForest(**self.model_params) if IsolationForest else None
+        self.model_version = 0  # version of the current model, follows rollbacks
+        self.version_counter = 0  # highest version handed out, so numbers are never reused
+        self.model_history = []  # [{"version", "model", "trained_at", "info", "rolled_back"}], by version
+        self.swap_lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.stream_params = {"n_trees": n_trees, "max_depth": max_depth, "window_size": window_size,
+                              "contamination": contamination}
+        self.stream_model = None
+        if mode == 'stream':
+            self.stream_model = HalfSpaceTrees(**self.stream_params)
         self.is_trained = False
+        self.batcher = MicroBatchScorer(self.score_samples)
     
     def train(self, X):
-        self.model.fit(X)
-        self.is_trained = True
+        if self.stream_model is not None:
+            self.partial_fit(X)
+            return
+        # Fit a fresh model and swap it in, scorers keep using the old one meanwhile
+        model = IsolationForest(**self.model_params)
+        model.fit(np.asarray(X, dtype=float))
+        self.swap_model(model, {"source": "train", "samples": len(X)})
+    
+    def _activate(self, model):
+        # Single reference assignment: readers see either the old or the new model
+        if self.stream_model is not None:
+            self.stream_model = model
+            self.is_trained = model.is_ready
+        else:
+            self.model = model
+            self.is_trained = True
+    
+    def swap_model(self, model, info=None):
+        """Atomically publish a fitted model (a HalfSpaceTrees in stream mode) as the new current version"""
+        if self.stream_model is None and not isinstance(model, model_store.FlatForest):
+            # Flatten once here, sklearn's per-call predict overhead dominates single-sample scoring
+            model = model_store.FlatForest.from_sklearn(model)
+        with self.swap_lock:
+            self.version_counter = max(self.version_counter, self.model_version) + 1
+            self.model_version = self.version_counter
+            self.model_history.append({
+                "version": self.model_version,
+                "model": model,
+                "trained_at": self.clock.now().isoformat(),
+                "info": info or {},
+                "rolled_back": False
+            })
+            del self.model_history[:-MAX_MODEL_HISTORY]
+            self._activate(model)
+            return self.model_version
+    
+    def rollback(self, version=None):
+        """Go back to an earlier version (default: the newest one below the current that was
+        not itself rolled back, so repeated rollbacks walk down instead of swapping back)"""
+        with self.swap_lock:
+            if version is not None:
+                candidates = [entry for entry in self.model_history
+                              if entry["version"] == version and version != self.model_version]
+            else:
+                candidates = [entry for entry in self.model_history
+                              if entry["version"] < self.model_version and not entry["rolled_back"]]
+            if not candidates:
+                raise Exception("No model version available for rollback")
+            target = max(candidates, key=lambda entry: entry["version"])
+            for entry in self.model_history:
+                if entry["version"] == self.model_version:
+                    entry["rolled_back"] = True
+            target["rolled_back"] = False
+            self._activate(target["model"])
+            # save() names the version directory after model_version
+            self.model_version = target["version"]
+            return target["version"]
+    
+    def get_versions(self):
+        """Version metadata without the model objects"""
+        return [{"version": entry["version"], "trained_at": entry["trained_at"], "info": entry["info"],
+                 "current": entry["version"] == self.model_version, "rolled_back": entry["rolled_back"]}
+                for entry in self.model_history]
+    
+    def partial_fit(self, X):
+        """Feed new feature vectors to the streaming model"""
+        if self.stream_model is None:
+            raise Exception("partial_fit requires mode='stream'")
+        self.stream_model.learn(X)
+        self.is_trained = self.stream_model.is_ready
+    
+    def score_samples(self, X):
+        """Anomaly scores, higher is more anomalous"""
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
+        X = np.asarray(X, dtype=float)
+        if self.stream_model is not None:
+            return self.stream_model.score_samples(X)
+        return -self.model.score_samples(X)
     
     def detect_anomalies(self, X):
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict(X)
+        if self.stream_model is not None:
+            return self.stream_model.predict(X)
+        return self.model.predict(np.asarray(X, dtype=float))
     
     def is_anomaly(self, x):
-        return self.detect_anomalies([x])[0] == -1
\ No newline at end of file
+        """Single-sample check, scored together with concurrent callers through the micro-batcher"""
+        model = self.stream_model if self.stream_model is not None else self.model
+        score = self.batcher.score(np.asarray(x, dtype=float).ravel())
+        if self.stream_model is not None:
+            return score > model.threshold
+        return score > -model.offset_  # sklearn's predict: score_samples < offset_
+    
+    def save(self, directory=model_store.MODEL_DIR):
+        """Persist the current model (tree arrays as .npy files)"""
+        with self.save_lock:
+            return model_store.save_detector(self, directory)
+    
+    @classmethod
+    def load(cls, directory=model_store.MODEL_DIR, mode='batch', **kwargs):
+        """Cold start from disk, the tree arrays are memory-mapped instead of unpickled"""
+        detector = cls(mode=mode, **kwargs)
+        model_store.load_into(detector, directory)
+        return detector
+    
+    def submit(self, x):
+        """Score one sample through the micro-batching queue, returns a Future"""
+        return self.batcher.submit(x)
@@ -0,0 +1,269 @@
+"""Optional asyncio runtime: firewall, honeypot and dashboard served from one event loop.
+
+    python async_runtime.py [--host 0.0.0.0] [--dashboard-port 5000] [--honeypot-port 8080]
+
+Needs uvicorn (pip install uvicorn, a2wsgi is used for the WSGI apps when installed).
+Socket.IO runs on a python-socketio AsyncServer, so a connected viewer is a coroutine
+rather than a server thread; the dashboard's flask-socketio handlers and emits are bridged
+onto it unchanged. The supervisor's periodic tasks (status ticks, traffic generator,
+firewall monitoring, ML analysis) and the rotation timer run as loop callbacks. Flask
+routes stay WSGI and run on a bounded thread pool, and work that blocks or burns CPU
+(attack simulations, feature window scoring) keeps its bounded supervisor pools.
+"""
+import asyncio
+import logging
+import argparse
+
+import socketio
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    try:
+        from uvicorn.middleware.wsgi import WSGIMiddleware
+    except ImportError:
+        WSGIMiddleware = None
+
+from supervisor import Supervisor, Task
+from rotation_scheduler import TimerHandle
+from firewall_backends import SimulatedBackend, SSH_PORT, add_backend_arguments, backend_from_args
+
+logger = logging.getLogger(__name__)
+
+
+class LoopTimer:
+    """TimerWheel interface on an asyncio loop: every timer fires as a loop callback"""
+
+    def __init__(self, loop, pool=None, retry_delay=1.0):
+        self.loop = loop
+        self.pool = pool  # WorkerPool that runs the callbacks instead of the loop, for blocking ones
+        self.retry_delay = retry_delay
+
+    def schedule(self, delay, callback, *args):
+        """Run callback(*args) after `delay` seconds, from any thread; returns a TimerHandle"""
+        handle = TimerHandle(callback, args, None)
+        self.loop.call_soon_threadsafe(self.loop.call_later, max(0.0, delay), self._fire, handle)
+        return handle
+
+    def reschedule(self, handle, delay):
+        """Cancel a timer and schedule its callback again, returns the new handle"""
+        if handle is not None:
+            handle.cancel()
+            return self.schedule(delay, handle.callback, *handle.args)
+        return None
+
+    def _fire(self, handle):
+        if handle.cancelled:
+            return
+        if self.pool is not None:
+            name = getattr(handle.callback, '__qualname__', 'timer')
+            if self.pool.submit(name, handle.callback, *handle.args) is None:
+                # Pool full: try again shortly rather than dropping the timer
+                self.loop.call_later(self.retry_delay, self._fire, handle)
+            return
+        try:
+            handle.callback(*handle.args)
+        except Exception as e:
+            logger.error(f"Error in timer callback {handle.callback}: {e}")
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class LoopPool:
+    """WorkerPool interface whose tasks run one at a time on the loop itself, for short non-blocking work"""
+
+    def __init__(self, supervisor, name):
+        self.supervisor = supervisor
+        self.name = name
+        self.loop = supervisor.loop
+        self.queued = 0
+        self.is_running = True
+
+    def submit(self, name, func, *args, cancellable=False, **kwargs):
+        """Queue func(*args, **kwargs) on the loop; None once the pool is stopped"""
+        if not self.is_running:
+            return None
+        task = Task(name, func, args, kwargs, cancellable)
+        self.queued += 1
+        self.loop.call_soon_threadsafe(self._run, task)
+        return task
+
+    def _run(self, task):
+        self.queued -= 1
+        if not self.is_running:
+            task.cancel()
+        self.supervisor.run_task(task)
+
+    def stop(self, timeout=1.0):
+        self.is_running = False
+
+    def get_stats(self):
+        return {
+            "workers": 0,
+            "max_workers": 0,
+            "busy": 0,
+            "queued": max(0, self.queued),
+            "max_queue": 0,
+            "rejected": 0,
+            "on_loop": True
+        }
+
+
+class LoopSupervisor(Supervisor):
+    """Supervisor whose timer and periodic tasks run on an asyncio loop.
+
+    Pools created with pool() are still thread pools, for work that blocks or burns CPU.
+    """
+
+    def __init__(self, loop, name="loop-supervisor", clock=None):
+        super().__init__(name, clock)
+        self.loop = loop
+        self.wheel = LoopTimer(loop)
+        self.pools["periodic"] = LoopPool(self, "periodic")
+
+
+class SocketIOBridge:
+    """Stands in for flask-socketio's server: emits and room changes made by the dashboard,
+    on the loop or from any thread, are scheduled on the AsyncServer"""
+
+    def __init__(self, server, loop, app):
+        self.server = server
+        self.loop = loop
+        self.app = app  # flask-socketio runs the handlers in this app's request context
+        self.eio = server.eio
+        self.async_mode = server.async_mode
+        self.pending = set()
+
+    def _schedule(self, coroutine):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            task = self.loop.create_task(coroutine)
+            self.pending.add(task)
+            task.add_done_callback(self.pending.discard)
+        else:
+            asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def emit(self, event, data=None, to=None, room=None, skip_sid=None, namespace=None, callback=None, **kwargs):
+        self._schedule(self.server.emit(event, data, to=to or room, skip_sid=skip_sid, namespace=namespace,
+                                        callback=callback))
+
+    def enter_room(self, sid, room, namespace=None):
+        self._schedule(self.server.enter_room(sid, room, namespace=namespace))
+
+    def leave_room(self, sid, room, namespace=None):
+        self._schedule(self.server.leave_room(sid, room, namespace=namespace))
+
+    def close_room(self, room, namespace=None):
+        self._schedule(self.server.close_room(room, namespace=namespace))
+
+    def disconnect(self, sid, namespace=None):
+        self._schedule(self.server.disconnect(sid, namespace=namespace))
+
+    def rooms(self, sid, namespace=None):
+        return self.server.rooms(sid, namespace=namespace)
+
+    def get_environ(self, sid, namespace=None):
+        environ = self.server.get_environ(sid, namespace=namespace)
+        if environ is not None:
+            environ.setdefault('flask.app', self.app)
+        return environ
+
+
+def bridge_socketio(flask_socketio, server, loop, app):
+    """Register the flask-socketio handlers on `server` and route flask-socketio's emits to it"""
+    for namespace, handlers in flask_socketio.server.handlers.items():
+        for event, handler in handlers.items():
+            server.on(event, handler, namespace=namespace)
+    flask_socketio.server = SocketIOBridge(server, loop, app)
+    return flask_socketio.server
+
+
+class AsyncRuntime:
+    """Runs the components of the dashboard mode as tasks on one event loop"""
+
+    def __init__(self, host='0.0.0.0', dashboard_port=5000, honeypot_port=8080, wsgi_workers=10, backend=None):
+        if uvicorn is None or WSGIMiddleware is None:
+            raise Exception("The asyncio runtime needs uvicorn: pip install uvicorn")
+        self.host = host
+        self.dashboard_port = dashboard_port
+        self.honeypot_port = honeypot_port
+        self.wsgi_workers = wsgi_workers  # threads for the Flask routes of each app
+        self.backend = backend
+        self.supervisor = None
+        self.firewall = None
+        self.servers = []
+
+    def build(self, loop):
+        """Create the components on `loop`, returns the (dashboard, honeypot) ASGI apps"""
+        import dashboard
+        from firewall_engine import DynamicFirewall
+        from honeypot_service import HoneypotService
+        from attack_simulator import AttackSimulator
+
+        self.supervisor = LoopSupervisor(loop)
+        server = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins="*")
+        bridge_socketio(dashboard.socketio, server, loop, dashboard.app)
+
+        self.firewall = DynamicFirewall(dashboard.socketio, backend=self.backend, supervisor=self.supervisor)
+        honeypot = HoneypotService(dashboard.socketio)
+        # Rules on a real backend are applied by shelling out to nft/iptables, keep that off the loop
+        pool = None
+        if not isinstance(self.firewall.backend, SimulatedBackend):
+            pool = self.supervisor.pool("firewall.rotation", max_workers=1, max_queue=4)
+        self.firewall.start_rotation(wheel=LoopTimer(loop, pool))
+        dashboard.prepare_dashboard(self.firewall, honeypot, AttackSimulator(f"http://localhost:{self.honeypot_port}"),
+                                    supervisor_instance=self.supervisor)
+
+        dashboard_app = socketio.ASGIApp(server, other_asgi_app=WSGIMiddleware(dashboard.app, workers=self.wsgi_workers))
+        honeypot_app = WSGIMiddleware(honeypot.app, workers=self.wsgi_workers)
+        return dashboard_app, honeypot_app
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        dashboard_app, honeypot_app = self.build(loop)
+        self.servers = [
+            uvicorn.Server(uvicorn.Config(app, host=self.host, port=port, lifespan="off", log_level="warning"))
+            for app, port in ((dashboard_app, self.dashboard_port), (honeypot_app, self.honeypot_port))
+        ]
+        logger.info(f"Starting dashboard on {self.host}:{self.dashboard_port} and honeypot on "
+                    f"{self.host}:{self.honeypot_port} (asyncio runtime)")
+        tasks = [asyncio.ensure_future(server.serve()) for server in self.servers]
+        try:
+            # Either server stopping (signal or bind error) stops the runtime
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.stop()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        for server in self.servers:
+            server.should_exit = True
+        if self.firewall:
+            self.firewall.stop_rotation()
+        if self.supervisor:
+            self.supervisor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the firewall, honeypot and dashboard from one asyncio loop")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--dashboard-port", type=int, default=5000)
+    parser.add_argument("--honeypot-port", type=int, default=8080)
+    parser.add_argument("--wsgi-workers", type=int, default=10, help="threads serving the Flask routes of each app")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    backend = backend_from_args(args, honeypot_port=args.honeypot_port,
+                                always_allow=(SSH_PORT, args.dashboard_port, args.honeypot_port))
+    asyncio.run(AsyncRuntime(args.host, args.dashboard_port, args.honeypot_port, args.wsgi_workers, backend).serve())
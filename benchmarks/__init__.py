@@ -0,0 +1,7 @@
+"""Benchmarks for the firewall, honeypot and dashboard.
+
+Run from the repository root: `python -m benchmarks` (micro + full stack),
+`python -m benchmarks micro --scale 10k,1m,10m`, `python -m benchmarks stack --scenario all`,
+`python -m benchmarks soak --hours 24 --budget firewall=128` (memory growth on a virtual clock)
+or `python -m benchmarks compare old.json new.json`. Results are written as JSON.
+"""
@@ -0,0 +1,151 @@
+import sys
+import argparse
+import logging
+
+from benchmarks.harness import parse_scales, environment, save_results, load_results
+from benchmarks.micro import MICRO_BENCHMARKS, run_micro
+from benchmarks.stack import SCENARIOS, run_stack, format_stack
+from benchmarks.compare import compare, format_comparison
+from benchmarks.soak import COMPONENTS, parse_budgets, run_soak, format_soak
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Microbenchmarks and full-stack load scenarios")
+    commands = parser.add_subparsers(dest="command")
+
+    def add_output(command):
+        command.add_argument("--output", help="results JSON path (default: benchmark_results/<commit>-<time>.json)")
+        command.add_argument("--baseline", help="results JSON to compare against after the run")
+        command.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+
+    def add_micro(command):
+        command.add_argument("--scale", default="10k,1m", help="comma separated: 10k, 1m, 10m or event counts")
+        command.add_argument("--only", help="comma separated benchmark names (see `list`)")
+        command.add_argument("--max-seconds", type=float, default=60, help="time budget per benchmark and scale")
+        command.add_argument("--max-rss-mb", type=int, help="stop a benchmark above this RSS (default 75%% of RAM)")
+        command.add_argument("--with-logging", action="store_true", help="keep per-attack warning logs enabled")
+
+    def add_stack(command):
+        command.add_argument("--scenario", default="full", choices=list(SCENARIOS) + ["all"])
+        command.add_argument("--duration", type=float, default=20)
+        command.add_argument("--http-workers", type=int, default=4, help="honeypot load threads")
+        command.add_argument("--pollers", type=int, default=2, help="dashboard REST pollers")
+        command.add_argument("--poll-interval", type=float, default=1.0)
+        command.add_argument("--clients", type=int, default=10, help="simulated Socket.IO viewers")
+        command.add_argument("--compact-share", type=float, default=0.5, help="share of viewers on the compact format")
+        command.add_argument("--firewall-rate", type=int, default=50, help="check_access events/s in the dashboard")
+        command.add_argument("--keep-rate-limits", action="store_true")
+
+    micro = commands.add_parser("micro", help="microbenchmarks at 10k/1m/10m events")
+    add_micro(micro)
+    add_output(micro)
+    stack = commands.add_parser("stack", help="local honeypot/dashboard processes under load")
+    add_stack(stack)
+    add_output(stack)
+    everything = commands.add_parser("all", help="micro then stack (the default)")
+    add_micro(everything)
+    add_stack(everything)
+    add_output(everything)
+    soak = commands.add_parser("soak", help="hours of simulated traffic on a virtual clock, memory budgets")
+    soak.add_argument("--hours", type=float, default=6, help="simulated hours")
+    soak.add_argument("--sample-minutes", type=float, default=60, help="simulated minutes between memory samples")
+    soak.add_argument("--firewall-rate", type=float, default=2, help="check_access events per simulated second")
+    soak.add_argument("--honeypot-rate", type=float, default=0.5, help="honeypot requests per simulated second")
+    soak.add_argument("--new-source-share", type=float, default=0.2, help="share of events from never seen addresses")
+    soak.add_argument("--status-interval", type=int, default=60, help="simulated seconds between history snapshots")
+    soak.add_argument("--budget", action="append", metavar="COMPONENT=MB",
+                      help=f"traced memory budget, repeatable ({', '.join(COMPONENTS)})")
+    soak.add_argument("--max-rss-mb", type=float, help="fail above this process RSS")
+    soak.add_argument("--top", type=int, default=10, help="growing allocation sites to report")
+    soak.add_argument("--frames", type=int, default=1, help="tracemalloc traceback depth")
+    soak.add_argument("--seed", type=int, default=23)
+    soak.add_argument("--threaded", action="store_true",
+                      help="run the rotation, monitoring and feature window threads on the virtual clock")
+    soak.add_argument("--output", help="results JSON path (default: benchmark_results/<commit>-<time>.json)")
+    soak.add_argument("--with-logging", action="store_true", help="keep per-attack warning logs enabled")
+    diff = commands.add_parser("compare", help="compare two results files")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=10.0)
+    commands.add_parser("list", help="list benchmarks and scenarios")
+    return parser
+
+
+def run_stack_scenarios(args):
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = []
+    for scenario in scenarios:
+        result = run_stack(scenario, duration=args.duration, http_workers=args.http_workers, pollers=args.pollers,
+                           poll_interval=args.poll_interval, clients=args.clients,
+                           compact_share=args.compact_share, firewall_rate=args.firewall_rate,
+                           keep_rate_limits=args.keep_rate_limits)
+        print(format_stack(result))
+        results.append(result)
+    return results
+
+
+def report_comparison(baseline_path, current, threshold):
+    baseline = load_results(baseline_path)
+    rows = compare(baseline, current, threshold)
+    print(format_comparison(rows, baseline, current))
+    return 1 if any(row["verdict"] == "regression" for row in rows) else 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    argv = sys.argv[1:] if argv is None else argv
+    sys.stdout.reconfigure(line_buffering=True)  # progress lines while long runs are piped or logged
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(["all"] + argv)
+
+    if args.command == "list":
+        print("Microbenchmarks:")
+        for name in MICRO_BENCHMARKS:
+            print(f"  {name}")
+        print("Stack scenarios:")
+        for name, config in SCENARIOS.items():
+            print(f"  {name}: {', '.join(process for process, enabled in config.items() if enabled)}")
+        return 0
+    if args.command == "compare":
+        return report_comparison(args.baseline, load_results(args.current), args.threshold)
+    if args.command == "soak":
+        try:
+            budgets = parse_budgets(args.budget)
+        except Exception as e:
+            parser.error(str(e))
+        if not args.with_logging:
+            logging.disable(logging.WARNING)
+        result = run_soak(hours=args.hours, sample_minutes=args.sample_minutes, firewall_rate=args.firewall_rate,
+                          honeypot_rate=args.honeypot_rate, new_source_share=args.new_source_share,
+                          status_interval=args.status_interval, budgets=budgets, max_rss_mb=args.max_rss_mb,
+                          top=args.top, frames=args.frames, seed=args.seed, threaded=args.threaded)
+        print(format_soak(result))
+        path = save_results({"environment": environment(), "soak": result}, args.output)
+        print(f"Results written to {path}")
+        return 0 if result["passed"] else 1
+
+    results = {"environment": environment()}
+    if args.command in ("micro", "all"):
+        if not args.with_logging:
+            # log_attack warns once per event, the console would dominate the measurement
+            logging.disable(logging.WARNING)
+        names = [name.strip() for name in args.only.split(",")] if args.only else None
+        unknown = [name for name in names or [] if name not in MICRO_BENCHMARKS]
+        if unknown:
+            parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+        results["micro"] = run_micro(parse_scales(args.scale), names, args.max_seconds, args.max_rss_mb)
+        logging.disable(logging.NOTSET)
+    if args.command in ("stack", "all"):
+        results["stack"] = run_stack_scenarios(args)
+
+    path = save_results(results, args.output)
+    print(f"Results written to {path}")
+    if args.baseline:
+        return report_comparison(args.baseline, results, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
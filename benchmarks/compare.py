@@ -0,0 +1,62 @@
+# metric -> True when a higher value is better
+MICRO_METRICS = {"ns_per_op": False, "p99_ns": False}
+STACK_METRICS = {"rps": True, "p99_ms": False}
+SOCKET_METRICS = {"bytes_per_client_per_sec": False}
+
+
+def _row(benchmark, metric, old, new, higher_is_better, threshold):
+    if old in (None, 0) or new is None:
+        return None
+    change = (new - old) / old * 100.0
+    worse = -change if higher_is_better else change
+    verdict = "regression" if worse > threshold else "improvement" if worse < -threshold else "same"
+    return {"benchmark": benchmark, "metric": metric, "baseline": old, "current": new,
+            "change_percent": round(change, 1), "verdict": verdict}
+
+
+def compare(baseline, current, threshold=10.0):
+    """Metric-by-metric rows for everything present in both result documents"""
+    rows = []
+    base_micro = {(r["name"], r["scale"]): r for r in baseline.get("micro", []) if "skipped" not in r}
+    for result in current.get("micro", []):
+        old = base_micro.get((result["name"], result["scale"]))
+        if old is None or "skipped" in result:
+            continue
+        for metric, higher in MICRO_METRICS.items():
+            rows.append(_row(f"{result['name']} @ {result['scale']}", metric, old.get(metric), result.get(metric),
+                             higher, threshold))
+
+    base_stack = {s["scenario"]: s for s in baseline.get("stack", [])}
+    for scenario in current.get("stack", []):
+        old = base_stack.get(scenario["scenario"])
+        if old is None:
+            continue
+        for endpoint, stats in scenario["endpoints"].items():
+            old_stats = old["endpoints"].get(endpoint)
+            if old_stats is None:
+                continue
+            for metric, higher in STACK_METRICS.items():
+                rows.append(_row(f"{scenario['scenario']}: {endpoint}", metric, old_stats.get(metric),
+                                 stats.get(metric), higher, threshold))
+        for label, stats in scenario.get("socketio", {}).items():
+            old_stats = old.get("socketio", {}).get(label)
+            if old_stats is None:
+                continue
+            for metric, higher in SOCKET_METRICS.items():
+                rows.append(_row(f"{scenario['scenario']}: socket.io {label}", metric, old_stats.get(metric),
+                                 stats.get(metric), higher, threshold))
+    return [row for row in rows if row is not None]
+
+
+def format_comparison(rows, baseline=None, current=None):
+    lines = []
+    if baseline is not None and current is not None:
+        lines.append(f"Baseline {baseline.get('environment', {}).get('commit')} -> "
+                     f"current {current.get('environment', {}).get('commit')}")
+    for row in rows:
+        marker = {"regression": "!!", "improvement": "++", "same": "  "}[row["verdict"]]
+        lines.append(f"{marker} {row['benchmark']:55} {row['metric']:26} {row['baseline']:>14,.1f} -> "
+                     f"{row['current']:>14,.1f}  {row['change_percent']:+.1f}%")
+    regressions = sum(1 for row in rows if row["verdict"] == "regression")
+    lines.append(f"{len(rows)} metrics compared, {regressions} regressions")
+    return "\n".join(lines)
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from datetime import datetime
+from process_metrics import PAGE_SIZE, CLOCK_TICKS, _read_mem_total_kb
+
+SCALES = {'10k': 10000, '1m': 1000000, '10m': 10000000}
+RESULTS_DIR = "benchmark_results"
+
+
+def parse_scales(text):
+    """'10k,1m' -> [('10k', 10000), ('1m', 1000000)]; plain integers are accepted too"""
+    scales = []
+    for item in text.split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if item in SCALES:
+            scales.append((item, SCALES[item]))
+        else:
+            scales.append((item, int(item)))
+    return scales
+
+
+def read_process(pid="self"):
+    """(cpu_seconds, rss_bytes) of a process from /proc, (0, 0) where unavailable"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            data = f.read()
+    except OSError:
+        return 0.0, 0
+    fields = data[data.rindex(b')') + 2:].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, int(fields[21]) * PAGE_SIZE
+
+
+def default_max_rss_mb():
+    """Stop a benchmark before it takes 75% of the machine's memory"""
+    total_kb = _read_mem_total_kb()
+    return int(total_kb * 0.75 / 1024) if total_kb else 4096
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+class Benchmark:
+    """One microbenchmark: setup() builds fresh state, run(start, stop) executes operations [start, stop).
+
+    Stateful benchmarks (e.g. get_status) first grow their state to `events` with
+    fill(start, stop) and then time `calls` operations on it.
+    """
+
+    name = None
+    stateful = False
+    calls = 100  # operations timed by stateful benchmarks
+    chunk_size = 1000
+
+    def available(self):
+        """None if the benchmark can run here, otherwise the reason it is skipped"""
+        return None
+
+    def setup(self, events):
+        pass
+
+    def fill(self, start, stop):
+        pass
+
+    def run(self, start, stop):
+        raise NotImplementedError
+
+    def teardown(self):
+        pass
+
+
+def drive(step, total, chunk_size, deadline, max_rss):
+    """Call step() over [0, total) in chunks.
+
+    Returns (done, timed seconds, per-op seconds of each chunk, stop reason or None).
+    """
+    done = 0
+    elapsed = 0.0
+    timings = []
+    while done < total:
+        if time.perf_counter() > deadline:
+            return done, elapsed, timings, "time"
+        if read_process()[1] > max_rss:
+            return done, elapsed, timings, "memory"
+        stop = min(total, done + chunk_size)
+        start = time.perf_counter()
+        step(done, stop)
+        seconds = time.perf_counter() - start
+        elapsed += seconds
+        timings.append(seconds / (stop - done))
+        done = stop
+    return done, elapsed, timings, None
+
+
+def run_benchmark(bench, scale, events, max_seconds=60, max_rss_mb=None):
+    """Run one benchmark at one scale and return its result dict"""
+    result = {"name": bench.name, "scale": scale, "events": events}
+    reason = bench.available()
+    if reason:
+        result["skipped"] = reason
+        return result
+    max_rss = (max_rss_mb or default_max_rss_mb()) * 1024 * 1024
+    rss_before = read_process()[1]
+    cpu_before = time.process_time()
+    deadline = time.perf_counter() + max_seconds
+    bench.setup(events)
+    try:
+        if bench.stateful:
+            filled, _, _, truncated = drive(bench.fill, events, bench.chunk_size, deadline, max_rss)
+            result["state_events"] = filled
+            # The timed calls get their own budget, filling may have used all of it
+            done, elapsed, timings, call_truncated = drive(bench.run, bench.calls, 1,
+                                                           time.perf_counter() + max_seconds, max_rss)
+            truncated = truncated or call_truncated
+        else:
+            done, elapsed, timings, truncated = drive(bench.run, events, bench.chunk_size, deadline, max_rss)
+        result.update({
+            "operations": done,
+            "seconds": round(elapsed, 6),
+            "ops_per_sec": round(done / elapsed, 2) if elapsed else None,
+            "ns_per_op": round(elapsed / done * 1e9, 1) if done else None,
+            "p50_ns": round(percentile(timings, 50) * 1e9, 1) if timings else None,
+            "p99_ns": round(percentile(timings, 99) * 1e9, 1) if timings else None,
+            "cpu_seconds": round(time.process_time() - cpu_before, 3),
+            "rss_growth_mb": round((read_process()[1] - rss_before) / 1048576, 1),
+            "truncated": truncated
+        })
+    finally:
+        bench.teardown()
+    return result
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, timeout=30)
+        if commit.returncode != 0:
+            return None
+        return commit.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "memory_mb": _read_mem_total_kb() // 1024
+    }
+
+
+def save_results(results, path=None):
+    """Write a results document; the default name is <commit>-<time>.json under benchmark_results/"""
+    if path is None:
+        env = results.get("environment", {})
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{env.get('commit') or 'nocommit'}-{stamp}.json")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,224 @@
+import random
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from benchmarks.harness import Benchmark, run_benchmark
+from firewall_engine import DynamicFirewall
+from ml_security import MLSecurityAnalyzer
+from anomaly_detector import AnomalyDetector, IsolationForest
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 1 << 16  # workload pools are powers of two so the hot loops can mask the index
+
+
+def ip_pool(size=POOL_SIZE, seed=7):
+    """Source addresses: a few scanning /24s, a long tail of single hosts and some IPv6"""
+    rng = random.Random(seed)
+    hot_subnets = [f"203.0.{rng.randrange(256)}" for _ in range(8)]
+    pool = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.3:
+            pool.append(f"{rng.choice(hot_subnets)}.{rng.randrange(1, 255)}")
+        elif roll < 0.95:
+            pool.append(f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}")
+        else:
+            pool.append(f"2001:db8:{rng.randrange(65536):x}::{rng.randrange(1, 65536):x}")
+    return pool
+
+
+def port_pool(ports, size=4096, seed=11):
+    rng = random.Random(seed)
+    return [rng.choice(ports) for _ in range(size)]
+
+
+def request_pool(size=1024, seed=13):
+    """Honeypot-style requests for MLSecurityAnalyzer: mostly benign, some SQLi/XSS/long paths"""
+    rng = random.Random(seed)
+    benign = ["/", "/login", "/api/users", "/static/app.js", "/admin", "/api/status?page=2"]
+    hostile = ["/search?q=1 UNION SELECT password FROM users", "/item?id=1;drop table sql",
+               "/comment?text=<script>alert(1)</script>", "/" + "a" * 150]
+    pool = []
+    for _ in range(size):
+        path = rng.choice(hostile) if rng.random() < 0.2 else rng.choice(benign)
+        method = rng.choice(("GET", "GET", "POST"))
+        params = {f"p{i}": "x" for i in range(rng.choice((0, 2, 12)))}
+        pool.append({"path": path, "method": method, "params": params})
+    return pool
+
+
+def feature_pool(size=4096, seed=17):
+    """4-feature traffic vectors (request_rate, error_ratio, unique_ports, path_entropy), 5% outliers"""
+    rng = np.random.default_rng(seed)
+    normal = np.column_stack([rng.normal(20, 5, size), rng.beta(2, 20, size),
+                              rng.poisson(3, size), rng.normal(2.5, 0.5, size)])
+    outliers = rng.random(size) < 0.05
+    normal[outliers] *= rng.uniform(3, 8, (int(outliers.sum()), 1))
+    return normal
+
+
+class CheckAccessBenchmark(Benchmark):
+    """DynamicFirewall.check_access with 5 of 15 ports open: about two thirds take the attack path"""
+
+    name = "firewall.check_access"
+
+    def setup(self, events):
+        self.firewall = DynamicFirewall()
+        self.firewall.current_open_ports = self.firewall.ports[:5]
+        self.ips = ip_pool()
+        self.ports = port_pool(self.firewall.ports)
+
+    def run(self, start, stop):
+        check = self.firewall.check_access
+        ips, ports = self.ips, self.ports
+        ip_mask, port_mask = len(ips) - 1, len(ports) - 1
+        for i in range(start, stop):
+            check(ips[i & ip_mask], ports[i & port_mask])
+
+    def teardown(self):
+        self.firewall = None
+
+
+class LogAttackBenchmark(Benchmark):
+    name = "firewall.log_attack"
+
+    def setup(self, events):
+        self.firewall = DynamicFirewall()
+        self.ips = ip_pool()
+        self.ports = port_pool(self.firewall.ports)
+        self.types = [self.firewall._classify_attack(port) for port in self.ports]
+
+    def run(self, start, stop):
+        log_attack = self.firewall.log_attack
+        ips, ports, types = self.ips, self.ports, self.types
+        ip_mask, port_mask = len(ips) - 1, len(ports) - 1
+        for i in range(start, stop):
+            log_attack(ips[i & ip_mask], ports[i & port_mask], types[i & port_mask])
+
+    def teardown(self):
+        self.firewall = None
+
+
+class GetStatusBenchmark(Benchmark):
+    """DynamicFirewall.get_status over an attack log of `events` entries, half of them recent"""
+
+    name = "firewall.get_status"
+    stateful = True
+    calls = 20
+
+    def setup(self, events):
+        self.firewall = DynamicFirewall()
+        self.ips = ip_pool()
+        self.ports = port_pool(self.firewall.ports)
+        now = datetime.now()
+        # Shared timestamp strings spread over the last 20 minutes, like log_attack would leave them
+        self.timestamps = [(now - timedelta(seconds=s)).isoformat() for s in range(0, 1200, 1200 // 1024)][:1024]
+
+    def fill(self, start, stop):
+        firewall = self.firewall
+        attack_log, suspicious = firewall.attack_log, firewall.suspicious_ips
+        ips, ports, stamps = self.ips, self.ports, self.timestamps
+        ip_mask, port_mask, stamp_mask = len(ips) - 1, len(ports) - 1, len(stamps) - 1
+        for i in range(start, stop):
+            ip, port, stamp = ips[i & ip_mask], ports[i & port_mask], stamps[i & stamp_mask]
+            attack_type = firewall._classify_attack(port)
+            attack_log.append({"timestamp": stamp, "ip": ip, "port": port, "type": attack_type, "action": "blocked",
+                               "severity": firewall._assess_severity(attack_type), "threat_level": 0})
+            entry = suspicious.get(ip)
+            if entry is None:
+                if len(suspicious) < firewall.max_suspicious_ips:
+                    suspicious[ip] = {"count": 1, "first_seen": stamp, "last_seen": stamp}
+            else:
+                entry["count"] += 1
+                entry["last_seen"] = stamp
+
+    def run(self, start, stop):
+        for _ in range(start, stop):
+            self.firewall.get_status()
+
+    def teardown(self):
+        self.firewall = None
+
+
+class AnalyzeRequestBenchmark(Benchmark):
+    name = "ml.analyze_request"
+
+    def setup(self, events):
+        self.analyzer = MLSecurityAnalyzer()
+        self.requests = request_pool()
+
+    def run(self, start, stop):
+        analyze = self.analyzer.analyze_request
+        requests = self.requests
+        mask = len(requests) - 1
+        for i in range(start, stop):
+            analyze(requests[i & mask])
+
+
+class IsAnomalyBenchmark(Benchmark):
+    """AnomalyDetector.is_anomaly, one sample per call, on a model trained with 2000 vectors"""
+
+    chunk_size = 1000
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.name = f"anomaly.is_anomaly[{mode}]"
+
+    def available(self):
+        if self.mode == 'batch' and IsolationForest is None:
+            return "scikit-learn is not installed"
+        return None
+
+    def setup(self, events):
+        self.detector = AnomalyDetector(mode=self.mode)
+        self.detector.train(feature_pool(2000, seed=19))
+        self.samples = list(feature_pool())
+
+    def run(self, start, stop):
+        is_anomaly = self.detector.is_anomaly
+        samples = self.samples
+        mask = len(samples) - 1
+        for i in range(start, stop):
+            is_anomaly(samples[i & mask])
+
+    def teardown(self):
+        self.detector.batcher.stop()
+        self.detector = None
+
+
+MICRO_BENCHMARKS = {bench.name: bench for bench in (
+    CheckAccessBenchmark(),
+    LogAttackBenchmark(),
+    GetStatusBenchmark(),
+    AnalyzeRequestBenchmark(),
+    IsAnomalyBenchmark('stream'),
+    IsAnomalyBenchmark('batch')
+)}
+
+
+def run_micro(scales, names=None, max_seconds=60, max_rss_mb=None, report=print):
+    """Run the selected microbenchmarks at every scale, smallest first"""
+    results = []
+    for name in names or list(MICRO_BENCHMARKS):
+        bench = MICRO_BENCHMARKS[name]
+        for scale, events in scales:
+            result = run_benchmark(bench, scale, events, max_seconds, max_rss_mb)
+            results.append(result)
+            report(format_result(result))
+    return results
+
+
+def format_result(result):
+    label = f"{result['name']} @ {result['scale']}"
+    if "skipped" in result:
+        return f"{label:45} skipped: {result['skipped']}"
+    line = (f"{label:45} {result['ns_per_op'] or 0:>12,.0f} ns/op  p99 {result['p99_ns'] or 0:>12,.0f} ns"
+            f"  {result['operations']:>10,} ops  rss +{result['rss_growth_mb']} MB")
+    if result.get("state_events") is not None:
+        line += f"  state {result['state_events']:,}"
+    if result.get("truncated"):
+        line += f"  (stopped early: {result['truncated']})"
+    return line
@@ -0,0 +1,313 @@
+import os
+import time
+import random
+import logging
+import tracemalloc
+
+from benchmarks.harness import read_process
+from benchmarks.micro import ip_pool, port_pool
+from benchmarks.stack import HONEYPOT_REQUESTS
+from clock import VirtualClock, SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# component -> source files whose live allocations are charged to it
+COMPONENTS = {
+    "firewall": ("firewall_engine.py", "ip_index.py", "firewall_backends.py", "rotation_scheduler.py"),
+    "honeypot": ("honeypot_service.py", "rate_limiter.py", "helpers.py"),
+    "dashboard": ("dashboard.py", "response_cache.py", "topic_hub.py", "wire_format.py"),
+    "ml": ("feature_pipeline.py", "anomaly_detector.py", "pattern_predictor.py", "streaming_detector.py")
+}
+DEFAULT_BUDGETS_MB = {"firewall": 64, "honeypot": 32, "dashboard": 32, "ml": 16}
+WEEK_HOURS = 168
+
+
+def parse_budgets(items):
+    """['firewall=128', 'ml=8'] -> defaults updated with those MB budgets"""
+    budgets = dict(DEFAULT_BUDGETS_MB)
+    for item in items or []:
+        name, _, value = item.partition("=")
+        if name not in COMPONENTS or not value:
+            raise Exception(f"Budget must be <component>=<MB> with component one of {', '.join(COMPONENTS)}: {item}")
+        budgets[name] = float(value)
+    return budgets
+
+
+def _file_components():
+    return {os.path.join(REPO_ROOT, filename): component
+            for component, filenames in COMPONENTS.items() for filename in filenames}
+
+
+def _site(filename, lineno):
+    """Repository-relative path, or the last two path components for library code"""
+    if filename.startswith(REPO_ROOT + os.sep):
+        return f"{os.path.relpath(filename, REPO_ROOT)}:{lineno}"
+    parent, name = os.path.split(filename)
+    return f"{os.path.basename(parent)}/{name}:{lineno}"
+
+
+def _slope(points):
+    """Least-squares slope of [(x, y), ...], 0 with fewer than two points"""
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if not spread:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+class SoakRun:
+    """Firewall, honeypot, dashboard history and feature pipeline wired together on one VirtualClock.
+
+    By default nothing runs on background threads: step() plays one simulated second of
+    traffic and fires the periodic work (feature windows, rotations, status snapshots) that
+    is due. With `threaded` the rotation scheduler, supervisor tasks and feature window
+    threads run for real and the clock is driven with run_for().
+    """
+
+    def __init__(self, firewall_rate=2.0, honeypot_rate=0.5, new_source_share=0.2, status_interval=60,
+                 seed=23, threaded=False):
+        import dashboard
+        from firewall_engine import DynamicFirewall
+        from honeypot_service import HoneypotService
+        from feature_pipeline import FeaturePipeline
+        from anomaly_detector import AnomalyDetector
+        from pattern_predictor import PatternPredictor
+
+        self.clock = VirtualClock()
+        self.rng = random.Random(seed)
+        random.seed(seed)  # the components draw from the module-level generator
+        self.threaded = threaded
+        self.firewall_rate = firewall_rate
+        self.honeypot_rate = honeypot_rate
+        self.new_source_share = new_source_share
+        self.status_interval = status_interval
+
+        self.firewall = DynamicFirewall(clock=self.clock)
+        self.firewall.current_open_ports = self.firewall.ports[:5]
+        self.honeypot = HoneypotService(clock=self.clock)
+        self.client = self.honeypot.app.test_client()
+        self.pipeline = FeaturePipeline(detector=AnomalyDetector(mode='stream'), predictor=PatternPredictor(),
+                                        clock=self.clock)
+        self.firewall.feature_pipeline = self.honeypot.feature_pipeline = self.pipeline
+        self.traffic = dashboard.AITrafficGenerator(clock=self.clock)
+
+        # The dashboard's history store is module state, point it at this run's components
+        self.dashboard = dashboard
+        dashboard.firewall, dashboard.honeypot = self.firewall, self.honeypot
+        dashboard.traffic_generator, dashboard.feature_pipeline = self.traffic, self.pipeline
+        dashboard.set_clock(self.clock)
+        for series in dashboard.historical_data.values():
+            series.clear()
+
+        self.ips = ip_pool()
+        self.ports = port_pool(self.firewall.ports)
+        self.requests = [(method, path, data) for weight, method, path, data in HONEYPOT_REQUESTS
+                         for _ in range(weight)]
+        self.seconds = 0
+        self.events = {"check_access": 0, "honeypot_requests": 0, "status_snapshots": 0}
+        self._firewall_due = 0.0
+        self._honeypot_due = 0.0
+
+    def start(self):
+        if self.threaded:
+            self.firewall.start_rotation()
+            self.firewall.current_open_ports = self.firewall.ports[:5]
+            self.pipeline.start()
+
+    def stop(self):
+        if self.threaded:
+            self.pipeline.stop()
+            self.firewall.stop_rotation()
+            self.firewall.supervisor.stop()
+        self.dashboard.set_clock(SYSTEM_CLOCK)
+
+    def _source(self):
+        if self.rng.random() < self.new_source_share:
+            # Never seen before: what makes per-address state grow over days
+            return f"{self.rng.randrange(1, 224)}.{self.rng.randrange(256)}.{self.rng.randrange(256)}.{self.rng.randrange(1, 255)}"
+        return self.ips[self.rng.randrange(len(self.ips))]
+
+    def step(self):
+        """One simulated second"""
+        self._firewall_due += self.firewall_rate
+        while self._firewall_due >= 1:
+            self._firewall_due -= 1
+            self.firewall.check_access(self._source(), self.ports[self.rng.randrange(len(self.ports))])
+            self.events["check_access"] += 1
+
+        self._honeypot_due += self.honeypot_rate
+        while self._honeypot_due >= 1:
+            self._honeypot_due -= 1
+            method, path, data = self.requests[self.rng.randrange(len(self.requests))]
+            self.client.open(path, method=method, data=data, environ_base={"REMOTE_ADDR": self._source()})
+            self.events["honeypot_requests"] += 1
+
+        self.traffic.step()
+        if self.threaded:
+            self.clock.run_for(1)
+        else:
+            self.clock.advance(1)
+        self.seconds += 1
+
+        if not self.threaded:
+            if self.seconds % self.pipeline.window_seconds == 0:
+                self.pipeline.roll_window()
+            if self.seconds % self.firewall.rotation_interval == 0:
+                self.firewall.rotate_ports()
+        if self.seconds % self.status_interval == 0:
+            self.dashboard.store_historical_data(self.dashboard.get_system_status())
+            self.events["status_snapshots"] += 1
+
+    def collection_sizes(self):
+        """Lengths of the containers that grow with uptime"""
+        history = self.dashboard.historical_data
+        return {
+            "firewall.attack_log": len(self.firewall.attack_log),
+            "firewall.suspicious_ips": len(self.firewall.suspicious_ips),
+            "firewall.ip_index_nodes": self.firewall.ip_index.node_count,
+            "firewall.redirected_ips": len(self.firewall.redirected_ips),
+            "firewall.blocked_ips": len(self.firewall.blocked_ips),
+            "honeypot.attack_log": len(self.honeypot.attack_log),
+            "honeypot.source_counts": len(self.honeypot.source_counts),
+            "honeypot.rate_limiter_buckets": len(self.honeypot.rate_limiter.buckets),
+            "dashboard.history": sum(len(series) for series in history.values())
+        }
+
+
+def take_sample(run, hours, file_components):
+    """RSS, live traced bytes per component and container sizes at this point of the run"""
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__)
+    ))
+    components = dict.fromkeys(COMPONENTS, 0)
+    other = 0
+    for stat in snapshot.statistics("filename"):
+        component = file_components.get(stat.traceback[0].filename)
+        if component is None:
+            other += stat.size
+        else:
+            components[component] += stat.size
+    sample = {
+        "hours": round(hours, 3),
+        "rss_mb": round(read_process()[1] / 1048576, 1),
+        "traced_mb": {name: round(size / 1048576, 2) for name, size in components.items()},
+        "other_traced_mb": round(other / 1048576, 2),
+        "collections": run.collection_sizes()
+    }
+    return sample, snapshot
+
+
+def growing_sites(baseline, snapshot, top=10):
+    """Allocation sites with the largest growth between two snapshots"""
+    sites = []
+    for stat in snapshot.compare_to(baseline, "lineno")[:top * 4]:
+        if stat.size_diff <= 0:
+            continue
+        frame = stat.traceback[0]
+        sites.append({
+            "site": _site(frame.filename, frame.lineno),
+            "growth_mb": round(stat.size_diff / 1048576, 2),
+            "size_mb": round(stat.size / 1048576, 2),
+            "blocks": stat.count
+        })
+        if len(sites) == top:
+            break
+    return sites
+
+
+def run_soak(hours=6.0, sample_minutes=60, firewall_rate=2.0, honeypot_rate=0.5, new_source_share=0.2,
+             status_interval=60, budgets=None, max_rss_mb=None, top=10, frames=1, seed=23, threaded=False,
+             report=print):
+    """Run the components for `hours` of simulated time and check memory against the budgets"""
+    budgets = dict(DEFAULT_BUDGETS_MB if budgets is None else budgets)
+    run = SoakRun(firewall_rate=firewall_rate, honeypot_rate=honeypot_rate, new_source_share=new_source_share,
+                  status_interval=status_interval, seed=seed, threaded=threaded)
+    file_components = _file_components()
+    total_seconds = int(hours * 3600)
+    sample_every = max(1, int(sample_minutes * 60))
+
+    tracemalloc.start(frames)
+    started = time.perf_counter()
+    samples = []
+    run.start()
+    try:
+        sample, baseline = take_sample(run, 0, file_components)
+        samples.append(sample)
+        snapshot = baseline
+        while run.seconds < total_seconds:
+            run.step()
+            if run.seconds % sample_every == 0 or run.seconds == total_seconds:
+                sample, snapshot = take_sample(run, run.seconds / 3600.0, file_components)
+                sample["wall_seconds"] = round(time.perf_counter() - started, 1)
+                samples.append(sample)
+                report(format_sample(sample))
+        sites = growing_sites(baseline, snapshot, top)
+    finally:
+        run.stop()
+        tracemalloc.stop()
+
+    last = samples[-1]
+    components = {}
+    for name in COMPONENTS:
+        peak = max(sample["traced_mb"][name] for sample in samples)
+        # Growth over the second half of the run, after caches and windows have filled
+        tail = [(sample["hours"], sample["traced_mb"][name]) for sample in samples[len(samples) // 2:]]
+        slope = _slope(tail)
+        components[name] = {
+            "final_mb": last["traced_mb"][name],
+            "peak_mb": peak,
+            "budget_mb": budgets.get(name),
+            "mb_per_hour": round(slope, 3),
+            "projected_week_mb": round(last["traced_mb"][name] + max(0.0, slope) * (WEEK_HOURS - last["hours"]), 1),
+            "within_budget": budgets.get(name) is None or peak <= budgets[name]
+        }
+    failures = [f"{name}: peak {stats['peak_mb']} MB > budget {stats['budget_mb']} MB"
+                for name, stats in components.items() if not stats["within_budget"]]
+    peak_rss = max(sample["rss_mb"] for sample in samples)
+    if max_rss_mb is not None and peak_rss > max_rss_mb:
+        failures.append(f"process: peak RSS {peak_rss} MB > budget {max_rss_mb} MB")
+    return {
+        "simulated_hours": round(run.seconds / 3600.0, 3),
+        "wall_seconds": round(time.perf_counter() - started, 1),
+        "config": {"firewall_rate": firewall_rate, "honeypot_rate": honeypot_rate,
+                   "new_source_share": new_source_share, "status_interval": status_interval,
+                   "sample_minutes": sample_minutes, "traceback_frames": frames, "seed": seed,
+                   "threaded": threaded},
+        "events": dict(run.events, rotations=run.firewall.rotation_count),
+        "components": components,
+        "peak_rss_mb": peak_rss,
+        "growing_sites": sites,
+        "samples": samples,
+        "failures": failures,
+        "passed": not failures
+    }
+
+
+def format_sample(sample):
+    traced = "  ".join(f"{name} {size:.1f}" for name, size in sample["traced_mb"].items())
+    return (f"t+{sample['hours']:7.2f}h  rss {sample['rss_mb']:8.1f} MB  traced MB: {traced}"
+            f"  other {sample['other_traced_mb']:.1f}  ({sample.get('wall_seconds', 0):.0f}s)")
+
+
+def format_soak(result):
+    lines = [f"Soak: {result['simulated_hours']} simulated hours in {result['wall_seconds']}s, "
+             f"peak RSS {result['peak_rss_mb']} MB, events {result['events']}"]
+    for name, stats in result["components"].items():
+        verdict = "ok" if stats["within_budget"] else "OVER BUDGET"
+        lines.append(f"  {name:10} {stats['final_mb']:8.2f} MB (peak {stats['peak_mb']:.2f}, budget "
+                     f"{stats['budget_mb']})  {stats['mb_per_hour']:+.3f} MB/h  ~{stats['projected_week_mb']} MB "
+                     f"after a week  {verdict}")
+    lines.append("  Containers at the end: " + ", ".join(
+        f"{name} {size:,}" for name, size in result["samples"][-1]["collections"].items()))
+    lines.append("  Top growing allocation sites:")
+    for site in result["growing_sites"]:
+        lines.append(f"    {site['site']:45} +{site['growth_mb']:.2f} MB ({site['blocks']:,} blocks)")
+    for failure in result["failures"]:
+        lines.append(f"  FAIL {failure}")
+    return "\n".join(lines)
@@ -0,0 +1,329 @@
+import json
+import time
+import socket
+import random
+import logging
+import threading
+import multiprocessing
+
+import requests
+
+from benchmarks.harness import read_process, percentile
+from benchmarks.micro import ip_pool, port_pool
+
+logger = logging.getLogger(__name__)
+
+UNLIMITED = 1e9  # token bucket rate/burst that never limits
+
+SCENARIOS = {
+    # name: which processes run and which load is applied
+    "honeypot": {"honeypot": True, "dashboard": False},
+    "dashboard": {"honeypot": False, "dashboard": True},
+    "full": {"honeypot": True, "dashboard": True}
+}
+
+HONEYPOT_REQUESTS = (
+    # (weight, method, path, form data)
+    (5, "GET", "/", None),
+    (3, "POST", "/", {"username": "admin", "password": "admin"}),
+    (2, "GET", "/api/users", None),
+    (1, "GET", "/admin", None)
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _quiet_logs():
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger().setLevel(logging.ERROR)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+
+def serve_honeypot(port, keep_rate_limits=False):
+    """Child process: the honeypot on its own Werkzeug server"""
+    _quiet_logs()
+    from honeypot_service import HoneypotService
+    service = HoneypotService()
+    if not keep_rate_limits:
+        # One load generator is one source address, the per-source limit would cap it at 5 req/s
+        service.rate_limiter.rate = service.rate_limiter.burst = UNLIMITED
+    service.app.run(host="127.0.0.1", port=port, debug=False, use_reloader=False, threaded=True)
+
+
+def feed_firewall(firewall, rate, stop_event):
+    """Drive check_access at `rate` events/s with the microbenchmark address mix"""
+    ips = ip_pool()
+    ports = port_pool(firewall.ports)
+    i = 0
+    batch = max(1, int(rate / 20))
+    while not stop_event.wait(batch / rate):
+        for _ in range(batch):
+            firewall.check_access(ips[i & (len(ips) - 1)], ports[i & (len(ports) - 1)])
+            i += 1
+
+
+def serve_dashboard(port, honeypot_url, firewall_rate=50, keep_rate_limits=False):
+    """Child process: dashboard, firewall engine, honeypot component and simulated attack traffic"""
+    _quiet_logs()
+    import dashboard
+    from firewall_engine import DynamicFirewall
+    from honeypot_service import HoneypotService
+    from attack_simulator import AttackSimulator
+    if not keep_rate_limits:
+        dashboard.rate_limiter.rate = dashboard.rate_limiter.burst = UNLIMITED
+        dashboard.rate_limiter.route_limits = {}
+    firewall = DynamicFirewall(dashboard.socketio)
+    if firewall_rate:
+        threading.Thread(target=feed_firewall, args=(firewall, firewall_rate, threading.Event()),
+                         name="firewall-feed", daemon=True).start()
+    # stdin is not a tty in a child process, Flask-SocketIO refuses Werkzeug without the flag
+    dashboard.start_dashboard(firewall, HoneypotService(dashboard.socketio), AttackSimulator(honeypot_url),
+                              host="127.0.0.1", port=port, allow_unsafe_werkzeug=True)
+
+
+def wait_ready(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise Exception(f"Process serving {url} exited with code {process.exitcode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise Exception(f"{url} did not come up within {timeout}s")
+
+
+class LatencyRecorder:
+    """Per-endpoint latencies and status codes, shared by the load threads"""
+
+    def __init__(self):
+        self.samples = {}
+        self.statuses = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds, status=None, error=None):
+        with self.lock:
+            if error is not None:
+                self.errors.setdefault(name, {})
+                self.errors[name][error] = self.errors[name].get(error, 0) + 1
+                return
+            self.samples.setdefault(name, []).append(seconds)
+            codes = self.statuses.setdefault(name, {})
+            codes[status] = codes.get(status, 0) + 1
+
+    def summary(self, duration):
+        result = {}
+        for name in sorted(set(self.samples) | set(self.errors)):
+            samples = self.samples.get(name, [])
+            result[name] = {
+                "requests": len(samples),
+                "rps": round(len(samples) / duration, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2) if samples else None,
+                "p95_ms": round(percentile(samples, 95) * 1000, 2) if samples else None,
+                "p99_ms": round(percentile(samples, 99) * 1000, 2) if samples else None,
+                "statuses": {str(code): count for code, count in sorted(self.statuses.get(name, {}).items())},
+                "errors": self.errors.get(name, {})
+            }
+        return result
+
+
+def honeypot_worker(base_url, recorder, stop_event, seed):
+    rng = random.Random(seed)
+    choices = [(method, path, data) for weight, method, path, data in HONEYPOT_REQUESTS for _ in range(weight)]
+    session = requests.Session()
+    while not stop_event.is_set():
+        method, path, data = rng.choice(choices)
+        name = f"honeypot {method} {path}"
+        start = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, data=data, timeout=10)
+            recorder.record(name, time.perf_counter() - start, response.status_code)
+        except requests.RequestException as e:
+            recorder.record(name, 0, error=type(e).__name__)
+
+
+def dashboard_poller(base_url, recorder, stop_event, interval):
+    """Polls like the dashboard page does, revalidating with the last ETag"""
+    session = requests.Session()
+    etags = {}
+    paths = ("/api/status", "/api/history?timeframe=1h")
+    while not stop_event.is_set():
+        for path in paths:
+            headers = {"If-None-Match": etags[path]} if path in etags else {}
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path, headers=headers, timeout=10)
+                recorder.record(f"dashboard GET {path.split('?')[0]}", time.perf_counter() - start,
+                                response.status_code)
+                if response.headers.get("ETag"):
+                    etags[path] = response.headers["ETag"]
+            except requests.RequestException as e:
+                recorder.record(f"dashboard GET {path.split('?')[0]}", 0, error=type(e).__name__)
+        stop_event.wait(interval)
+
+
+class SocketClient:
+    """Simulated dashboard viewer: counts Socket.IO events and payload bytes"""
+
+    def __init__(self, base_url, compact=False, topics=None):
+        import socketio
+        self.base_url = base_url
+        self.compact = compact
+        self.topics = topics
+        self.client = socketio.Client(reconnection=False)
+        self.events = {}
+        self.event_bytes = {}
+        self.bytes = 0
+        self.connect_seconds = None
+        self.error = None
+        self.client.on('*', self._on_event)
+
+    def _on_event(self, event, *args):
+        self.events[event] = self.events.get(event, 0) + 1
+        # JSON payloads are measured re-encoded, close to what went over the wire
+        size = sum(len(arg) if isinstance(arg, (bytes, bytearray)) else len(json.dumps(arg, default=str))
+                   for arg in args)
+        self.event_bytes[event] = self.event_bytes.get(event, 0) + size
+        self.bytes += size
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            self.client.connect(self.base_url, auth={"format": "compact"} if self.compact else None,
+                                wait_timeout=10)
+            self.connect_seconds = time.perf_counter() - start
+            if self.topics:
+                self.client.emit('subscribe', {"topics": self.topics, "max_rate": 2})
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+    def disconnect(self):
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+def run_stack(scenario="full", duration=20, http_workers=4, pollers=2, poll_interval=1.0, clients=10,
+              compact_share=0.5, firewall_rate=50, keep_rate_limits=False, report=print):
+    """Start the scenario's processes, apply load for `duration` seconds and return the measurements"""
+    config = SCENARIOS[scenario]
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+    honeypot_port, dashboard_port = free_port(), free_port()
+    honeypot_url = f"http://127.0.0.1:{honeypot_port}"
+    dashboard_url = f"http://127.0.0.1:{dashboard_port}"
+    if config["honeypot"]:
+        processes["honeypot"] = context.Process(target=serve_honeypot, args=(honeypot_port, keep_rate_limits),
+                                                name="bench-honeypot", daemon=True)
+    if config["dashboard"]:
+        processes["dashboard"] = context.Process(
+            target=serve_dashboard, args=(dashboard_port, honeypot_url, firewall_rate, keep_rate_limits),
+            name="bench-dashboard", daemon=True)
+
+    recorder = LatencyRecorder()
+    stop_event = threading.Event()
+    threads = []
+    sockets = []
+    try:
+        for process in processes.values():
+            process.start()
+        if "honeypot" in processes:
+            wait_ready(honeypot_url + "/", processes["honeypot"])
+        if "dashboard" in processes:
+            wait_ready(dashboard_url + "/metrics", processes["dashboard"])
+        report(f"Scenario '{scenario}': {', '.join(processes)} up, loading for {duration}s")
+
+        if "dashboard" in processes:
+            for i in range(clients):
+                client = SocketClient(dashboard_url, compact=i < clients * compact_share,
+                                      topics=["firewall", "honeypot"] if i % 2 else None)
+                client.connect()
+                sockets.append(client)
+        before = {name: read_process(process.pid) for name, process in processes.items()}
+        load_cpu_before = time.process_time()
+
+        if "honeypot" in processes:
+            threads += [threading.Thread(target=honeypot_worker, args=(honeypot_url, recorder, stop_event, seed),
+                                         daemon=True) for seed in range(http_workers)]
+        if "dashboard" in processes:
+            threads += [threading.Thread(target=dashboard_poller,
+                                         args=(dashboard_url, recorder, stop_event, poll_interval), daemon=True)
+                        for _ in range(pollers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        stop_event.wait(duration)
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=15)
+        elapsed = time.perf_counter() - started
+
+        after = {name: read_process(process.pid) for name, process in processes.items()}
+        result = {
+            "scenario": scenario,
+            "duration": round(elapsed, 2),
+            "config": {"http_workers": http_workers, "pollers": pollers, "poll_interval": poll_interval,
+                       "clients": clients, "compact_share": compact_share, "firewall_rate": firewall_rate,
+                       "keep_rate_limits": keep_rate_limits},
+            "endpoints": recorder.summary(elapsed),
+            "processes": {name: {"cpu_seconds": round(after[name][0] - before[name][0], 2),
+                                 "cpu_percent": round((after[name][0] - before[name][0]) / elapsed * 100, 1),
+                                 "rss_mb": round(after[name][1] / 1048576, 1)} for name in processes},
+            "load_generator_cpu_seconds": round(time.process_time() - load_cpu_before, 2)
+        }
+        if sockets:
+            result["socketio"] = summarize_sockets(sockets, elapsed)
+        return result
+    finally:
+        stop_event.set()
+        for client in sockets:
+            client.disconnect()
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=5)
+
+
+def summarize_sockets(sockets, duration):
+    summary = {}
+    for label, group in (("json", [s for s in sockets if not s.compact]), ("compact", [s for s in sockets if s.compact])):
+        if not group:
+            continue
+        connected = [s for s in group if s.error is None]
+        events = {}
+        event_bytes = {}
+        for client in connected:
+            for event, count in client.events.items():
+                events[event] = events.get(event, 0) + count
+                event_bytes[event] = event_bytes.get(event, 0) + client.event_bytes[event]
+        connect_times = [s.connect_seconds for s in connected]
+        summary[label] = {
+            "clients": len(group),
+            "connected": len(connected),
+            "errors": [s.error for s in group if s.error][:5],
+            "connect_p50_ms": round(percentile(connect_times, 50) * 1000, 2) if connect_times else None,
+            "events": events,
+            "bytes_per_event": {event: round(event_bytes[event] / count) for event, count in events.items()},
+            "bytes_per_client_per_sec": round(sum(s.bytes for s in connected) / max(1, len(connected)) / duration, 1)
+        }
+    return summary
+
+
+def format_stack(result):
+    lines = [f"Scenario '{result['scenario']}' ran {result['duration']}s"]
+    for name, stats in result["endpoints"].items():
+        lines.append(f"  {name:38} {stats['rps']:>9.1f} req/s  p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms"
+                     f"  statuses {stats['statuses']}" + (f"  errors {stats['errors']}" if stats["errors"] else ""))
+    for name, stats in result["processes"].items():
+        lines.append(f"  process {name:30} cpu {stats['cpu_percent']}%  rss {stats['rss_mb']} MB")
+    for label, stats in result.get("socketio", {}).items():
+        lines.append(f"  socket.io {label:28} {stats['connected']}/{stats['clients']} connected"
+                     f"  {stats['bytes_per_client_per_sec']} B/s per client  events {stats['events']}")
+    return "\n".join(lines)
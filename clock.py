@@ -0,0 +1,102 @@
+import time
+import threading
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    """Real time: what every component uses unless it is handed another clock"""
+
+    def now(self):
+        return datetime.now()
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        """Like event.wait(timeout): True if the event was set before the timeout"""
+        return event.wait(timeout)
+
+
+class VirtualClock:
+    """Simulated time that only moves when advance() or run_for() is called.
+
+    sleep() and wait() block until the clock has been advanced past the wake-up time,
+    so background loops run once per simulated interval however fast time is pushed
+    forward. run_for() turns the clock into a discrete-event simulation: it jumps
+    straight to the next wake-up and lets the woken threads finish their work before
+    jumping again, so a day of rotations and window loops runs as fast as the CPU allows.
+    """
+
+    def __init__(self, start=None):
+        self.start = start or datetime.now()
+        self.elapsed = 0.0
+        self.condition = threading.Condition()
+        self.sleepers = {}  # thread -> simulated wake-up time
+
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def time(self):
+        return self.start.timestamp() + self.elapsed
+
+    def monotonic(self):
+        return self.elapsed
+
+    def sleep(self, seconds):
+        self.wait(None, seconds)
+
+    def wait(self, event, timeout):
+        """Block until `timeout` simulated seconds have passed or the event is set"""
+        thread = threading.current_thread()
+        with self.condition:
+            wake = self.elapsed + max(0.0, timeout)
+            self.sleepers[thread] = wake
+            self.condition.notify_all()  # run_for waits for woken threads to sleep again
+            try:
+                while self.elapsed < wake:
+                    if event is not None and event.is_set():
+                        return True
+                    # Timed so a set event is noticed without anyone advancing the clock
+                    self.condition.wait(0.05 if event is not None else None)
+            finally:
+                if self.sleepers.get(thread) == wake:
+                    del self.sleepers[thread]
+        return event is not None and event.is_set()
+
+    def advance(self, seconds):
+        """Move simulated time forward and wake the sleepers that are due"""
+        with self.condition:
+            self.elapsed += seconds
+            self.condition.notify_all()
+
+    def run_for(self, seconds, settle=1.0):
+        """Advance `seconds` from one wake-up to the next.
+
+        After each jump the driver waits, up to `settle` real seconds, until every
+        thread it woke is asleep again (or has exited), so their work lands at the
+        simulated time it was due.
+        """
+        with self.condition:
+            target = self.elapsed + seconds
+            while self.elapsed < target:
+                upcoming = [wake for wake in self.sleepers.values() if wake > self.elapsed]
+                self.elapsed = min([target] + upcoming)
+                woken = [thread for thread, wake in self.sleepers.items() if wake <= self.elapsed]
+                self.condition.notify_all()
+                deadline = time.monotonic() + settle
+                while woken:
+                    woken = [thread for thread in woken if thread.is_alive()
+                             and self.sleepers.get(thread, self.elapsed) <= self.elapsed]
+                    remaining = deadline - time.monotonic()
+                    if not woken or remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+
+SYSTEM_CLOCK = SystemClock()
@@ -1,11 +1,27 @@
-from flask import Flask, render_template, jsonify, request
-from flask_socketio import SocketIO, emit
-import threading
-import time
+from flask import Flask, render_template, jsonify, request, Response
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import logging
+import argparse
 from datetime import datetime, timedelta
 import json
 import random
+from topic_hub import TopicHub, TOPICS
+from process_metrics import default_sampler as metrics_sampler, record_event
+from instrumentation import REGISTRY, CONTENT_TYPE, timed_emit
+from profiler import SamplingProfiler
+from logger import get_logging_stats
+from feature_pipeline import FeaturePipeline
+from anomaly_detector import AnomalyDetector
+from model_manager import RetrainScheduler
+import model_store
+from pattern_predictor import PatternPredictor
+from firewall_engine import DynamicFirewall
+from firewall_backends import add_backend_arguments, backend_from_args
+from rate_limiter import TokenBucketLimiter
+from response_cache import ResponseCache
+from clock import SYSTEM_CLOCK
+from supervisor import supervisor_for
+import wire_format
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -15,12 +31,25 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'enhanced_hackathon_secret_key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Admission control: per-client buckets, tighter on the O(history) endpoints.
+# Socket.IO traffic is handled by its own middleware and never reaches this hook.
+rate_limiter = TokenBucketLimiter(rate=10, burst=30, name="dashboard", route_limits={
+    '/api/status': (2, 5),
+    '/api/history': (1, 3)
+})
+rate_limiter.install(app, exempt=('/metrics',))
+
 # Global references to components
 firewall = None
 honeypot = None
 traffic_generator = None
 attack_simulator = None
-start_time = time.time()
+clock = SYSTEM_CLOCK  # history timestamps and the updater loop, see set_clock
+supervisor = supervisor_for(clock)  # background tasks, follows set_clock
+ATTACK_WORKERS = 2  # concurrent attack simulations, further starts are refused
+status_task = None
+next_status_at = 0.0
+start_time = clock.time()
 
 # Store historical data for analytics
 historical_data = {
@@ -32,6 +61,54 @@ historical_data = {
 }
 MAX_HISTORY = 1000  # Maximum number of records to keep
 
+# Topic subscriptions: subscribed clients get per-topic updates at their own rate,
+# everyone else stays in the legacy room and receives the full status snapshot
+topic_hub = TopicHub()
+LEGACY_ROOM = 'status_legacy'
+COMPACT_ROOM = 'status_legacy_compact'  # legacy clients that opted into the compact wire format
+compact_clients = set()  # sids receiving wire_format frames instead of JSON
+STATUS_INTERVAL = 3  # seconds between full status snapshots
+TOPIC_TICK = 0.5  # seconds between topic delivery passes
+latest_status = None
+feature_pipeline = None
+retrainer = None  # RetrainScheduler of the feature pipeline's detector
+
+# Serialized /api/status and /api/history bodies, rebuilt when new history is stored
+response_cache = ResponseCache(ttl=STATUS_INTERVAL, dumps=app.json.dumps)
+HISTORY_TIMEFRAMES = ('1h', '24h', '7d')
+
+# On-demand sampling profiler, idle (no thread) until started
+profiler = SamplingProfiler()
+
+# Process level gauges read from the metrics sampler at scrape time
+for metric_name, sample_key, documentation in (
+        ('process_cpu_percent', 'cpu_percent', 'Process CPU usage in percent'),
+        ('process_resident_memory_megabytes', 'rss_mb', 'Resident set size in MB'),
+        ('process_threads', 'threads', 'Number of OS threads')):
+    REGISTRY.gauge(metric_name, documentation).set_function(
+        lambda key=sample_key: metrics_sampler.latest.get(key, 0))
+for metric_name, stats_key, documentation in (
+        ('log_records_written_total', 'written', 'Log records written by the async writer'),
+        ('log_records_dropped_total', 'dropped', 'Log records dropped because the queue was full'),
+        ('log_queue_depth', 'queued', 'Log records waiting for the writer')):
+    REGISTRY.gauge(metric_name, documentation).set_function(
+        lambda key=stats_key: get_logging_stats().get(key, 0))
+REGISTRY.gauge('dashboard_subscribed_clients', 'Clients with topic subscriptions').set_function(
+    lambda: len(topic_hub.clients))
+REGISTRY.gauge('dashboard_compact_clients', 'Clients using the compact wire format').set_function(
+    lambda: len(compact_clients))
+
+class LegacyRoomEmitter:
+    """The `socketio` handed to components: their events go to the snapshot rooms only, in each
+    room's wire format; topic subscribers get the same data through their topics"""
+    
+    def emit(self, event, data=None, **kwargs):
+        socketio.emit(event, data, to=LEGACY_ROOM)
+        if compact_clients:
+            socketio.emit(event, wire_format.encode(data), to=COMPACT_ROOM)
+
+component_emitter = LegacyRoomEmitter()
+
 @app.route('/')
 def index():
     """Main dashboard page"""
@@ -40,14 +117,64 @@ def index():
 @app.route('/api/status')
 def get_status():
     """API endpoint to get current system status"""
-    status = get_system_status()
-    return jsonify(status)
+    # The updater's last snapshot is at most STATUS_INTERVAL old, reuse it when there is one
+    return response_cache.respond(('status',), lambda: latest_status or get_system_status())
 
 @app.route('/api/history')
 def get_history():
     """API endpoint to get historical data"""
     timeframe = request.args.get('timeframe', '1h')  # 1h, 24h, 7d
-    return jsonify(filter_history(timeframe))
+    if timeframe not in HISTORY_TIMEFRAMES:
+        timeframe = '1h'  # filter_history's default, and keeps the cache keys bounded
+    return response_cache.respond(('history', timeframe), lambda: filter_history(timeframe))
+
+@app.route('/api/metrics')
+def get_metrics():
+    """API endpoint with sampled process performance metrics"""
+    limit = request.args.get('limit', 60, type=int)
+    return jsonify(metrics_sampler.get_metrics(limit))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text-format scrape endpoint"""
+    return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+@app.route('/api/profiler', methods=['GET'])
+def profiler_status():
+    """Get profiler state"""
+    return jsonify(profiler.get_status())
+
+@app.route('/api/profiler/start', methods=['POST'])
+def start_profiler():
+    """Start the sampling profiler, optional frequency (Hz) and duration (s)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        started = profiler.start(data.get('frequency'), data.get('duration'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if started:
+        log_event("profiler", f"Sampling profiler started at {profiler.frequency} Hz")
+    return jsonify({"status": "started" if started else "already_running", **profiler.get_status()})
+
+@app.route('/api/profiler/stop', methods=['POST'])
+def stop_profiler():
+    """Stop the sampling profiler"""
+    stopped = profiler.stop()
+    if stopped:
+        log_event("profiler", f"Sampling profiler stopped after {profiler.samples} samples")
+    return jsonify({"status": "stopped" if stopped else "not_running", **profiler.get_status()})
+
+@app.route('/api/profiler/folded', methods=['GET'])
+def profiler_folded():
+    """Collected stacks in folded format for flamegraph tools"""
+    return Response(profiler.get_folded(), mimetype='text/plain')
+
+@app.route('/api/ml/features')
+def get_ml_features():
+    """Latest windowed traffic features and anomalous sources"""
+    if not feature_pipeline:
+        return jsonify({"error": "Feature pipeline not initialized"})
+    return jsonify(feature_pipeline.get_status())
 
 @app.route('/api/traffic/start', methods=['POST'])
 def start_traffic():
@@ -77,8 +204,9 @@ def stop_traffic():
 def start_attack():
     """Start attack simulation"""
     if attack_simulator:
-        attack_thread = threading.Thread(target=attack_simulator.run_all_attacks, daemon=True)
-        attack_thread.start()
+        pool = supervisor.pool("dashboard.attacks", max_workers=ATTACK_WORKERS)
+        if pool.submit("dashboard.run_all_attacks", attack_simulator.run_all_attacks) is None:
+            return jsonify({"status": "busy", "error": "Attack simulations already running"}), 429
         log_event("attack", "Attack simulation started")
         return jsonify({"status": "started"})
     
@@ -125,27 +253,108 @@ def manage_honeypot_config():
         return jsonify({"error": "No configuration provided"})
 
 @socketio.on('connect')
-def handle_connect():
-    """Handle client connection"""
+def handle_connect(auth=None):
+    """Handle client connection, io({auth: {format: 'compact'}}) opts into the compact format"""
     client_id = request.sid
     logger.info(f"Client {client_id} connected to dashboard")
+    join_room(LEGACY_ROOM)
+    if isinstance(auth, dict) and auth.get('format'):
+        set_client_format(client_id, auth['format'])
     
-    # Send initial data
-    emit_status()
+    # Send initial data to this client only
+    emit_to_client('status_update', latest_status or get_system_status())
     
     # Send historical data
-    emit('historical_data', filter_history('1h'))
+    emit_to_client('historical_data', filter_history('1h'))
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     client_id = request.sid
+    topic_hub.remove_client(client_id)
+    compact_clients.discard(client_id)
     logger.info(f"Client {client_id} disconnected from dashboard")
 
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Subscribe the client to topic streams, e.g. {"topics": ["firewall"], "max_rate": 0.5, "format": "compact"}"""
+    data = data or {}
+    client_id = request.sid
+    if data.get('format'):
+        set_client_format(client_id, data['format'])
+    topics = topic_hub.subscribe(client_id, data.get('topics', []), data.get('max_rate'))
+    emit('subscribed', {"topics": topics, "available": list(TOPICS)})
+    if not topics:
+        # Nothing valid was asked for: stay on the full snapshots
+        return_to_snapshots(client_id)
+        return
+    leave_room(LEGACY_ROOM)
+    leave_room(COMPACT_ROOM)
+    
+    # Deliver the first payload right away instead of waiting for the next tick
+    publish_topics(topic_hub.take_due(sid=client_id))
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Drop topic streams for the client"""
+    data = data or {}
+    topics = topic_hub.unsubscribe(request.sid, data.get('topics'))
+    emit('subscribed', {"topics": topics, "available": list(TOPICS)})
+    if not topics:
+        return_to_snapshots(request.sid)
+
+def return_to_snapshots(sid):
+    """A client without topics gets the full status snapshots again, in its wire format"""
+    topic_hub.remove_client(sid)
+    join_room(COMPACT_ROOM if sid in compact_clients else LEGACY_ROOM)
+
 @socketio.on('request_update')
 def handle_update_request():
     """Handle manual update requests from client"""
-    emit_status()
+    client_id = request.sid
+    if topic_hub.is_subscribed(client_id):
+        # Throttled by the client's max rate, served from shared payloads
+        publish_topics(topic_hub.take_due(sid=client_id))
+    else:
+        emit_to_client('status_update', latest_status or get_system_status())
+
+@socketio.on('set_format')
+def handle_set_format(data):
+    """Switch the client's wire format: {"format": "compact"} or {"format": "json"}"""
+    set_client_format(request.sid, (data or {}).get('format'))
+
+def set_client_format(sid, wire):
+    """Record the client's wire format and tell it how to decode the frames"""
+    compact = wire == wire_format.FORMAT_NAME
+    if compact:
+        compact_clients.add(sid)
+    else:
+        compact_clients.discard(sid)
+    if not topic_hub.is_subscribed(sid):
+        leave_room(LEGACY_ROOM if compact else COMPACT_ROOM)
+        join_room(COMPACT_ROOM if compact else LEGACY_ROOM)
+    emit('wire_format', wire_format.describe() if compact else {"format": "json"})
+
+def emit_to_client(event, payload):
+    """emit() to the requesting client in its wire format"""
+    emit(event, wire_format.encode(payload) if request.sid in compact_clients else payload)
+
+@socketio.on('profiler_start')
+def handle_profiler_start(data):
+    """Start the sampling profiler from the dashboard"""
+    data = data or {}
+    try:
+        profiler.start(data.get('frequency'), data.get('duration'))
+    except ValueError as e:
+        emit('profiler_status', {"error": str(e), **profiler.get_status()})
+        return
+    emit('profiler_status', profiler.get_status())
+
+@socketio.on('profiler_stop')
+def handle_profiler_stop():
+    """Stop the sampling profiler and send the folded stacks"""
+    profiler.stop()
+    emit('profiler_status', {**profiler.get_status(), "folded": profiler.get_folded()})
 
 @socketio.on('request_config')
 def handle_config_request(data):
@@ -159,38 +368,92 @@ def handle_config_request(data):
 def get_system_status():
     """Get current system status"""
     status = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": clock.now().isoformat(),
         "system": {
-            "uptime": time.time() - start_time
+            "uptime": clock.time() - start_time
         }
     }
     
     if firewall:
-        firewall_status = firewall.get_status()
-        firewall_status["rotation_count"] = getattr(firewall, "rotation_count", 0)
-        firewall_status["port_history"] = getattr(firewall, "port_history", [])
-        status["firewall"] = firewall_status
+        status["firewall"] = build_firewall_status()
     
     if honeypot:
-        honeypot_status = honeypot.get_stats()
-        honeypot_status["total_attacks"] = len(getattr(honeypot, "attack_log", []))
-        honeypot_status["recent_attacks"] = getattr(honeypot, "attack_log", [])[-10:] if hasattr(honeypot, "attack_log") and honeypot.attack_log else []
-        honeypot_status["attack_types"] = get_attack_types_distribution()
-        status["honeypot"] = honeypot_status
+        status["honeypot"] = build_honeypot_status()
     
     if traffic_generator:
-        traffic_status = traffic_generator.get_stats()
-        traffic_status["total_traffic"] = getattr(traffic_generator, "total_traffic", 0)
-        traffic_status["attack_traffic"] = getattr(traffic_generator, "attack_traffic", 0)
-        traffic_status["normal_traffic"] = getattr(traffic_generator, "normal_traffic", 0)
-        traffic_status["traffic_timeline"] = get_traffic_timeline()
-        status["traffic"] = traffic_status
+        status["traffic"] = build_traffic_status()
     
     # Add ML analysis data
     status["ml_analysis"] = get_ml_analysis()
     
     return status
 
+def build_firewall_status():
+    """Firewall section of the status"""
+    firewall_status = firewall.get_status()
+    firewall_status["rotation_count"] = getattr(firewall, "rotation_count", 0)
+    firewall_status["port_history"] = getattr(firewall, "port_history", [])
+    return firewall_status
+
+def build_honeypot_status():
+    """Honeypot section of the status"""
+    honeypot_status = honeypot.get_stats()
+    honeypot_status["total_attacks"] = len(getattr(honeypot, "attack_log", []))
+    honeypot_status["recent_attacks"] = getattr(honeypot, "attack_log", [])[-10:] if hasattr(honeypot, "attack_log") and honeypot.attack_log else []
+    honeypot_status["attack_types"] = get_attack_types_distribution()
+    return honeypot_status
+
+def build_traffic_status():
+    """Traffic section of the status"""
+    traffic_status = traffic_generator.get_stats()
+    traffic_status["total_traffic"] = getattr(traffic_generator, "total_traffic", 0)
+    traffic_status["attack_traffic"] = getattr(traffic_generator, "attack_traffic", 0)
+    traffic_status["normal_traffic"] = getattr(traffic_generator, "normal_traffic", 0)
+    traffic_status["traffic_timeline"] = get_traffic_timeline()
+    return traffic_status
+
+def build_performance_status():
+    """Performance topic payload"""
+    performance = historical_data['performance']
+    return {
+        "uptime": clock.time() - start_time,
+        "latest": performance[-1] if performance else None,
+        "subscriptions": topic_hub.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "supervisor": supervisor.get_stats()
+    }
+
+def build_topic(topic):
+    """Build the payload for a single topic, None if the component is missing"""
+    if topic == 'firewall':
+        return build_firewall_status() if firewall else None
+    if topic == 'honeypot':
+        return build_honeypot_status() if honeypot else None
+    if topic == 'traffic':
+        return build_traffic_status() if traffic_generator else None
+    if topic == 'ml':
+        return get_ml_analysis()
+    if topic == 'performance':
+        return build_performance_status()
+    return None
+
+def publish_topics(due, payloads=None):
+    """Send each due topic to its subscribers, building every payload only once"""
+    payloads = {} if payloads is None else payloads
+    for topic, sids in due.items():
+        if topic not in payloads:
+            payloads[topic] = build_topic(topic)
+        if payloads[topic] is None:
+            continue
+        # One emit per topic and wire format: each packet is encoded once and shared by its sids
+        message = {"topic": topic, "data": payloads[topic]}
+        compact = [sid for sid in sids if sid in compact_clients] if compact_clients else []
+        plain = [sid for sid in sids if sid not in compact_clients] if compact else sids
+        if plain:
+            timed_emit(socketio, 'topic_update', message, to=plain)
+        if compact:
+            timed_emit(socketio, 'topic_update', wire_format.encode(message), to=compact)
+
 def get_attack_types_distribution():
     """Get distribution of attack types from honeypot"""
     if not honeypot or not hasattr(honeypot, "attack_log"):
@@ -206,7 +469,7 @@ def get_attack_types_distribution():
 def get_traffic_timeline():
     """Generate traffic timeline data"""
     timeline = {}
-    now = datetime.now()
+    now = clock.now()
     
     # Generate data for the last hour in 5-minute intervals
     for i in range(12):
@@ -231,7 +494,7 @@ def get_ml_analysis():
     
     # Generate history for the threat level chart
     history = []
-    now = datetime.now()
+    now = clock.now()
     for i in range(10):
         history.append({
             "timestamp": (now - timedelta(minutes=9-i)).isoformat(),
@@ -239,23 +502,31 @@ def get_ml_analysis():
             "patterns": patterns if random.random() > 0.7 else []
         })
     
-    return {
+    analysis = {
         "threat_level": threat_level,
         "patterns_detected": patterns,
         "history": history
     }
+    if feature_pipeline:
+        analysis["features"] = feature_pipeline.get_status()
+    return analysis
 
 def emit_status():
-    """Emit current status to all connected clients"""
+    """Emit the full status to legacy clients and return it"""
+    global latest_status
     status = get_system_status()
-    socketio.emit('status_update', status)
+    latest_status = status
+    timed_emit(socketio, 'status_update', status, to=LEGACY_ROOM)
+    if compact_clients:
+        timed_emit(socketio, 'status_update', wire_format.encode(status), to=COMPACT_ROOM)
     
     # Store in history
     store_historical_data(status)
+    return status
 
 def store_historical_data(status):
     """Store current status in historical data"""
-    timestamp = datetime.now().isoformat()
+    timestamp = clock.now().isoformat()
     
     # Store traffic data
     if 'traffic' in status:
@@ -275,22 +546,28 @@ def store_historical_data(status):
         
         if len(historical_data['threats']) > MAX_HISTORY:
             historical_data['threats'] = historical_data['threats'][-MAX_HISTORY:]
-    
-    # Store performance data
+    response_cache.invalidate()
+
+def store_performance_sample(sample):
+    """Store a process metrics sample in historical data (sampler callback)"""
     performance_data = {
-        'timestamp': timestamp,
-        'cpu': random.randint(10, 80),  # Simulate CPU usage
-        'memory': random.randint(30, 90),  # Simulate memory usage
-        'network': status['traffic']['total_traffic'] if 'traffic' in status else 0
+        'timestamp': clock.now().isoformat(),  # the history is filtered against the dashboard clock
+        'cpu': sample['cpu_percent'],
+        'memory': sample['memory_percent'],
+        'rss_mb': sample['rss_mb'],
+        'threads': sample['threads'],
+        'event_rates': sample['event_rates'],
+        'network': getattr(traffic_generator, 'total_traffic', 0) if traffic_generator else 0
     }
     historical_data['performance'].append(performance_data)
     
     if len(historical_data['performance']) > MAX_HISTORY:
         historical_data['performance'] = historical_data['performance'][-MAX_HISTORY:]
+    response_cache.invalidate()
 
 def filter_history(timeframe):
     """Filter historical data based on timeframe"""
-    now = datetime.now()
+    now = clock.now()
     filtered_data = {
         "traffic": [],
         "threats": [],
@@ -332,50 +609,124 @@ def log_event(event_type, message):
     event = {
         "type": event_type,
         "message": message,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": clock.now().isoformat()
     }
     logger.info(f"{event_type.upper()}: {message}")
-    socketio.emit('event', event)
+    timed_emit(socketio, 'event', event)
 
-def status_updater():
-    """Background thread to update dashboard status periodically"""
-    while True:
-        time.sleep(3)  # Update every 3 seconds
-        try:
-            emit_status()
-        except Exception as e:
-            logger.error(f"Error in status updater: {e}")
+def status_tick():
+    """Periodic task (every TOPIC_TICK): full snapshot when due, then topic updates"""
+    global next_status_at
+    try:
+        now = clock.monotonic()
+        payloads = {}
+        if now >= next_status_at:
+            next_status_at = now + STATUS_INTERVAL
+            status = emit_status()
+            # Reuse the snapshot sections for topic subscribers in the same tick
+            payloads = {
+                "firewall": status.get("firewall"),
+                "honeypot": status.get("honeypot"),
+                "traffic": status.get("traffic"),
+                "ml": status.get("ml_analysis")
+            }
+        publish_topics(topic_hub.take_due(now), payloads)
+    except Exception as e:
+        logger.error(f"Error in status updater: {e}")
 
-def start_dashboard(firewall_instance, honeypot_instance, attack_simulator_instance, host='0.0.0.0', port=5000):
-    """Start the dashboard with component references"""
-    global firewall, honeypot, traffic_generator, attack_simulator, start_time
+def set_clock(clock_instance):
+    """Use another clock (e.g. a VirtualClock) for the history, caches and background loops"""
+    global clock, supervisor
+    clock = clock_instance
+    supervisor = supervisor_for(clock_instance)
+    topic_hub.clock = clock_instance
+    response_cache.clock = clock_instance
+    rate_limiter.clock = clock_instance
+    metrics_sampler.clock = clock_instance
+    metrics_sampler.supervisor = supervisor
+
+def set_supervisor(supervisor_instance):
+    """Run the background tasks on another supervisor (e.g. the asyncio runtime's)"""
+    global supervisor
+    supervisor = supervisor_instance
+    metrics_sampler.supervisor = supervisor_instance
+
+def prepare_dashboard(firewall_instance, honeypot_instance, attack_simulator_instance, clock_instance=None,
+                      supervisor_instance=None):
+    """Wire the components to the dashboard and start its background tasks, without serving"""
+    global firewall, honeypot, traffic_generator, attack_simulator, start_time, status_task, next_status_at
     
     firewall = firewall_instance
     honeypot = honeypot_instance
     attack_simulator = attack_simulator_instance
-    start_time = time.time()
+    if clock_instance is not None:
+        set_clock(clock_instance)
+    if supervisor_instance is not None:
+        set_supervisor(supervisor_instance)
+    start_time = clock.time()
     
     # Set socketio references for components
     if firewall and hasattr(firewall, 'socketio'):
-        firewall.socketio = socketio
+        firewall.socketio = component_emitter
     if firewall and hasattr(firewall, 'log_event'):
         firewall.log_event = log_event
+    if firewall and hasattr(firewall, 'start_rotation') and not getattr(firewall, 'rotation_scheduler', None):
+        firewall.start_rotation()
     
     if honeypot and hasattr(honeypot, 'socketio'):
-        honeypot.socketio = socketio
+        honeypot.socketio = component_emitter
     if honeypot and hasattr(honeypot, 'log_event'):
         honeypot.log_event = log_event
     
     # Initialize traffic generator if not provided
     if not traffic_generator:
-        traffic_generator = AITrafficGenerator(socketio, log_event)
+        traffic_generator = AITrafficGenerator(socketio, log_event, clock, supervisor)
     
-    # Start background updater thread
-    updater_thread = threading.Thread(target=status_updater, daemon=True)
-    updater_thread.start()
+    # Feed live firewall/honeypot events into the ML models
+    start_feature_pipeline()
+    
+    # Start sampling real process metrics into the history store
+    metrics_sampler.on_sample = store_performance_sample
+    metrics_sampler.start()
+    
+    # Status snapshots and topic delivery run as a periodic task on the supervisor
+    if status_task is None:
+        next_status_at = clock.monotonic()
+        status_task = supervisor.every("dashboard.status", TOPIC_TICK, status_tick)
+
+def start_dashboard(firewall_instance, honeypot_instance, attack_simulator_instance, host='0.0.0.0', port=5000,
+                    clock_instance=None, **run_options):
+    """Start the dashboard with component references; run_options go to socketio.run"""
+    prepare_dashboard(firewall_instance, honeypot_instance, attack_simulator_instance, clock_instance)
     
     logger.info(f"Starting enhanced dashboard on {host}:{port}")
-    socketio.run(app, host=host, port=port, debug=False, use_reloader=False)
+    socketio.run(app, host=host, port=port, debug=False, use_reloader=False, **run_options)
+
+def start_feature_pipeline():
+    """Connect component events to the anomaly detector and pattern predictor"""
+    global feature_pipeline, retrainer
+    detector = load_detector()
+    training_store = model_store.TrainingDataStore(clock=clock)
+    # Refits the model from the recorded vectors in a worker process, validates and hot-swaps it
+    retrainer = RetrainScheduler(detector, training_store=training_store, model_dir=model_store.MODEL_DIR,
+                                 clock=clock, supervisor=supervisor)
+    feature_pipeline = FeaturePipeline(detector=detector, predictor=PatternPredictor(), retrainer=retrainer,
+                                       clock=clock, supervisor=supervisor, training_store=training_store,
+                                       model_dir=model_store.MODEL_DIR)
+    feature_pipeline.on_window = lambda summary: timed_emit(component_emitter, 'ml_features', summary)
+    for component in (firewall, honeypot):
+        if component and hasattr(component, 'feature_pipeline'):
+            component.feature_pipeline = feature_pipeline
+    feature_pipeline.start()
+    retrainer.start()
+
+def load_detector():
+    """The saved streaming detector when there is one, a fresh (untrained) one otherwise"""
+    try:
+        return AnomalyDetector.load(model_store.MODEL_DIR, mode='stream', clock=clock)
+    except Exception as e:
+        logger.warning(f"Could not load the saved anomaly model, starting untrained: {e}")
+        return AnomalyDetector(mode='stream', clock=clock)
 
 # Error handlers
 @app.errorhandler(404)
@@ -388,63 +739,65 @@ def internal_error(error):
 
 # Enhanced AITrafficGenerator class with actual traffic generation
 class AITrafficGenerator:
-    def __init__(self, socketio=None, log_event=None):
+    def __init__(self, socketio=None, log_event=None, clock=None, supervisor=None):
         self.socketio = socketio
         self.log_event = log_event
+        self.clock = clock or SYSTEM_CLOCK
+        self.supervisor = supervisor or supervisor_for(self.clock)
         self.running = False
         self.total_traffic = 0
         self.attack_traffic = 0
         self.normal_traffic = 0
         self.intensity = 0.3
         self.traffic_type = 'mixed'
-        self.traffic_thread = None
-        self.stop_event = threading.Event()
+        self.traffic_task = None
         
     def start(self, intensity=0.3, traffic_type='mixed'):
         self.running = True
         self.intensity = intensity
         self.traffic_type = traffic_type
-        self.stop_event.clear()
         
-        # Start traffic generation in a separate thread
-        self.traffic_thread = threading.Thread(target=self._generate_traffic, daemon=True)
-        self.traffic_thread.start()
+        # One periodic task however often start is called; a restart only changes the settings
+        if self.traffic_task is None:
+            self.traffic_task = self.supervisor.every("dashboard.traffic", 1, self._generate_traffic)
         
         if self.log_event:
             self.log_event("traffic", f"Traffic generation started with intensity {intensity}")
         
     def stop(self):
         self.running = False
-        self.stop_event.set()
-        if self.traffic_thread:
-            self.traffic_thread.join(timeout=1.0)
+        if self.traffic_task:
+            self.traffic_task.cancel()
+            self.traffic_task = None
         if self.log_event:
             self.log_event("traffic", "Traffic generation stopped")
             
+    def step(self):
+        """Generate one second worth of traffic"""
+        # Generate traffic based on intensity
+        traffic_amount = random.randint(10, 100) * self.intensity
+        self.total_traffic += traffic_amount
+        record_event("traffic", traffic_amount)
+        
+        # Determine if this is attack traffic based on type
+        if self.traffic_type == 'attack':
+            self.attack_traffic += traffic_amount
+        elif self.traffic_type == 'normal':
+            self.normal_traffic += traffic_amount
+        else:  # mixed traffic
+            if random.random() < 0.2:  # 20% chance of attack traffic
+                self.attack_traffic += traffic_amount
+            else:
+                self.normal_traffic += traffic_amount
+    
     def _generate_traffic(self):
-        """Background thread to generate traffic data"""
-        while self.running and not self.stop_event.is_set():
-            try:
-                # Generate traffic based on intensity
-                traffic_amount = random.randint(10, 100) * self.intensity
-                self.total_traffic += traffic_amount
-                
-                # Determine if this is attack traffic based on type
-                if self.traffic_type == 'attack':
-                    self.attack_traffic += traffic_amount
-                elif self.traffic_type == 'normal':
-                    self.normal_traffic += traffic_amount
-                else:  # mixed traffic
-                    if random.random() < 0.2:  # 20% chance of attack traffic
-                        self.attack_traffic += traffic_amount
-                    else:
-                        self.normal_traffic += traffic_amount
-                
-                # Sleep for a bit before generating more traffic
-                time.sleep(1)
-            except Exception as e:
-                logger.error(f"Error in traffic generation: {e}")
-                break
+        """Periodic task: generate traffic data once a second while running"""
+        if not self.running:
+            return
+        try:
+            self.step()
+        except Exception as e:
+            logger.error(f"Error in traffic generation: {e}")
             
     def get_stats(self):
         return {
@@ -457,6 +810,10 @@ class AITrafficGenerator:
         }
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Dashboard with the firewall engine and a mock honeypot")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    
     # For testing without external components
     class MockComponent:
         def __init__(self):
@@ -502,5 +859,6 @@ if __name__ == '__main__':
     # Initialize the traffic generator
     traffic_generator = AITrafficGenerator(socketio, log_event)
     
-    # Start the dashboard with mock components
-    start_dashboard(MockComponent(), MockComponent(), None, host='localhost', port=5000)
\ No newline at end of file
+    # Start the dashboard with the simulated firewall engine and a mock honeypot
+    start_dashboard(DynamicFirewall(socketio, backend=backend_from_args(args)), MockComponent(), None,
+                    host='localhost', port=5000)
\ No newline at end of file
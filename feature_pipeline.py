@@ -0,0 +1,248 @@
+import math
+import threading
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+# Same layout as the 4-element vectors of traffic_generator.generate_*_traffic
+FEATURES = ('request_rate', 'error_ratio', 'unique_ports', 'path_entropy')
+
+
+def _entropy(counts):
+    """Shannon entropy in bits of a {value: count} mapping"""
+    total = sum(counts.values())
+    if total == 0:
+        return 0.0
+    entropy = 0.0
+    for count in counts.values():
+        p = count / total
+        entropy -= p * math.log2(p)
+    return entropy
+
+
+class FeaturePipeline:
+    def __init__(self, detector=None, predictor=None, retrainer=None, window_seconds=10,
+                 max_sources=4096, history_size=1440, min_source_requests=3, clock=None, supervisor=None,
+                 training_store=None, model_dir=None):
+        self.detector = detector  # AnomalyDetector
+        self.predictor = predictor  # PatternPredictor
+        self.retrainer = retrainer  # RetrainScheduler, records global + source vectors
+        self.training_store = training_store  # model_store.TrainingDataStore, keeps every source vector
+        self.model_dir = model_dir  # save the streaming detector here whenever it completes a window
+        self.window_seconds = window_seconds
+        self.clock = clock or SYSTEM_CLOCK
+        self.supervisor = supervisor  # when set, windows close on its own pool instead of a thread
+        self.max_sources = max_sources
+        self.min_source_requests = min_source_requests
+        self.on_window = None  # optional callback(summary)
+        self.lock = threading.Lock()
+
+        # Per-source counters for the open window, preallocated and reused
+        self.source_index = {}
+        self.source_ips = []
+        self.source_requests = np.zeros(max_sources)
+        self.source_errors = np.zeros(max_sources)
+        self.source_ports = [set() for _ in range(max_sources)]
+        self.source_paths = [dict() for _ in range(max_sources)]
+        self.source_features = np.zeros((max_sources, len(FEATURES)))
+
+        # Global counters for the open window
+        self.requests = 0
+        self.errors = 0
+        self.ports = set()
+        self.paths = {}
+        self.dropped_sources = 0
+
+        # Ring buffer of closed-window global feature vectors
+        self.history = np.zeros((history_size, len(FEATURES)))
+        self.history_ts = np.zeros(history_size)
+        self.history_fill = 0
+        self.history_pos = 0
+
+        self.window_started = self.clock.time()
+        self.latest = {"features": dict.fromkeys(FEATURES, 0.0), "anomalous_sources": [], "pattern": None}
+        self.is_running = False
+        self.stop_event = threading.Event()
+        self.worker_thread = None
+        self.window_task = None
+
+    def record(self, ip, port=None, path=None, error=False):
+        """Ingest one request / connection event"""
+        with self.lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+            if port is not None:
+                self.ports.add(port)
+            if path is not None:
+                self.paths[path] = self.paths.get(path, 0) + 1
+
+            row = self.source_index.get(ip)
+            if row is None:
+                if len(self.source_ips) >= self.max_sources:
+                    self.dropped_sources += 1
+                    return
+                row = len(self.source_ips)
+                self.source_index[ip] = row
+                self.source_ips.append(ip)
+            self.source_requests[row] += 1
+            if error:
+                self.source_errors[row] += 1
+            if port is not None:
+                self.source_ports[row].add(port)
+            if path is not None:
+                paths = self.source_paths[row]
+                paths[path] = paths.get(path, 0) + 1
+
+    def record_request(self, ip, path, status, port=None):
+        """Honeypot/dashboard HTTP request"""
+        self.record(ip, port=port, path=path, error=status >= 400)
+
+    def record_connection(self, ip, port, allowed):
+        """Firewall access decision, blocked attempts count as errors"""
+        self.record(ip, port=port, error=allowed is not True)
+
+    def _close_window(self, now):
+        """Turn the open window into feature vectors and reset the counters (lock held)"""
+        elapsed = max(now - self.window_started, 1e-6)
+        global_vector = np.array([
+            self.requests / elapsed,
+            self.errors / self.requests if self.requests else 0.0,
+            len(self.ports),
+            _entropy(self.paths)
+        ])
+
+        n = len(self.source_ips)
+        features = self.source_features[:n]
+        requests = self.source_requests[:n]
+        features[:, 0] = requests / elapsed
+        np.divide(self.source_errors[:n], requests, out=features[:, 1], where=requests > 0)
+        for row in range(n):
+            features[row, 2] = len(self.source_ports[row])
+            features[row, 3] = _entropy(self.source_paths[row])
+        active = requests >= self.min_source_requests
+        source_vectors = features[active].copy()
+        source_ips = [ip for ip, keep in zip(self.source_ips, active) if keep]
+
+        # Reset without reallocating
+        self.source_requests[:n] = 0
+        self.source_errors[:n] = 0
+        for row in range(n):
+            self.source_ports[row].clear()
+            self.source_paths[row].clear()
+        self.source_index.clear()
+        self.source_ips.clear()
+        self.requests = 0
+        self.errors = 0
+        self.ports.clear()
+        self.paths.clear()
+        self.window_started = now
+
+        self.history[self.history_pos] = global_vector
+        self.history_ts[self.history_pos] = now
+        self.history_pos = (self.history_pos + 1) % len(self.history)
+        self.history_fill = min(self.history_fill + 1, len(self.history))
+        return global_vector, source_vectors, source_ips
+
+    def recent_traffic(self, count=None):
+        """Closed-window global feature vectors, oldest first"""
+        with self.lock:
+            return self._recent(count)
+
+    def _recent(self, count=None):
+        fill = self.history_fill if count is None else min(count, self.history_fill)
+        idx = (self.history_pos - fill + np.arange(fill)) % len(self.history)
+        return self.history[idx].copy(), self.history_ts[idx].copy()
+
+    def roll_window(self, now=None):
+        """Close the current window and feed the models"""
+        now = self.clock.time() if now is None else now
+        with self.lock:
+            global_vector, source_vectors, source_ips = self._close_window(now)
+            recent, recent_ts = self._recent()
+
+        anomalous = []
+        detector = self.detector
+        if self.training_store is not None and len(source_vectors):
+            self.training_store.append(source_vectors, np.full(len(source_vectors), now))
+        if detector is not None and len(source_vectors):
+            try:
+                if detector.stream_model is not None:
+                    completed = detector.stream_model.windows_completed
+                    detector.partial_fit(source_vectors)
+                    if self.model_dir and detector.stream_model.windows_completed != completed:
+                        # A new reference profile: persist it so a restart does not begin untrained
+                        detector.save(self.model_dir)
+                if detector.is_trained:
+                    labels = detector.detect_anomalies(source_vectors)
+                    anomalous = [ip for ip, label in zip(source_ips, labels) if label == -1]
+            except Exception as e:
+                logger.error(f"Error scoring traffic features: {e}")
+        if self.retrainer is not None and len(source_vectors):
+            self.retrainer.record(source_vectors)
+
+        pattern = None
+        forecast = None
+        if self.predictor is not None:
+            self.predictor.observe(now, global_vector)
+            moment = datetime.fromtimestamp(now)
+            pattern = self.predictor.predict(recent, moment)
+            forecast = self.predictor.forecast_next_hour(moment)
+
+        summary = {
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "features": dict(zip(FEATURES, (round(float(v), 4) for v in global_vector))),
+            "sources": len(source_ips),
+            "anomalous_sources": anomalous,
+            "pattern": pattern,
+            "forecast": forecast
+        }
+        self.latest = summary
+        if self.on_window:
+            self.on_window(summary)
+        return summary
+
+    def _roll_tick(self):
+        try:
+            self.roll_window()
+        except Exception as e:
+            logger.error(f"Error in feature pipeline: {e}")
+
+    def _window_loop(self):
+        while not self.clock.wait(self.stop_event, self.window_seconds):
+            self._roll_tick()
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.stop_event.clear()
+        self.window_started = self.clock.time()
+        if self.supervisor is not None:
+            # Model scoring is the heaviest periodic work, keep it off the shared periodic pool
+            self.window_task = self.supervisor.every("features.window", self.window_seconds, self._roll_tick,
+                                                     pool=self.supervisor.pool("features", max_workers=1))
+        else:
+            self.worker_thread = threading.Thread(target=self._window_loop, name="feature-pipeline", daemon=True)
+            self.worker_thread.start()
+        logger.info(f"Feature pipeline started with {self.window_seconds}s windows")
+
+    def stop(self):
+        self.is_running = False
+        self.stop_event.set()
+        if self.window_task:
+            self.window_task.cancel()
+            self.window_task = None
+        if self.worker_thread:
+            self.worker_thread.join(timeout=1)
+        if self.training_store is not None:
+            self.training_store.flush()
+
+    def get_status(self):
+        return dict(self.latest, window_seconds=self.window_seconds, dropped_sources=self.dropped_sources,
+                    windows_recorded=self.history_fill)
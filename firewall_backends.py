@@ -0,0 +1,329 @@
+import os
+import logging
+import ipaddress
+from helpers import validate_ip
+import subprocess
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+HONEYPOT_PORT = 8080
+DASHBOARD_PORT = 5000
+SSH_PORT = 22
+
+
+class FirewallBackend:
+    """Where DynamicFirewall's decisions end up: apply() receives the full desired state"""
+
+    name = "base"
+
+    def __init__(self):
+        self.open_ports = set()
+        self.blocked_ips = set()
+        self.redirected_ips = set()
+        self.applied_count = 0
+        self.last_applied = None
+
+    def apply(self, open_ports, blocked_ips=(), redirected_ips=()):
+        self.open_ports = set(open_ports)
+        self.blocked_ips = set(blocked_ips)
+        self.redirected_ips = set(redirected_ips)
+        self.applied_count += 1
+        self.last_applied = datetime.now().isoformat()
+
+    def get_rules(self):
+        """Human-readable rule list for the dashboard"""
+        rules = [f"allow tcp dport {port}" for port in sorted(self.open_ports)]
+        rules += [f"redirect {ip} -> honeypot" for ip in sorted(self.redirected_ips)]
+        rules += [f"drop {ip}" for ip in sorted(self.blocked_ips)]
+        rules.append("drop all other tcp")
+        return rules
+
+    def get_status(self):
+        return {
+            "backend": self.name,
+            "applied_count": self.applied_count,
+            "last_applied": self.last_applied
+        }
+
+
+class SimulatedBackend(FirewallBackend):
+    """In-memory backend, the default: nothing leaves the process"""
+
+    name = "simulated"
+
+
+def _split_families(ips):
+    """Sort addresses/prefixes into (ipv4, ipv6) lists; callers validate them on the way in"""
+    v4, v6 = [], []
+    for ip in sorted(ips):
+        (v6 if ':' in ip else v4).append(ip)
+    return v4, v6
+
+
+def valid_address(value):
+    """True for an IPv4/IPv6 address or prefix"""
+    if '/' not in value:
+        return validate_ip(value)
+    try:
+        ipaddress.ip_network(value, strict=False)
+        return True
+    except ValueError:
+        return False
+
+
+class RulesetBackend(FirewallBackend):
+    """Renders the state as a script for `command`; with dry_run it is only recorded.
+
+    The rulesets drop all other inbound TCP, so `always_allow` ports (default: SSH, the
+    dashboard and the honeypot) are accepted from every source that is not blocked,
+    whatever the rotation has open.
+    """
+
+    command = None
+
+    def __init__(self, output_path=None, honeypot_port=HONEYPOT_PORT, dry_run=True, history_size=50,
+                 always_allow=None):
+        super().__init__()
+        self.output_path = output_path
+        self.honeypot_port = honeypot_port
+        if always_allow is None:
+            always_allow = (SSH_PORT, DASHBOARD_PORT, honeypot_port)
+        self.always_allow = sorted(set(always_allow))
+        self.dry_run = dry_run
+        self.ruleset = ""
+        self.last_script = ""
+        self.transactions = deque(maxlen=history_size)  # recent scripts, newest last
+
+    def render(self):
+        """Full ruleset for the current state"""
+        raise NotImplementedError
+
+    def build_script(self, previous):
+        """Script moving the kernel from `previous` (None = unknown) to the current state"""
+        return self.render()
+
+    def execute(self, script):
+        result = subprocess.run(self.command, input=script, capture_output=True, text=True, timeout=30)
+        if result.returncode != 0:
+            raise Exception(f"{' '.join(self.command)} failed: {result.stderr.strip()}")
+
+    def apply(self, open_ports, blocked_ips=(), redirected_ips=()):
+        previous = None
+        if self.applied_count:
+            previous = (self.open_ports, self.blocked_ips, self.redirected_ips)
+        super().apply(open_ports, blocked_ips, redirected_ips)
+        script = self.build_script(previous)
+        if not script:
+            return
+        self.last_script = script
+        self.transactions.append(script)
+        if self.output_path:
+            tmp_path = self.output_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(script)
+            os.replace(tmp_path, self.output_path)
+        if not self.dry_run:
+            try:
+                self.execute(script)
+            except Exception:
+                # Kernel state is unknown now, the next apply reloads everything
+                self.applied_count = 0
+                raise
+
+    def get_rules(self):
+        return self.render().splitlines()
+
+    def get_status(self):
+        status = super().get_status()
+        status.update(dry_run=self.dry_run, last_script_lines=self.last_script.count("\n"))
+        return status
+
+
+def _elements(family_ips):
+    return ", ".join(str(v) for v in family_ips)
+
+
+class NftablesBackend(RulesetBackend):
+    """nftables with named sets: ports and addresses change by set element updates only.
+
+    The first apply loads the whole table; later applies emit just the added/removed
+    elements. Each script is one `nft -f` transaction, applied atomically.
+    """
+
+    name = "nftables"
+    command = ["nft", "-f", "-"]
+    chunk_size = 10000  # elements per add/delete statement
+
+    def __init__(self, output_path=None, honeypot_port=HONEYPOT_PORT, dry_run=True, history_size=50,
+                 table="dynamic_firewall", always_allow=None):
+        super().__init__(output_path, honeypot_port, dry_run, history_size, always_allow)
+        self.table = table
+
+    def _sets(self, open_ports, blocked_ips, redirected_ips):
+        """Contents of every named set, keyed by set name"""
+        blocked_v4, blocked_v6 = _split_families(blocked_ips)
+        redirected_v4, redirected_v6 = _split_families(redirected_ips)
+        return {
+            "open_ports": sorted(open_ports),
+            "blocked_v4": blocked_v4,
+            "blocked_v6": blocked_v6,
+            "redirected_v4": redirected_v4,
+            "redirected_v6": redirected_v6
+        }
+
+    def _definition(self):
+        port = self.honeypot_port
+        always_allow = [f"        tcp dport {{ {_elements(self.always_allow)} }} accept"] if self.always_allow else []
+        return [
+            f"table inet {self.table} {{",
+            "    set open_ports { type inet_service; }",
+            "    set blocked_v4 { type ipv4_addr; flags interval; }",
+            "    set blocked_v6 { type ipv6_addr; flags interval; }",
+            "    set redirected_v4 { type ipv4_addr; flags interval; }",
+            "    set redirected_v6 { type ipv6_addr; flags interval; }",
+            "    chain prerouting {",
+            "        type nat hook prerouting priority dstnat; policy accept;",
+            f"        ip saddr @redirected_v4 tcp dport != {port} redirect to :{port}",
+            f"        ip6 saddr @redirected_v6 tcp dport != {port} redirect to :{port}",
+            "    }",
+            "    chain input {",
+            "        type filter hook input priority filter; policy drop;",
+            "        ct state established,related accept",
+            "        iif lo accept",
+            "        ip saddr @blocked_v4 drop",
+            "        ip6 saddr @blocked_v6 drop",
+            f"        ip saddr @redirected_v4 tcp dport {port} accept",
+            f"        ip6 saddr @redirected_v6 tcp dport {port} accept",
+        ] + always_allow + [
+            "        tcp dport @open_ports accept",
+            "    }",
+            "}"
+        ]
+
+    def _element_statements(self, verb, set_name, values):
+        lines = []
+        for i in range(0, len(values), self.chunk_size):
+            chunk = values[i:i + self.chunk_size]
+            lines.append(f"{verb} element inet {self.table} {set_name} {{ {_elements(chunk)} }}")
+        return lines
+
+    def render(self):
+        # `table` + `delete table` makes the reload work whether or not the table exists
+        lines = [f"table inet {self.table}", f"delete table inet {self.table}"] + self._definition()
+        for set_name, values in self._sets(self.open_ports, self.blocked_ips, self.redirected_ips).items():
+            lines += self._element_statements("add", set_name, values)
+        return "\n".join(lines) + "\n"
+
+    def build_script(self, previous):
+        if previous is None:
+            return self.render()
+        before = self._sets(*previous)
+        after = self._sets(self.open_ports, self.blocked_ips, self.redirected_ips)
+        lines = []
+        for set_name, values in after.items():
+            old, new = set(before[set_name]), set(values)
+            lines += self._element_statements("delete", set_name, [v for v in before[set_name] if v not in new])
+            lines += self._element_statements("add", set_name, [v for v in values if v not in old])
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def get_rules(self):
+        """Table definition plus set sizes (the elements can be 100k+ addresses)"""
+        sets = self._sets(self.open_ports, self.blocked_ips, self.redirected_ips)
+        rules = self._definition()
+        rules.append(f"# open_ports: {_elements(sets['open_ports'])}")
+        rules += [f"# {name}: {len(values)} elements" for name, values in sets.items() if name != "open_ports"]
+        return rules
+
+
+class IptablesBackend(RulesetBackend):
+    """Generates `iptables-restore` input for IPv4 (IPv6 addresses are skipped).
+
+    The rules live in their own chains; after each restore the jumps to them from
+    nat PREROUTING and filter INPUT are added unless already present.
+    """
+
+    name = "iptables"
+    command = ["iptables-restore", "--noflush"]
+
+    def __init__(self, output_path=None, honeypot_port=HONEYPOT_PORT, dry_run=True, history_size=50,
+                 chain="DYNAMIC_FW", always_allow=None):
+        super().__init__(output_path, honeypot_port, dry_run, history_size, always_allow)
+        self.chain = chain
+
+    def hooks(self):
+        """(table, built-in chain, our chain) jumps that make the kernel use the rules"""
+        return [("nat", "PREROUTING", f"{self.chain}_NAT"), ("filter", "INPUT", self.chain)]
+
+    def hook_commands(self):
+        """Idempotent shell form of the jumps, for rules files applied by hand"""
+        return [f"iptables -t {table} -C {hook} -j {target} || iptables -t {table} -I {hook} -j {target}"
+                for table, hook, target in self.hooks()]
+
+    def execute(self, script):
+        super().execute(script)
+        for table, hook, target in self.hooks():
+            check = subprocess.run(["iptables", "-t", table, "-C", hook, "-j", target],
+                                   capture_output=True, text=True, timeout=30)
+            if check.returncode == 0:
+                continue
+            result = subprocess.run(["iptables", "-t", table, "-I", hook, "-j", target],
+                                    capture_output=True, text=True, timeout=30)
+            if result.returncode != 0:
+                raise Exception(f"Could not hook {target} into {table} {hook}: {result.stderr.strip()}")
+
+    def render(self):
+        blocked, _ = _split_families(self.blocked_ips)
+        redirected, _ = _split_families(self.redirected_ips)
+        # iptables-restore takes no shell commands: the hooks are listed for whoever loads this file
+        lines = [f"# hook: {command}" for command in self.hook_commands()]
+        lines += ["*nat", f":{self.chain}_NAT - [0:0]", f"-F {self.chain}_NAT"]
+        for ip in redirected:
+            lines.append(f"-A {self.chain}_NAT -s {ip} -p tcp ! --dport {self.honeypot_port} "
+                         f"-j REDIRECT --to-ports {self.honeypot_port}")
+        lines += ["COMMIT", "*filter", f":{self.chain} - [0:0]", f"-F {self.chain}",
+                  f"-A {self.chain} -m conntrack --ctstate ESTABLISHED,RELATED -j ACCEPT",
+                  f"-A {self.chain} -i lo -j ACCEPT"]
+        for ip in blocked:
+            lines.append(f"-A {self.chain} -s {ip} -j DROP")
+        if redirected and self.honeypot_port not in self.always_allow:
+            lines.append(f"-A {self.chain} -p tcp --dport {self.honeypot_port} -j ACCEPT")
+        for port in self.always_allow:
+            lines.append(f"-A {self.chain} -p tcp --dport {port} -j ACCEPT")
+        for port in sorted(self.open_ports):
+            lines.append(f"-A {self.chain} -p tcp --dport {port} -j ACCEPT")
+        lines += [f"-A {self.chain} -j DROP", "COMMIT"]
+        return "\n".join(lines) + "\n"
+
+
+BACKENDS = {
+    "simulated": SimulatedBackend,
+    "nftables": NftablesBackend,
+    "iptables": IptablesBackend
+}
+
+
+def create_backend(name="simulated", **kwargs):
+    if name not in BACKENDS:
+        raise Exception(f"Unknown firewall backend: {name}")
+    return BACKENDS[name](**kwargs)
+
+
+def add_backend_arguments(parser):
+    """--backend/--apply for the entry points; FIREWALL_BACKEND sets the default backend"""
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=os.environ.get("FIREWALL_BACKEND", "simulated"),
+                        help="firewall backend (default: $FIREWALL_BACKEND or simulated)")
+    parser.add_argument("--apply", action="store_true",
+                        help="run nft/iptables on every change instead of only rendering the ruleset (dry run)")
+
+
+def backend_from_args(args, **kwargs):
+    """Build the backend chosen with add_backend_arguments; kwargs go to the ruleset backends"""
+    if args.backend == "simulated":
+        if args.apply:
+            raise Exception("--apply needs a real backend: --backend nftables or --backend iptables")
+        return create_backend("simulated")
+    backend = create_backend(args.backend, dry_run=not args.apply, **kwargs)
+    logger.info(f"Firewall backend: {args.backend} ({'applying rules' if args.apply else 'dry run'})")
+    return backend
@@ -1,13 +1,30 @@
 import random
 import time
 import logging
-from datetime import datetime, timedelta
 import threading
+from datetime import datetime, timedelta
+from process_metrics import record_event
+from instrumentation import REGISTRY, timed_emit
+from rotation_scheduler import RotationScheduler
+from firewall_backends import SimulatedBackend, valid_address
+from ip_index import IPIndex
+from clock import SYSTEM_CLOCK
+from supervisor import supervisor_for
 
 logger = logging.getLogger(__name__)
 
+CHECK_ACCESS_SECONDS = REGISTRY.histogram(
+    'firewall_check_access_seconds', 'Latency of DynamicFirewall.check_access')
+ACCESS_DECISIONS = REGISTRY.counter(
+    'firewall_access_decisions_total', 'Access decisions made by check_access', ['decision'])
+ALLOWED = ACCESS_DECISIONS.labels('allowed')
+BLOCKED = ACCESS_DECISIONS.labels('blocked')
+REDIRECTED = ACCESS_DECISIONS.labels('redirect_to_honeypot')
+
+THREAT_BAND = 10  # threat level points per band; crossing a band re-times the next rotation
+
 class DynamicFirewall:
-    def __init__(self, socketio=None):
+    def __init__(self, socketio=None, backend=None, clock=None, supervisor=None):
         self.ports = [80, 443, 8080, 8443, 22, 3389, 21, 25, 53, 110, 143, 993, 995, 3306, 27017]  # Extended port list
         self.current_open_ports = []
         self.rotation_interval = 30  # seconds
@@ -26,36 +43,69 @@ class DynamicFirewall:
                 "allowed_requests": 0
             }
         }
-        self.monitoring_thread = None
+        self.monitoring_task = None  # periodic task on the supervisor
         self.is_monitoring = False
-        
-    def rotate_ports(self):
-        """Simulate firewall port rotation with enhanced logging"""
+        self.feature_pipeline = None  # FeaturePipeline fed with every access decision
+        self.rotation_scheduler = None
+        self.rotation_policies = None  # None = RotationScheduler defaults
+        self.backend = backend or SimulatedBackend()  # FirewallBackend that enforces the rules
+        self.blocked_ips = set()
+        self.redirected_ips = set()
+        # Guards blocked_ips, redirected_ips and suspicious_ips: request threads update them in
+        # check_access while rotations, monitoring ticks and status reads rebuild or copy them
+        self.ip_lock = threading.Lock()
+        self.sync_lock = threading.Lock()  # one backend apply at a time, in snapshot order
+        self.on_rotate = None  # optional callback(history_entry) after each rotation
+        self.backend_dirty = False  # IP set changes waiting for the next batched sync
+        self.ip_index = IPIndex()  # per-prefix attempt counters for subnet-level decisions
+        self.redirect_threshold = 2  # attempts from one address before it is redirected
+        self.subnet_redirect_hosts = 3  # distinct addresses in a subnet before the subnet is redirected
+        self.subnet_block_threshold = 100  # attempts from a subnet before it is dropped outright
+        self.max_suspicious_ips = 10000
+        self.clock = clock or SYSTEM_CLOCK  # timestamps and loop sleeps; a VirtualClock in soak runs
+        self.supervisor = supervisor or supervisor_for(clock)
+        
+    def rotate_ports(self, plan=None):
+        """Simulate firewall port rotation with enhanced logging, optionally following a (close, open) plan"""
         self.rotation_count += 1
         
         # Store current state before rotation
         previous_ports = self.current_open_ports.copy()
         
-        # Close 1-2 ports
-        ports_to_close = min(2, len(self.current_open_ports))
         closed_ports = []
-        for _ in range(ports_to_close):
-            if self.current_open_ports:
-                port = random.choice(self.current_open_ports)
-                self.current_open_ports.remove(port)
-                closed_ports.append(port)
-                logger.info(f"Firewall closed port {port}")
-        
-        # Open 1-2 new ports
-        ports_to_open = random.randint(1, 2)
         opened_ports = []
-        for _ in range(ports_to_open):
-            available_ports = [p for p in self.ports if p not in self.current_open_ports]
-            if available_ports:
-                new_port = random.choice(available_ports)
-                self.current_open_ports.append(new_port)
-                opened_ports.append(new_port)
-                logger.info(f"Firewall opened port {new_port}")
+        if plan is not None:
+            # Ports chosen by the rotation scheduler's policies
+            ports_to_close, ports_to_open = plan
+            for port in ports_to_close:
+                if port in self.current_open_ports:
+                    self.current_open_ports.remove(port)
+                    closed_ports.append(port)
+                    logger.info("Firewall closed port %s", port)
+            for port in ports_to_open:
+                if port not in self.current_open_ports:
+                    self.current_open_ports.append(port)
+                    opened_ports.append(port)
+                    logger.info("Firewall opened port %s", port)
+        else:
+            # Close 1-2 ports
+            ports_to_close = min(2, len(self.current_open_ports))
+            for _ in range(ports_to_close):
+                if self.current_open_ports:
+                    port = random.choice(self.current_open_ports)
+                    self.current_open_ports.remove(port)
+                    closed_ports.append(port)
+                    logger.info("Firewall closed port %s", port)
+            
+            # Open 1-2 new ports
+            ports_to_open = random.randint(1, 2)
+            for _ in range(ports_to_open):
+                available_ports = [p for p in self.ports if p not in self.current_open_ports]
+                if available_ports:
+                    new_port = random.choice(available_ports)
+                    self.current_open_ports.append(new_port)
+                    opened_ports.append(new_port)
+                    logger.info("Firewall opened port %s", new_port)
         
         # Ensure we always have at least 2 ports open
         while len(self.current_open_ports) < 2:
@@ -64,13 +114,14 @@ class DynamicFirewall:
                 new_port = random.choice(available_ports)
                 self.current_open_ports.append(new_port)
                 opened_ports.append(new_port)
-                logger.info(f"Firewall opened additional port {new_port}")
+                logger.info("Firewall opened additional port %s", new_port)
             else:
                 break
+        self._sync_backend()
         
         # Record port history for visualization
         history_entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self.clock.now().isoformat(),
             "open_ports": self.current_open_ports.copy(),
             "closed_ports": closed_ports,
             "opened_ports": opened_ports,
@@ -84,7 +135,7 @@ class DynamicFirewall:
         
         # Record IP shift data
         ip_shift_entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self.clock.now().isoformat(),
             "suspicious_ip_count": len(self.suspicious_ips),
             "new_ips_last_hour": self._get_new_ips_count(),
             "total_attack_count": len(self.attack_log)
@@ -99,16 +150,84 @@ class DynamicFirewall:
         
         # Notify dashboard of the change
         if self.socketio:
-            self.socketio.emit('firewall_update', self.get_status())
-            self.socketio.emit('port_rotation', history_entry)
-            self.socketio.emit('ip_shift_update', ip_shift_entry)
+            timed_emit(self.socketio, 'firewall_update', self.get_status())
+            timed_emit(self.socketio, 'port_rotation', history_entry)
+            timed_emit(self.socketio, 'ip_shift_update', ip_shift_entry)
+        if self.on_rotate:
+            self.on_rotate(history_entry)
+    
+    def _without_covered(self, ips, prefix):
+        return {ip for ip in ips if not self.ip_index.contains(prefix, ip)}
+    
+    def _redirect_prefix(self, prefix):
+        """Redirect a whole subnet, replacing the single addresses it covers (ip_lock held)"""
+        if prefix in self.redirected_ips:
+            return
+        self.redirected_ips = self._without_covered(self.redirected_ips, prefix)
+        self.redirected_ips.add(prefix)
+        self.backend_dirty = True
+        logger.info("Redirecting subnet %s to honeypot", prefix)
+    
+    def _block_prefix(self, prefix):
+        """Drop a whole subnet (ip_lock held)"""
+        if prefix in self.blocked_ips:
+            return
+        self.ip_index.block(prefix)
+        self.redirected_ips = self._without_covered(self.redirected_ips, prefix)
+        self.blocked_ips = self._without_covered(self.blocked_ips, prefix)
+        self.blocked_ips.add(prefix)
+        self.backend_dirty = True
+        logger.warning("Blocking subnet %s", prefix)
+    
+    def _sync_backend(self):
+        """Push the current ports and IP sets to the backend"""
+        with self.sync_lock:
+            with self.ip_lock:
+                self.backend_dirty = False
+                state = (list(self.current_open_ports), set(self.blocked_ips), set(self.redirected_ips))
+            try:
+                self.backend.apply(*state)
+            except Exception as e:
+                logger.error(f"Error applying rules with {self.backend.name} backend: {e}")
+    
+    def get_rules(self):
+        """Rules as rendered by the backend"""
+        return self.backend.get_rules()
+    
+    def update_rules(self, rules):
+        """Set open ports / blocked / redirected IPs from a dict, e.g. {"open_ports": [80, 443]}"""
+        if not isinstance(rules, dict):
+            return False
+        open_ports = rules.get("open_ports", self.current_open_ports)
+        if not open_ports or any(port not in self.ports for port in open_ports):
+            return False
+        self.current_open_ports = list(open_ports)
+        for key in ("blocked_ips", "redirected_ips"):
+            if key in rules and not all(valid_address(ip) for ip in rules[key]):
+                return False
+        with self.ip_lock:
+            if "blocked_ips" in rules:
+                blocked_ips = set(rules["blocked_ips"])
+                for prefix in self.blocked_ips - blocked_ips:
+                    self.ip_index.unblock(prefix)
+                for prefix in blocked_ips - self.blocked_ips:
+                    self.ip_index.block(prefix)
+                self.blocked_ips = blocked_ips
+            if "redirected_ips" in rules:
+                self.redirected_ips = set(rules["redirected_ips"])
+        self._sync_backend()
+        if self.socketio:
+            timed_emit(self.socketio, 'firewall_update', self.get_status())
+        return True
     
     def _get_new_ips_count(self):
         """Count IPs that appeared in the last hour"""
-        one_hour_ago = datetime.now() - timedelta(hours=1)
+        one_hour_ago = self.clock.now() - timedelta(hours=1)
         new_ips = 0
         
-        for ip, first_seen in self.suspicious_ips.items():
+        with self.ip_lock:
+            entries = list(self.suspicious_ips.items())
+        for ip, first_seen in entries:
             if isinstance(first_seen, dict) and 'first_seen' in first_seen:
                 first_seen_time = datetime.fromisoformat(first_seen['first_seen'])
                 if first_seen_time > one_hour_ago:
@@ -121,12 +240,18 @@ class DynamicFirewall:
         base_threat = min(100, len(self.attack_log) * 2 + len(self.suspicious_ips) * 3)
         
         # Adjust based on recent activity (last 10 minutes)
+        cutoff = self.clock.now() - timedelta(minutes=10)
         recent_attacks = [a for a in self.attack_log 
-                         if datetime.fromisoformat(a['timestamp']) > datetime.now() - timedelta(minutes=10)]
+                         if datetime.fromisoformat(a['timestamp']) > cutoff]
         
         activity_bonus = min(30, len(recent_attacks) * 5)
+        previous = self.monitoring_data["threat_level"]
         self.monitoring_data["threat_level"] = min(100, base_threat + activity_bonus)
         
+        # Apply the threat-adjusted interval now rather than after the pending rotation
+        if self.rotation_scheduler and previous // THREAT_BAND != self.monitoring_data["threat_level"] // THREAT_BAND:
+            self.rotation_scheduler.reschedule()
+        
         # Detect patterns
         self._detect_attack_patterns()
     
@@ -149,93 +274,133 @@ class DynamicFirewall:
                 patterns.append(f"Port scanning pattern detected from {ip} ({count} attempts)")
         
         # Check for brute force patterns
+        cutoff = self.clock.now() - timedelta(minutes=5)
         recent_attacks = [a for a in self.attack_log 
-                         if datetime.fromisoformat(a['timestamp']) > datetime.now() - timedelta(minutes=5)]
+                         if datetime.fromisoformat(a['timestamp']) > cutoff]
         
         if len(recent_attacks) > 10:
             patterns.append("High frequency attack pattern detected")
         
         self.monitoring_data["attack_patterns"] = patterns[-5:]  # Keep only recent patterns
     
-    def start_rotation(self):
-        """Continuously rotate firewall rules"""
+    def start_rotation(self, policies=None, wheel=None):
+        """Start rotating firewall rules on the adaptive scheduler (returns immediately).
+        
+        `wheel` replaces the scheduler's own timer thread, e.g. with the asyncio runtime's loop timer.
+        """
         # Start with some open ports
         self.current_open_ports = random.sample(self.ports, 3)
         logger.info(f"Initial open ports: {self.current_open_ports}")
+        self._sync_backend()
         
-        # Start monitoring thread
+        # Start monitoring updates every 2 seconds
         self.is_monitoring = True
-        self.monitoring_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
-        self.monitoring_thread.start()
+        self.monitoring_task = self.supervisor.every("firewall.monitoring", 2, self._monitoring_tick, initial_delay=0)
         
         # Initial notification
         if self.socketio:
-            self.socketio.emit('firewall_update', self.get_status())
+            timed_emit(self.socketio, 'firewall_update', self.get_status())
         
-        while True:
-            time.sleep(self.rotation_interval)
-            self.rotate_ports()
+        if policies is not None:
+            self.rotation_policies = policies
+        self.rotation_scheduler = RotationScheduler(self, policies=self.rotation_policies, wheel=wheel)
+        self.rotation_scheduler.start()
+        return self.rotation_scheduler
     
-    def _monitoring_loop(self):
-        """Continuous monitoring of firewall activity"""
-        while self.is_monitoring:
-            # Update real-time statistics
-            self.monitoring_data["real_time_stats"] = {
-                "requests_per_second": random.randint(5, 50),
-                "blocked_requests": len(self.attack_log),
-                "allowed_requests": random.randint(100, 500)
-            }
-            
-            # Send monitoring update
-            if self.socketio:
-                self.socketio.emit('monitoring_update', {
-                    "threat_level": self.monitoring_data["threat_level"],
-                    "attack_patterns": self.monitoring_data["attack_patterns"],
-                    "real_time_stats": self.monitoring_data["real_time_stats"],
-                    "timestamp": datetime.now().isoformat()
-                })
-            
-            time.sleep(2)  # Update every 2 seconds
+    def stop_rotation(self):
+        """Stop the rotation scheduler and the monitoring updates"""
+        if self.rotation_scheduler:
+            self.rotation_scheduler.stop()
+            self.rotation_scheduler = None
+        self.stop_monitoring()
+    
+    def _monitoring_tick(self):
+        """One round of monitoring of firewall activity"""
+        # Redirects collected since the last tick go out as one backend update
+        if self.backend_dirty:
+            self._sync_backend()
+        
+        # Update real-time statistics
+        self.monitoring_data["real_time_stats"] = {
+            "requests_per_second": random.randint(5, 50),
+            "blocked_requests": len(self.attack_log),
+            "allowed_requests": random.randint(100, 500)
+        }
+        
+        # Send monitoring update
+        if self.socketio:
+            timed_emit(self.socketio, 'monitoring_update', {
+                "threat_level": self.monitoring_data["threat_level"],
+                "attack_patterns": self.monitoring_data["attack_patterns"],
+                "real_time_stats": self.monitoring_data["real_time_stats"],
+                "timestamp": self.clock.now().isoformat()
+            })
     
     def stop_monitoring(self):
-        """Stop the monitoring thread"""
+        """Stop the monitoring updates"""
         self.is_monitoring = False
-        if self.monitoring_thread:
-            self.monitoring_thread.join(timeout=1)
+        if self.monitoring_task:
+            self.monitoring_task.cancel()
+            self.monitoring_task = None
     
     def check_access(self, src_ip, dst_port):
         """Check if access is allowed and log potential attacks"""
+        start = time.perf_counter()
         is_allowed = dst_port in self.current_open_ports
+        result = is_allowed
         
-        if not is_allowed:
+        # Sources in a blocked subnet are dropped on every port, but still recorded
+        dropped = bool(self.ip_index.blocked) and self.ip_index.lookup(src_ip)["blocked"]
+        if dropped:
+            result = False
+        if dropped or not is_allowed:
             attack_type = self._classify_attack(dst_port)
-            self.log_attack(src_ip, dst_port, attack_type)
+            self.log_attack(src_ip, dst_port, attack_type, action="dropped" if dropped else "blocked")
             
             # Add to suspicious IPs with timestamp
-            if src_ip in self.suspicious_ips:
-                if isinstance(self.suspicious_ips[src_ip], dict):
-                    self.suspicious_ips[src_ip]['count'] += 1
-                    self.suspicious_ips[src_ip]['last_seen'] = datetime.now().isoformat()
+            with self.ip_lock:
+                if src_ip in self.suspicious_ips:
+                    if isinstance(self.suspicious_ips[src_ip], dict):
+                        self.suspicious_ips[src_ip]['count'] += 1
+                        self.suspicious_ips[src_ip]['last_seen'] = self.clock.now().isoformat()
+                    else:
+                        # Convert old format to new format
+                        self.suspicious_ips[src_ip] = {
+                            'count': self.suspicious_ips[src_ip] + 1,
+                            'first_seen': self.clock.now().isoformat(),
+                            'last_seen': self.clock.now().isoformat()
+                        }
                 else:
-                    # Convert old format to new format
                     self.suspicious_ips[src_ip] = {
-                        'count': self.suspicious_ips[src_ip] + 1,
-                        'first_seen': datetime.now().isoformat(),
-                        'last_seen': datetime.now().isoformat()
+                        'count': 1,
+                        'first_seen': self.clock.now().isoformat(),
+                        'last_seen': self.clock.now().isoformat()
                     }
-            else:
-                self.suspicious_ips[src_ip] = {
-                    'count': 1,
-                    'first_seen': datetime.now().isoformat(),
-                    'last_seen': datetime.now().isoformat()
-                }
-                
-            # If highly suspicious, redirect to honeypot on next attempt
-            ip_data = self.suspicious_ips[src_ip]
-            if isinstance(ip_data, dict) and ip_data['count'] > 2:
-                return "redirect_to_honeypot"
-        
-        return is_allowed
+                    if len(self.suspicious_ips) > self.max_suspicious_ips:
+                        # The IP index keeps the aggregate picture, drop the oldest per-address entry
+                        self.suspicious_ips.pop(next(iter(self.suspicious_ips)))
+        
+        if not is_allowed and not dropped:
+            # If highly suspicious (alone or as part of a scanning subnet), redirect to honeypot
+            reputation = self.ip_index.record(src_ip, now=self.clock.time())
+            subnet = reputation["subnet"]
+            with self.ip_lock:
+                if reputation["subnet_count"] >= self.subnet_block_threshold:
+                    self._block_prefix(subnet)
+                elif reputation["subnet_hosts"] >= self.subnet_redirect_hosts:
+                    result = "redirect_to_honeypot"
+                    self._redirect_prefix(subnet)
+                elif reputation["count"] > self.redirect_threshold:
+                    result = "redirect_to_honeypot"
+                    if src_ip not in self.redirected_ips and subnet not in self.redirected_ips:
+                        self.redirected_ips.add(src_ip)
+                        self.backend_dirty = True
+        
+        if self.feature_pipeline:
+            self.feature_pipeline.record_connection(src_ip, dst_port, result)
+        (ALLOWED if result is True else REDIRECTED if result else BLOCKED).inc()
+        CHECK_ACCESS_SECONDS.observe(time.perf_counter() - start)
+        return result
     
     def _classify_attack(self, port):
         """Classify attack type based on port and pattern"""
@@ -254,24 +419,27 @@ class DynamicFirewall:
         
         return port_attack_types.get(port, "Port scanning")
     
-    def log_attack(self, ip, port, attack_type):
+    def log_attack(self, ip, port, attack_type, action="blocked"):
         """Log attack attempts with enhanced details"""
         attack_entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self.clock.now().isoformat(),
             "ip": ip,
             "port": port,
             "type": attack_type,
-            "action": "blocked",
+            "action": action,
             "severity": self._assess_severity(attack_type),
             "threat_level": self.monitoring_data["threat_level"]
         }
         self.attack_log.append(attack_entry)
-        logger.warning(f"Attack detected: {attack_type} from {ip} on port {port}")
+        record_event("firewall")
+        if self.rotation_scheduler:
+            self.rotation_scheduler.on_attack(port)
+        logger.warning("Attack detected: %s from %s on port %s", attack_type, ip, port)
         
         # Notify dashboard of the new attack
         if self.socketio:
-            self.socketio.emit('firewall_attack', attack_entry)
-            self.socketio.emit('firewall_update', self.get_status())
+            timed_emit(self.socketio, 'firewall_attack', attack_entry)
+            timed_emit(self.socketio, 'firewall_update', self.get_status())
     
     def _assess_severity(self, attack_type):
         """Assess severity of attack type"""
@@ -289,13 +457,18 @@ class DynamicFirewall:
 
     def get_status(self):
         """Return current firewall status for dashboard"""
+        # Snapshot: the status is serialized on other threads while check_access keeps adding IPs
+        with self.ip_lock:
+            suspicious_ips = dict(self.suspicious_ips)
+        
         # Calculate various statistics
+        cutoff = self.clock.now() - timedelta(minutes=10)
         recent_attacks = [a for a in self.attack_log 
-                         if datetime.fromisoformat(a['timestamp']) > datetime.now() - timedelta(minutes=10)]
+                         if datetime.fromisoformat(a['timestamp']) > cutoff]
         
         top_attacking_ips = sorted(
             [(ip, data['count'] if isinstance(data, dict) else data) 
-             for ip, data in self.suspicious_ips.items()],
+             for ip, data in suspicious_ips.items()],
             key=lambda x: x[1],
             reverse=True
         )[:5]
@@ -311,13 +484,16 @@ class DynamicFirewall:
         return {
             "open_ports": self.current_open_ports,
             "rotation_interval": self.rotation_interval,
+            "rotation_scheduler": self.rotation_scheduler.get_status() if self.rotation_scheduler else None,
             "attack_count": len(self.attack_log),
-            "suspicious_ips": self.suspicious_ips,
+            "suspicious_ips": suspicious_ips,
             "recent_attacks": self.attack_log[-10:] if self.attack_log else [],
             "rotation_count": self.rotation_count,
             "port_history": self.port_history[-10:],
             "ip_shift_history": self.ip_shift_history[-10:],
             "monitoring": self.monitoring_data,
+            "backend": self.backend.get_status(),
+            "ip_index": self.ip_index.get_stats(),
             "statistics": {
                 "recent_attack_count": len(recent_attacks),
                 "top_attacking_ips": top_attacking_ips,
@@ -328,7 +504,7 @@ class DynamicFirewall:
     
     def get_historical_data(self, hours=24):
         """Get historical data for charts and analysis"""
-        now = datetime.now()
+        now = self.clock.now()
         historical_data = {
             "threat_level_timeline": [],
             "attack_frequency": [],
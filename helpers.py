@@ -1,5 +1,14 @@
 import socket
 import ipaddress
+from functools import lru_cache
+try:
+    import numpy as np
+except ImportError:  # bulk parsing falls back to a Python loop
+    np = None
+
+IPV4_MAPPED_PREFIX = 0xFFFF00000000  # ::ffff:a.b.c.d, so IPv4 and IPv6 share one (hi, lo) space
+IP_CACHE_SIZE = 65536
+_MASK64 = (1 << 64) - 1
 
 def get_local_ip():
     try:
@@ -7,12 +16,118 @@ def get_local_ip():
     except:
         return "127.0.0.1"
 
+def parse_ipv4(value):
+    """Dotted quad -> uint32, None if invalid (strict: no leading zeros or short forms)"""
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, value), 'big')
+    except (OSError, ValueError, TypeError):
+        return None
+
+def parse_ipv6(value):
+    """IPv6 text -> (hi, lo) 64-bit ints, None if invalid; a %scope suffix is dropped"""
+    if '%' in value:
+        value, scope = value.split('%', 1)
+        if not scope or '%' in scope or '/' in scope:
+            return None
+    try:
+        packed = socket.inet_pton(socket.AF_INET6, value)
+    except (OSError, ValueError):
+        return None
+    number = int.from_bytes(packed, 'big')
+    return number >> 64, number & _MASK64
+
+def pack_ip(value):
+    """(version, int) for an IPv4/IPv6 string, None if invalid; IPv6 ints are 128-bit"""
+    if ':' in value:
+        halves = parse_ipv6(value)
+        return (6, (halves[0] << 64) | halves[1]) if halves else None
+    number = parse_ipv4(value)
+    return (4, number) if number is not None else None
+
+pack_ip_cached = lru_cache(maxsize=IP_CACHE_SIZE)(pack_ip)  # interned: repeat sources skip parsing
+
+def pack_ip_pair(value, cached=False):
+    """(hi, lo) 64-bit ints for any address, IPv4 as ::ffff:a.b.c.d; None if invalid"""
+    packed = (pack_ip_cached if cached else pack_ip)(value)
+    if packed is None:
+        return None
+    version, number = packed
+    if version == 4:
+        return 0, IPV4_MAPPED_PREFIX | number
+    return number >> 64, number & _MASK64
+
+def format_ip(version, number):
+    """Inverse of pack_ip"""
+    if version == 4:
+        return socket.inet_ntop(socket.AF_INET, number.to_bytes(4, 'big'))
+    return socket.inet_ntop(socket.AF_INET6, number.to_bytes(16, 'big'))
+
 def validate_ip(ip_address):
+    return isinstance(ip_address, str) and pack_ip(ip_address) is not None
+
+def parse_ipv4_array(values):
+    """Vectorized dotted-quad parsing: returns (uint32 array, valid mask)"""
+    if np is None:
+        parsed = [parse_ipv4(v) if isinstance(v, str) else None for v in values]
+        return [p or 0 for p in parsed], [p is not None for p in parsed]
     try:
-        ipaddress.ip_address(ip_address)
-        return True
-    except ValueError:
-        return False
+        raw = np.asarray(values, dtype='S16')  # longest valid address is 15 bytes, longer ones fail below
+    except UnicodeEncodeError:
+        raw = np.asarray([v if v.isascii() else "" for v in values], dtype='S16')
+    n = len(raw)
+    chars = raw.view(np.uint8).reshape(n, 16)
+    columns = chars.T.copy()  # one contiguous row per character position
+    is_digit = (columns - np.uint8(48)) < 10
+    is_dot = columns == 46
+    length = 16 - (columns == 0).sum(axis=0, dtype=np.int32)
+    inside = np.arange(16, dtype=np.int32)[:, None] < length
+    # Only digits and dots before the NUL padding (an embedded NUL fails this too)
+    valid = (columns[15] == 0) & ~(inside & ~(is_digit | is_dot)).any(axis=0)
+    dot_count = np.cumsum(is_dot & inside, axis=0, dtype=np.uint8)
+    valid &= dot_count[15] == 3
+    # Octet k spans the characters between dot k-1 and dot k
+    bounds = [np.full(n, -1, dtype=np.int32)]
+    bounds += [(dot_count < k).sum(axis=0, dtype=np.int32) for k in (1, 2, 3)]
+    bounds.append(length)
+    flat = chars.ravel()
+    row_start = np.arange(0, 16 * n, 16, dtype=np.int64)
+    result = np.zeros(n, dtype=np.uint32)
+    for k in range(4):
+        start = bounds[k] + 1
+        count = bounds[k + 1] - start
+        d0, d1, d2 = ((flat[row_start + np.minimum(start + i, 15)] - np.uint8(48)).astype(np.uint32)
+                      for i in range(3))
+        octet = np.where(count == 1, d0, np.where(count == 2, d0 * 10 + d1, d0 * 100 + d1 * 10 + d2))
+        valid &= (count >= 1) & (count <= 3) & (octet <= 255) & ~((count > 1) & (d0 == 0))
+        result = (result << 8) | octet
+    return np.where(valid, result, 0).astype(np.uint32), valid
+
+def parse_ip_array(values):
+    """Bulk parse to (version, hi, lo) arrays; version 0 marks invalid, IPv4 is ::ffff:a.b.c.d"""
+    values = list(values)
+    if np is None:
+        pairs = [pack_ip_pair(v) if isinstance(v, str) else None for v in values]
+        versions = [0 if p is None else (4 if p[0] == 0 and p[1] >> 32 == 0xFFFF else 6) for p in pairs]
+        return versions, [p[0] if p else 0 for p in pairs], [p[1] if p else 0 for p in pairs]
+    v4, is_v4 = parse_ipv4_array([v if isinstance(v, str) else "" for v in values])
+    versions = np.where(is_v4, 4, 0).astype(np.uint8)
+    hi = np.zeros(len(values), dtype=np.uint64)
+    lo = np.where(is_v4, np.uint64(IPV4_MAPPED_PREFIX) | v4.astype(np.uint64), 0).astype(np.uint64)
+    for i in np.flatnonzero(~is_v4):
+        value = values[i]
+        halves = parse_ipv6(value) if isinstance(value, str) and ':' in value else None
+        if halves:
+            versions[i] = 6
+            hi[i], lo[i] = halves
+    return versions, hi, lo
+
+def ip_network_range(prefix):
+    """(first, last) 128-bit ints of a CIDR prefix in the ::ffff:a.b.c.d space"""
+    network = ipaddress.ip_network(prefix, strict=False)
+    first, last = int(network.network_address), int(network.broadcast_address)
+    if network.version == 4:
+        return IPV4_MAPPED_PREFIX | first, IPV4_MAPPED_PREFIX | last
+    return first, last
 
 def get_timestamp():
     from datetime import datetime
@@ -0,0 +1,253 @@
+"""Multi-worker honeypot: N processes accepting on one port, one aggregated view of their events.
+
+    python honeypot_fleet.py --workers 4 [--port 8080] [--dashboard-port 5000]
+
+Every worker binds the port with SO_REUSEPORT, so the kernel spreads connections across
+them, and serves its own HoneypotService built with the fleet's Fernet key. Workers keep
+no attack state: each attack and request is sent as one datagram to a Unix socket where
+the parent process applies it, in arrival order, to a single HoneypotService that the
+dashboard reads like a local one. Rate limiting stays per worker, so a client gets up to
+`workers` times the single process limit; every STATS_INTERVAL seconds each worker reports
+its forwarder and rate limiter counters, which the fleet sums for the dashboard.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+from cryptography.fernet import Fernet
+from werkzeug.serving import make_server
+
+from honeypot_service import HoneypotService
+from instrumentation import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+MAX_DATAGRAM = 65536
+RECEIVE_BUFFER = 4 * 1024 * 1024  # absorbs bursts while the aggregator thread catches up
+STATS_INTERVAL = 5  # seconds between worker stats datagrams
+
+FLEET_EVENTS = REGISTRY.counter(
+    'honeypot_fleet_events_total', 'Events received from honeypot fleet workers', ['kind'])
+
+
+def reuseport_socket(host, port, backlog=1024):
+    """Listening TCP socket that other processes can bind to the same address"""
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise Exception("SO_REUSEPORT is not available on this platform")
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+class FleetForwarder:
+    """Worker side: sends attacks and request features to the aggregator socket, never blocks"""
+
+    def __init__(self, socket_path, worker):
+        self.socket_path = socket_path
+        self.worker = worker
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, message):
+        message["w"] = self.worker
+        data = json.dumps(message, separators=(',', ':')).encode()
+        if len(data) > MAX_DATAGRAM:
+            self.dropped += 1
+            return
+        try:
+            self.sock.sendto(data, self.socket_path)
+            self.sent += 1
+        except OSError:
+            # Aggregator busy or gone: drop rather than stall the request
+            self.dropped += 1
+
+    def attack(self, attack_entry):
+        """HoneypotService.on_attack"""
+        self.send({"k": "attack", "e": attack_entry})
+
+    def record_request(self, ip, path, status, port=None):
+        """Stands in for the FeaturePipeline of the worker's HoneypotService"""
+        self.send({"k": "request", "ip": ip, "path": path, "status": status, "port": port})
+
+    def stats(self, rate_limiter):
+        """Report this worker's counters (cumulative, so a lost report is not a lost count)"""
+        self.send({"k": "stats", "sent": self.sent, "dropped": self.dropped, "rl": rate_limiter.get_stats()})
+
+    def report_stats(self, rate_limiter, interval=STATS_INTERVAL):
+        """Worker thread: send stats every `interval` seconds"""
+        while True:
+            self.stats(rate_limiter)
+            time.sleep(interval)
+
+
+def run_worker(worker, host, port, encryption_key, socket_path):
+    """Worker process: one HoneypotService on the shared port"""
+    logging.basicConfig(level=logging.INFO)
+    service = HoneypotService(encryption_key=encryption_key)
+    forwarder = FleetForwarder(socket_path, worker)
+    service.on_attack = forwarder.attack
+    service.feature_pipeline = forwarder
+    threading.Thread(target=forwarder.report_stats, args=(service.rate_limiter,), name="fleet-stats",
+                     daemon=True).start()
+    listener = reuseport_socket(host, port)
+    server = make_server(host, port, service.app, threaded=True, fd=listener.fileno())
+    logger.info(f"Honeypot worker {worker} (pid {os.getpid()}) serving on {host}:{port}")
+    server.serve_forever()
+
+
+class HoneypotFleet:
+    """Starts the workers and aggregates their events into `service`"""
+
+    def __init__(self, workers=4, host='0.0.0.0', port=8080, socket_path=None, encryption_key=None, clock=None):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path or os.path.join(tempfile.gettempdir(), f"honeypot-fleet-{port}.sock")
+        self.encryption_key = encryption_key or Fernet.generate_key()
+        self.service = HoneypotService(clock=clock, encryption_key=self.encryption_key)  # the aggregated view
+        self.service.fleet = self
+        self.processes = []
+        self.sock = None
+        self.receiver_thread = None
+        self.is_running = False
+        self.worker_stats = {}  # worker -> {"attacks", "requests", "last_seen", "sent", "dropped", "rate_limiter"}
+        self.stats_lock = threading.Lock()  # the receiver thread adds workers while the dashboard reads
+        self.malformed = 0
+
+    def start(self):
+        if self.is_running:
+            return
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        self.sock.bind(self.socket_path)
+        self.sock.settimeout(0.5)
+        self.is_running = True
+        self.receiver_thread = threading.Thread(target=self._receive_loop, name="honeypot-fleet", daemon=True)
+        self.receiver_thread.start()
+
+        # spawn: never fork a process that is running server threads
+        context = multiprocessing.get_context('spawn')
+        for worker in range(self.workers):
+            process = context.Process(target=run_worker, name=f"honeypot-worker-{worker}", daemon=True,
+                                      args=(worker, self.host, self.port, self.encryption_key, self.socket_path))
+            process.start()
+            self.processes.append(process)
+        logger.info(f"Honeypot fleet of {self.workers} workers on {self.host}:{self.port}")
+
+    def stop(self, timeout=5.0):
+        self.is_running = False
+        for process in self.processes:
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            process.join(max(0, deadline - time.monotonic()))
+        self.processes = []
+        if self.receiver_thread:
+            self.receiver_thread.join(timeout=1)
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _receive_loop(self):
+        while self.is_running:
+            try:
+                data = self.sock.recv(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                self.handle(json.loads(data))
+            except Exception as e:
+                self.malformed += 1
+                logger.error(f"Bad honeypot fleet message: {e}")
+
+    def handle(self, message):
+        """Apply one worker event to the aggregated service (receiver thread only)"""
+        kind = message["k"]
+        with self.stats_lock:
+            stats = self.worker_stats.get(message["w"])
+            if stats is None:
+                stats = self.worker_stats[message["w"]] = {"attacks": 0, "requests": 0, "last_seen": None,
+                                                           "sent": 0, "dropped": 0, "rate_limiter": None}
+            stats["last_seen"] = self.service.clock.now().isoformat()
+            if kind == "attack":
+                stats["attacks"] += 1
+            elif kind == "request":
+                stats["requests"] += 1
+            elif kind == "stats":
+                stats["sent"], stats["dropped"], stats["rate_limiter"] = message["sent"], message["dropped"], message["rl"]
+        FLEET_EVENTS.labels(kind).inc()
+        if kind == "attack":
+            self.service.record_attack(message["e"])
+        elif kind == "request":
+            if self.service.feature_pipeline:
+                self.service.feature_pipeline.record_request(message["ip"], message["path"], message["status"],
+                                                             port=message["port"])
+
+    def get_stats(self):
+        with self.stats_lock:
+            per_worker = {str(worker): dict(stats) for worker, stats in self.worker_stats.items()}
+        # Each worker limits on its own, so the fleet's limiter view is the sum of theirs
+        rate_limiter = {"sources": 0, "allowed": 0, "limited": 0}
+        for stats in per_worker.values():
+            for key, value in (stats["rate_limiter"] or {}).items():
+                rate_limiter[key] = rate_limiter.get(key, 0) + value
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for process in self.processes if process.is_alive()),
+            "port": self.port,
+            "malformed": self.malformed,
+            "sent": sum(stats["sent"] for stats in per_worker.values()),
+            "dropped": sum(stats["dropped"] for stats in per_worker.values()),
+            "rate_limiter": rate_limiter,
+            "per_worker": per_worker
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the honeypot as several processes sharing one port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--socket", help="aggregator Unix socket path")
+    parser.add_argument("--dashboard-port", type=int, help="also serve the dashboard on the aggregated view")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fleet = HoneypotFleet(args.workers, args.host, args.port, args.socket)
+    fleet.start()
+    try:
+        if args.dashboard_port:
+            import dashboard
+            from firewall_engine import DynamicFirewall
+            from attack_simulator import AttackSimulator
+            dashboard.start_dashboard(DynamicFirewall(dashboard.socketio), fleet.service,
+                                      AttackSimulator(f"http://localhost:{args.port}"), host=args.host,
+                                      port=args.dashboard_port, allow_unsafe_werkzeug=True)
+        else:
+            while True:
+                time.sleep(60)
+                stats = fleet.get_stats()
+                logger.info(f"Fleet: {stats['alive']}/{stats['workers']} workers alive, "
+                            f"{len(fleet.service.attack_log)} attacks")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fleet.stop()
@@ -2,10 +2,17 @@ from flask import Flask, request, jsonify, render_template_string
 from cryptography.fernet import Fernet
 import logging
 import json
-from datetime import datetime
+from process_metrics import record_event
+from instrumentation import REGISTRY, timed_emit
+from helpers import pack_ip_pair
+from rate_limiter import TokenBucketLimiter
+from clock import SYSTEM_CLOCK
 
 logger = logging.getLogger(__name__)
 
+REQUEST_SECONDS = REGISTRY.histogram(
+    'honeypot_request_seconds', 'Latency of honeypot route handlers', ['route'])
+
 # HTML template for fake login page
 LOGIN_TEMPLATE = """
 <!DOCTYPE html>
@@ -37,17 +44,32 @@ LOGIN_TEMPLATE = """
 """
 
 class HoneypotService:
-    def __init__(self, socketio=None):
+    def __init__(self, socketio=None, clock=None, encryption_key=None):
         self.app = Flask(__name__)
-        self.encryption_key = Fernet.generate_key()
+        self.encryption_key = encryption_key or Fernet.generate_key()  # shared by all workers of a fleet
         self.cipher = Fernet(self.encryption_key)
         self.attack_log = []
+        self.source_counts = {}  # packed (hi, lo) source address -> attack count
         self.socketio = socketio
+        self.feature_pipeline = None  # FeaturePipeline fed with every request
+        self.on_attack = None  # callback(attack_entry) replacing local storage, set in fleet workers
+        self.fleet = None  # HoneypotFleet reporting into this instance
+        self.clock = clock or SYSTEM_CLOCK
+        self.rate_limiter = TokenBucketLimiter(rate=5, burst=20, name="honeypot", clock=self.clock)
+        self.rate_limiter.install(self.app)
         self.setup_routes()
     
     def setup_routes(self):
         """Setup honeypot routes"""
+        @self.app.after_request
+        def record_features(response):
+            if self.feature_pipeline:
+                self.feature_pipeline.record_request(request.remote_addr, request.path,
+                                                     response.status_code, port=8080)
+            return response
+        
         @self.app.route('/', methods=['GET', 'POST'])
+        @REQUEST_SECONDS.labels('/').time()
         def fake_login():
             client_ip = request.remote_addr
             if request.method == 'POST':
@@ -58,7 +80,7 @@ class HoneypotService:
                 fake_data = {
                     "username": username,
                     "password": password,
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": self.clock.now().isoformat(),
                     "user_agent": request.headers.get('User-Agent', ''),
                     "client_ip": client_ip
                 }
@@ -77,6 +99,7 @@ class HoneypotService:
             return render_template_string(LOGIN_TEMPLATE)
         
         @self.app.route('/api/users', methods=['GET'])
+        @REQUEST_SECONDS.labels('/api/users').time()
         def fake_api():
             client_ip = request.remote_addr
             self.log_attack(client_ip, "API probing", "Attempted to access user API")
@@ -93,6 +116,7 @@ class HoneypotService:
             return jsonify({"data": encrypted_data, "status": "success"})
         
         @self.app.route('/admin', methods=['GET'])
+        @REQUEST_SECONDS.labels('/admin').time()
         def fake_admin():
             client_ip = request.remote_addr
             self.log_attack(client_ip, "Admin portal access", "Attempted to access admin portal")
@@ -105,18 +129,30 @@ class HoneypotService:
     def log_attack(self, ip, attack_type, details):
         """Log attack attempts to the honeypot"""
         attack_entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self.clock.now().isoformat(),
             "ip": ip,
             "type": attack_type,
             "details": details
         }
+        logger.warning("Honeypot attack: %s from %s - %s", attack_type, ip, details)
+        if self.on_attack:
+            self.on_attack(attack_entry)
+        else:
+            self.record_attack(attack_entry)
+    
+    def record_attack(self, attack_entry):
+        """Store an attack (logged here or reported by a fleet worker) and notify the dashboard"""
         self.attack_log.append(attack_entry)
-        logger.warning(f"Honeypot attack: {attack_type} from {ip} - {details}")
+        ip = attack_entry["ip"]
+        source = pack_ip_pair(ip, cached=True) if ip else None
+        if source is not None:
+            self.source_counts[source] = self.source_counts.get(source, 0) + 1
+        record_event("honeypot")
         
         # Notify dashboard of the new attack
         if self.socketio:
-            self.socketio.emit('honeypot_attack', attack_entry)
-            self.socketio.emit('honeypot_update', self.get_stats())
+            timed_emit(self.socketio, 'honeypot_attack', attack_entry)
+            timed_emit(self.socketio, 'honeypot_update', self.get_stats())
     
     def start(self):
         """Start the honeypot service"""
@@ -125,11 +161,18 @@ class HoneypotService:
     
     def get_stats(self):
         """Return honeypot statistics for dashboard"""
-        return {
+        stats = {
             "total_attacks": len(self.attack_log),
             "recent_attacks": self.attack_log[-10:] if self.attack_log else [],
-            "attack_types": self._count_attack_types()
+            "attack_types": self._count_attack_types(),
+            "unique_sources": len(self.source_counts),
+            "rate_limiter": self.rate_limiter.get_stats()
         }
+        if self.fleet is not None:
+            # This instance serves no requests, the workers' limiters are the real ones
+            stats["fleet"] = self.fleet.get_stats()
+            stats["rate_limiter"] = stats["fleet"]["rate_limiter"]
+        return stats
     
     def _count_attack_types(self):
         """Count occurrences of each attack type"""
@@ -0,0 +1,291 @@
+import threading
+import time
+import functools
+from bisect import bisect_left
+
+# Latency buckets in seconds, from 50us up to 10s
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_LIVE_SHARDS = 64  # fold shards of finished threads once this many exist
+
+
+class _ShardSet:
+    """Per-thread value shards: writers never share state, readers merge at scrape time"""
+
+    def __init__(self, size):
+        self.size = size
+        self.local = threading.local()
+        self.shards = []  # [(thread, shard)]
+        self.retired = [0.0] * size  # merged values of threads that have exited
+        self.lock = threading.Lock()  # only taken on shard creation and scrape
+
+    def get(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = [0.0] * self.size
+            self.local.shard = shard
+            with self.lock:
+                self.shards.append((threading.current_thread(), shard))
+                if len(self.shards) > MAX_LIVE_SHARDS:
+                    self._fold_dead()
+            return shard
+
+    def _fold_dead(self):
+        """Merge shards of finished threads into the retired totals (lock held)"""
+        live = []
+        for thread, shard in self.shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                for i, value in enumerate(shard):
+                    self.retired[i] += value
+        self.shards = live
+
+    def merged(self):
+        with self.lock:
+            self._fold_dead()
+            totals = list(self.retired)
+            for _, shard in self.shards:
+                for i, value in enumerate(shard):
+                    totals[i] += value
+        return totals
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), **kwargs):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.kwargs = kwargs
+        self.children = {}
+        self.children_lock = threading.Lock()
+        self.label_values = ()
+
+    def labels(self, *values, **kwvalues):
+        """Return the child metric for a set of label values"""
+        if kwvalues:
+            values = tuple(kwvalues[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            with self.children_lock:
+                child = self.children.get(key)
+                if child is None:
+                    child = self.__class__(self.name, self.documentation, **self.kwargs)
+                    child.label_values = key
+                    self.children[key] = child
+        return child
+
+    def _series(self):
+        """Yield (label_values, metric) pairs to render"""
+        if self.labelnames:
+            for key, child in sorted(self.children.items()):
+                yield key, child
+        else:
+            yield (), self
+
+    def _label_text(self, values, extra=None):
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = ['%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                   for k, v in pairs]
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for values, metric in self._series():
+            lines.extend(metric._render_samples(self, values))
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), **kwargs):
+        super().__init__(name, documentation, labelnames, **kwargs)
+        self.shards = _ShardSet(1)
+
+    def inc(self, amount=1):
+        self.shards.get()[0] += amount
+
+    def value(self):
+        return self.shards.merged()[0]
+
+    def _render_samples(self, parent, values):
+        return [f"{self.name}{parent._label_text(values)} {_format(self.value())}"]
+
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), **kwargs):
+        super().__init__(name, documentation, labelnames, **kwargs)
+        self.current = 0.0
+        self.function = None
+
+    def set(self, value):
+        self.current = value
+
+    def set_function(self, function):
+        """Compute the value at scrape time instead of storing it"""
+        self.function = function
+
+    def value(self):
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return float('nan')
+        return self.current
+
+    def _render_samples(self, parent, values):
+        return [f"{self.name}{parent._label_text(values)} {_format(self.value())}"]
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(name, documentation, labelnames, buckets=buckets, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Shard layout: one slot per bucket, one for +Inf, then the sum
+        self.shards = _ShardSet(len(self.buckets) + 2)
+        self.sum_index = len(self.buckets) + 1
+
+    def observe(self, value):
+        shard = self.shards.get()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[self.sum_index] += value
+
+    def time(self):
+        """Context manager / decorator observing the elapsed seconds"""
+        return _Timer(self)
+
+    def snapshot(self):
+        """Return (cumulative bucket counts, count, sum)"""
+        totals = self.shards.merged()
+        cumulative = []
+        running = 0
+        for count in totals[:self.sum_index]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[self.sum_index]
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside the bucket"""
+        cumulative, count, _ = self.snapshot()
+        if not count:
+            return 0.0
+        rank = q * count
+        lower = 0.0
+        previous = 0
+        for i, upper in enumerate(self.buckets):
+            if cumulative[i] >= rank:
+                in_bucket = cumulative[i] - previous
+                if not in_bucket:
+                    return upper
+                return lower + (upper - lower) * (rank - previous) / in_bucket
+            lower = upper
+            previous = cumulative[i]
+        return self.buckets[-1]
+
+    def _render_samples(self, parent, values):
+        cumulative, count, total = self.snapshot()
+        lines = []
+        for upper, value in zip(self.buckets, cumulative):
+            lines.append(f"{self.name}_bucket{parent._label_text(values, ('le', _format(upper)))} {_format(value)}")
+        lines.append(f"{self.name}_bucket{parent._label_text(values, ('le', '+Inf'))} {_format(count)}")
+        lines.append(f"{self.name}_sum{parent._label_text(values)} {_format(total)}")
+        lines.append(f"{self.name}_count{parent._label_text(values)} {_format(count)}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, function):
+        histogram = self.histogram
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+
+
+def _format(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value != value:
+        return 'NaN'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self.metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.metric_type}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SOCKET_EMIT_SECONDS = REGISTRY.histogram(
+    'socketio_emit_seconds', 'Time spent in Socket.IO emit calls', ['event'])
+
+
+def timed_emit(socketio, event, *args, **kwargs):
+    """socketio.emit with its latency recorded per event name"""
+    start = time.perf_counter()
+    try:
+        return socketio.emit(event, *args, **kwargs)
+    finally:
+        SOCKET_EMIT_SECONDS.labels(event).observe(time.perf_counter() - start)
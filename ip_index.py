@@ -0,0 +1,265 @@
+import time
+import threading
+import ipaddress
+import logging
+from helpers import pack_ip_cached, format_ip
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = {4: 32, 6: 128}
+
+
+def parse_ip(value):
+    """(version, int, prefix_length) for an address or CIDR prefix string"""
+    if '/' in value:
+        network = ipaddress.ip_network(value, strict=False)
+        return network.version, int(network.network_address), network.prefixlen
+    packed = pack_ip_cached(value)
+    if packed is None:
+        raise ValueError(f"Invalid IP address: {value}")
+    return packed[0], packed[1], WIDTHS[packed[0]]
+
+
+def format_prefix(version, key, length):
+    return f"{format_ip(version, key)}/{length}"
+
+
+def _mask(key, length, width):
+    return key & (((1 << length) - 1) << (width - length)) if length else 0
+
+
+def _common_length(a, b, limit, width):
+    """Number of leading bits a and b share, capped at `limit`"""
+    diff = a ^ b
+    if diff == 0:
+        return limit
+    return min(width - diff.bit_length(), limit)
+
+
+class _Node:
+    __slots__ = ('key', 'length', 'children', 'total', 'hosts', 'last_seen', 'aggregated', 'blocked')
+
+    def __init__(self, key, length):
+        self.key = key
+        self.length = length
+        self.children = [None, None]
+        self.total = 0  # attempts recorded in this subtree
+        self.hosts = 0  # distinct host addresses seen in this subtree
+        self.last_seen = 0.0
+        self.aggregated = False  # leaf standing for the whole prefix
+        self.blocked = False
+
+
+class IPIndex:
+    """Patricia trie per address family with per-prefix counters.
+
+    Every recorded address adds to all prefixes on its path, so subnet totals are
+    O(prefix length) lookups. A prefix at `aggregate_prefix` that collects
+    `aggregate_hosts` distinct hosts is collapsed into one leaf, and when the trie
+    exceeds `max_nodes` it is rebuilt keeping the most recently seen leaves.
+    """
+
+    def __init__(self, max_nodes=100000, aggregate_prefix=None, aggregate_hosts=16):
+        self.max_nodes = max_nodes
+        self.aggregate_prefix = aggregate_prefix or {4: 24, 6: 64}
+        self.aggregate_hosts = aggregate_hosts
+        self.roots = {4: _Node(0, 0), 6: _Node(0, 0)}
+        self.blocked = {}  # prefix string -> (version, key, length)
+        self.node_count = 2
+        self.aggregations = 0
+        self.prunes = 0
+        self.lock = threading.Lock()
+
+    def _insert(self, version, key, length):
+        """Walk to (creating if needed) the node for key/length; returns the path from the root.
+
+        Stops early at an aggregated leaf covering the key.
+        """
+        width = WIDTHS[version]
+        node = self.roots[version]
+        path = [node]
+        while node.length < length and not node.aggregated:
+            bit = (key >> (width - 1 - node.length)) & 1
+            child = node.children[bit]
+            if child is None:
+                child = _Node(_mask(key, length, width), length)
+                node.children[bit] = child
+                self.node_count += 1
+                path.append(child)
+                break
+            common = _common_length(key, child.key, min(child.length, length), width)
+            if common == child.length:
+                node = child
+                path.append(node)
+                continue
+            # Split the compressed edge at the first differing bit (or at `length`)
+            middle = _Node(_mask(key, common, width), common)
+            middle.total, middle.hosts, middle.last_seen = child.total, child.hosts, child.last_seen
+            middle.children[(child.key >> (width - 1 - common)) & 1] = child
+            node.children[bit] = middle
+            self.node_count += 1
+            path.append(middle)
+            if common < length:
+                leaf = _Node(_mask(key, length, width), length)
+                middle.children[(key >> (width - 1 - common)) & 1] = leaf
+                self.node_count += 1
+                path.append(leaf)
+            break
+        return path
+
+    def record(self, ip, weight=1, now=None):
+        """Count an attempt from `ip` and return its reputation (see lookup)"""
+        now = time.time() if now is None else now
+        version, key, length = parse_ip(ip)
+        with self.lock:
+            path = self._insert(version, key, length)
+            leaf = path[-1]
+            new_host = leaf.total == 0 and not leaf.aggregated and not leaf.children[0] and not leaf.children[1]
+            for node in path:
+                node.total += weight
+                node.hosts += new_host
+                node.last_seen = now
+            self._maybe_aggregate(version, path)
+            if self.node_count > self.max_nodes:
+                self._prune()
+            return self._lookup(version, key, length)
+
+    def _maybe_aggregate(self, version, path):
+        """Collapse the aggregation-level prefix on `path` once it has enough distinct hosts"""
+        level = self.aggregate_prefix[version]
+        for node in path:
+            if node.length >= level:
+                if not node.aggregated and node.hosts >= self.aggregate_hosts:
+                    self._collapse(node, level, WIDTHS[version])
+                return
+
+    def _collapse(self, node, length, width):
+        removed = self._subtree_size(node) - 1
+        node.children = [None, None]
+        node.key = _mask(node.key, length, width)
+        node.length = length
+        node.aggregated = True
+        self.node_count -= removed
+        self.aggregations += 1
+
+    def _subtree_size(self, node):
+        size = 0
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            size += 1
+            stack.extend(child for child in current.children if child is not None)
+        return size
+
+    def _leaves(self, version):
+        stack = [self.roots[version]]
+        while stack:
+            node = stack.pop()
+            children = [child for child in node.children if child is not None]
+            if not children and node.length:
+                yield node
+            stack.extend(children)
+
+    def _prune(self):
+        """Rebuild with the most recently seen leaves, down to about half of max_nodes"""
+        leaves = [(version, leaf) for version in self.roots for leaf in self._leaves(version)]
+        leaves.sort(key=lambda item: item[1].last_seen, reverse=True)
+        # A leaf costs at most two nodes (itself plus one split)
+        keep = leaves[:max(1, self.max_nodes // 4)]
+        self.roots = {4: _Node(0, 0), 6: _Node(0, 0)}
+        self.node_count = 2
+        for version, leaf in keep:
+            path = self._insert(version, leaf.key, leaf.length)
+            new = path[-1]
+            new.aggregated = leaf.aggregated
+            for node in path:
+                node.total += leaf.total
+                node.hosts += leaf.hosts
+                node.last_seen = max(node.last_seen, leaf.last_seen)
+        for version, key, length in self.blocked.values():
+            self._insert(version, key, length)[-1].blocked = True
+        self.prunes += 1
+        logger.info("IP index pruned to %s nodes (%s leaves dropped)", self.node_count, len(leaves) - len(keep))
+
+    def _lookup(self, version, key, length):
+        width = WIDTHS[version]
+        level = self.aggregate_prefix[version]
+        node = self.roots[version]
+        match = None
+        subnet = None
+        blocked = None
+        while node is not None:
+            if node.length and _common_length(key, node.key, node.length, width) < node.length:
+                break
+            if node.blocked and blocked is None:
+                blocked = format_prefix(version, node.key, node.length)
+            if subnet is None and node.length >= level:
+                subnet = node
+            match = node
+            if node.length >= length or node.aggregated:
+                break
+            node = node.children[(key >> (width - 1 - node.length)) & 1]
+
+        host_count = match.total if match is not None and (match.length == length or match.aggregated) else 0
+        return {
+            "prefix": format_prefix(version, match.key, match.length) if match is not None and match.length else None,
+            "count": host_count,
+            "subnet": format_prefix(version, _mask(key, level, width), level),
+            "subnet_count": subnet.total if subnet is not None else 0,
+            "subnet_hosts": subnet.hosts if subnet is not None else 0,
+            "blocked": blocked
+        }
+
+    def lookup(self, ip):
+        """Longest-prefix reputation of `ip`: its own count plus its aggregation subnet's totals"""
+        version, key, length = parse_ip(ip)
+        with self.lock:
+            return self._lookup(version, key, length)
+
+    def block(self, prefix):
+        """Mark a prefix (or single address) as blocked"""
+        version, key, length = parse_ip(prefix)
+        name = format_prefix(version, key, length)
+        with self.lock:
+            self._insert(version, key, length)[-1].blocked = True
+            self.blocked[name] = (version, key, length)
+        return name
+
+    def unblock(self, prefix):
+        version, key, length = parse_ip(prefix)
+        name = format_prefix(version, key, length)
+        with self.lock:
+            if self.blocked.pop(name, None):
+                self._insert(version, key, length)[-1].blocked = False
+
+    def contains(self, prefix, ip):
+        """True if `ip` (address or prefix) lies inside `prefix`"""
+        version, key, length = parse_ip(prefix)
+        ip_version, ip_key, ip_length = parse_ip(ip)
+        return (version == ip_version and ip_length >= length
+                and _mask(ip_key, length, WIDTHS[version]) == _mask(key, length, WIDTHS[version]))
+
+    def hot_prefixes(self, limit=10):
+        """Aggregation-level prefixes with the most attempts"""
+        with self.lock:
+            hot = []
+            for version, root in self.roots.items():
+                level = self.aggregate_prefix[version]
+                stack = [root]
+                while stack:
+                    node = stack.pop()
+                    if node.length >= level:
+                        hot.append((node.total, node.hosts, format_prefix(version, _mask(node.key, level, WIDTHS[version]), level)))
+                        continue
+                    stack.extend(child for child in node.children if child is not None)
+            hot.sort(reverse=True)
+            return [{"prefix": prefix, "count": total, "hosts": hosts} for total, hosts, prefix in hot[:limit]]
+
+    def get_stats(self):
+        return {
+            "nodes": self.node_count,
+            "max_nodes": self.max_nodes,
+            "aggregations": self.aggregations,
+            "prunes": self.prunes,
+            "blocked_prefixes": len(self.blocked)
+        }
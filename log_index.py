@@ -0,0 +1,329 @@
+import os
+import re
+import mmap
+import glob
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from helpers import pack_ip_pair, parse_ip_array, ip_network_range
+
+logger = logging.getLogger(__name__)
+
+# "2025-09-03 23:52:29,068 - __main__ - INFO - Firewall closed port 8080"
+APP_LINE = re.compile(
+    r'^(?P<ts>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),\d{3} - (?P<logger>\S+) - (?P<level>[A-Z]+) - (?P<message>.*)$')
+ATTACK_MESSAGE = re.compile(r'^Attack detected: (?P<type>.+?) from (?P<ip>\S+) on port (?P<port>\d+)')
+HONEYPOT_MESSAGE = re.compile(r'^Honeypot attack: (?P<type>.+?) from (?P<ip>\S+) - (?P<details>.*)')
+PORT_MESSAGE = re.compile(r'^Firewall (?P<action>closed|opened|opened additional) port (?P<port>\d+)')
+# '127.0.0.1 - - [03/Sep/2025 23:52:03] "GET /api/status HTTP/1.1" 200 -'
+ACCESS_MESSAGE = re.compile(
+    r'(?P<ip>[0-9A-Fa-f:.]+) - - \[(?P<ts>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" (?P<status>\d{3})')
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+
+MONTHS = {name: i for i, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+BUCKET_SECONDS = 3600
+INSERT_BATCH = 5000
+SCHEMA_VERSION = 2  # 2: packed ip_hi/ip_lo columns
+SIGN_FLIP = 1 << 63  # maps uint64 onto SQLite's signed INTEGER keeping the order
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    identity TEXT UNIQUE,
+    path TEXT,
+    indexed_bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER,
+    offset INTEGER,
+    ts INTEGER,
+    bucket INTEGER,
+    kind TEXT,
+    ip TEXT,
+    ip_hi INTEGER,
+    ip_lo INTEGER,
+    port INTEGER,
+    attack_type TEXT,
+    method TEXT,
+    path TEXT,
+    status INTEGER
+);
+CREATE INDEX IF NOT EXISTS events_ip ON events (ip_hi, ip_lo, ts);
+CREATE INDEX IF NOT EXISTS events_port ON events (port, ts);
+CREATE INDEX IF NOT EXISTS events_type ON events (attack_type, ts);
+CREATE INDEX IF NOT EXISTS events_bucket ON events (bucket, kind);
+"""
+
+
+class LogParser:
+    def __init__(self):
+        self._ts_cache = {}
+
+    def _epoch(self, text, werkzeug=False):
+        """Parse a timestamp to epoch seconds, cached per distinct second"""
+        cached = self._ts_cache.get(text)
+        if cached is not None:
+            return cached
+        if len(self._ts_cache) > 100000:
+            self._ts_cache.clear()
+        if werkzeug:
+            # 03/Sep/2025 23:52:03
+            value = datetime(int(text[7:11]), MONTHS[text[3:6]], int(text[0:2]),
+                             int(text[12:14]), int(text[15:17]), int(text[18:20])).timestamp()
+        else:
+            # 2025-09-03 23:52:29
+            value = datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                             int(text[11:13]), int(text[14:16]), int(text[17:19])).timestamp()
+        value = int(value)
+        self._ts_cache[text] = value
+        return value
+
+    def parse(self, line):
+        """Parse one line into an event dict, or None for lines we do not index"""
+        app = APP_LINE.match(line)
+        message = app.group('message') if app else line
+        ts = self._epoch(app.group('ts')) if app else None
+
+        if app:
+            match = ATTACK_MESSAGE.match(message)
+            if match:
+                return {"ts": ts, "kind": "attack", "ip": match.group('ip'), "port": int(match.group('port')),
+                        "attack_type": match.group('type')}
+            match = HONEYPOT_MESSAGE.match(message)
+            if match:
+                return {"ts": ts, "kind": "honeypot", "ip": match.group('ip'), "attack_type": match.group('type')}
+            match = PORT_MESSAGE.match(message)
+            if match:
+                kind = "port_closed" if match.group('action') == 'closed' else "port_opened"
+                return {"ts": ts, "kind": kind, "port": int(match.group('port'))}
+
+        if '" ' in message:
+            match = ACCESS_MESSAGE.search(ANSI_ESCAPE.sub('', message))
+            if match:
+                return {"ts": ts if ts is not None else self._epoch(match.group('ts'), werkzeug=True),
+                        "kind": "access", "ip": match.group('ip'), "method": match.group('method'),
+                        "path": match.group('path'), "status": int(match.group('status'))}
+        return None
+
+
+class LogIndex:
+    def __init__(self, db_path="data/log_index.db"):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            # The index is derived data: rebuild it from the logs instead of migrating
+            self.db.executescript("DROP TABLE IF EXISTS events; DROP TABLE IF EXISTS files;")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.executescript(SCHEMA)
+        self.parser = LogParser()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def _file_identity(self, path):
+        """Identify a log by inode and first line so rotation (rename) keeps its progress"""
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            head = f.readline(4096)
+        if not head.endswith(b'\n'):
+            return None  # first line still being written
+        return f"{stat.st_dev}:{stat.st_ino}:{hashlib.sha1(head).hexdigest()}"
+
+    def index_file(self, path):
+        """Index complete lines appended since the last run, returns the number of new events"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return 0
+        identity = self._file_identity(path)
+        if identity is None:
+            return 0
+        with self.lock:
+            row = self.db.execute("SELECT id, indexed_bytes FROM files WHERE identity = ?", (identity,)).fetchone()
+            if row:
+                file_id, start = row
+                self.db.execute("UPDATE files SET path = ? WHERE id = ?", (path, file_id))
+            else:
+                file_id = self.db.execute("INSERT INTO files (identity, path, indexed_bytes) VALUES (?, ?, 0)",
+                                          (identity, path)).lastrowid
+                start = 0
+
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size <= start:
+                    return 0
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    added, end = self._index_range(data, start, size, file_id)
+            self.db.execute("UPDATE files SET indexed_bytes = ? WHERE id = ?", (end, file_id))
+            self.db.commit()
+        return added
+
+    def _index_range(self, data, start, size, file_id):
+        rows = []
+        added = 0
+        position = start
+        parse = self.parser.parse
+        while position < size:
+            newline = data.find(b'\n', position, size)
+            if newline == -1:
+                break  # partial line, picked up on the next run
+            line = data[position:newline].decode('utf-8', 'replace').rstrip('\r')
+            event = parse(line)
+            if event:
+                ts = event["ts"]
+                rows.append((file_id, position, ts, ts // BUCKET_SECONDS, event["kind"], event.get("ip"),
+                             event.get("port"), event.get("attack_type"), event.get("method"),
+                             event.get("path"), event.get("status")))
+                if len(rows) >= INSERT_BATCH:
+                    self._insert(rows)
+                    added += len(rows)
+                    rows = []
+            position = newline + 1
+        if rows:
+            self._insert(rows)
+            added += len(rows)
+        return added, position
+
+    def _insert(self, rows):
+        # Parse the whole batch's addresses at once into (hi, lo) halves of the IPv6 (::ffff:v4) space
+        versions, his, los = parse_ip_array([row[5] for row in rows])
+        packed = [row[:6] + ((int(hi) - SIGN_FLIP, int(lo) - SIGN_FLIP) if version else (None, None)) + row[6:]
+                  for row, version, hi, lo in zip(rows, versions, his, los)]
+        self.db.executemany(
+            "INSERT INTO events (file_id, offset, ts, bucket, kind, ip, ip_hi, ip_lo, port, attack_type, method, "
+            "path, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", packed)
+
+    def index_logs(self, log_path):
+        """Index a log and its rotated siblings (oldest first)"""
+        rotated = [p for p in glob.glob(f"{glob.escape(log_path)}.*") if p.rsplit('.', 1)[-1].isdigit()]
+        rotated.sort(key=lambda p: int(p.rsplit('.', 1)[-1]), reverse=True)
+        total = 0
+        for path in rotated + [log_path]:
+            total += self.index_file(path)
+        return total
+
+    def follow(self, log_path, poll_interval=1.0):
+        """Keep the index up to date while the log grows and rotates"""
+        self.stop_event.clear()
+        while not self.stop_event.is_set():
+            try:
+                self.index_logs(log_path)
+            except Exception as e:
+                logger.error(f"Error indexing {log_path}: {e}")
+            self.stop_event.wait(poll_interval)
+
+    def start_follow(self, log_path, poll_interval=1.0):
+        thread = threading.Thread(target=self.follow, args=(log_path, poll_interval),
+                                  name="log-indexer", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _where(self, ip=None, port=None, attack_type=None, kind=None, start=None, end=None):
+        clauses = []
+        params = []
+        if ip is not None:
+            # An address or a CIDR prefix, matched on the packed columns
+            if '/' in ip:
+                first, last = ip_network_range(ip)
+            else:
+                pair = pack_ip_pair(ip)
+                if pair is None:
+                    raise ValueError(f"Invalid IP address: {ip}")
+                first = last = (pair[0] << 64) | pair[1]
+            clauses.append("(ip_hi, ip_lo) BETWEEN (?, ?) AND (?, ?)")
+            params += [(first >> 64) - SIGN_FLIP, (first & (SIGN_FLIP * 2 - 1)) - SIGN_FLIP,
+                       (last >> 64) - SIGN_FLIP, (last & (SIGN_FLIP * 2 - 1)) - SIGN_FLIP]
+        for column, value in (("port", port), ("attack_type", attack_type), ("kind", kind)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(int(_to_epoch(start)))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(int(_to_epoch(end)))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, limit=1000, **filters):
+        """Events matching ip/port/attack_type/kind/start/end, newest first"""
+        where, params = self._where(**filters)
+        with self.lock:
+            cursor = self.db.execute(
+                "SELECT e.ts, e.kind, e.ip, e.port, e.attack_type, e.method, e.path, e.status, f.path, e.offset "
+                f"FROM events e JOIN files f ON f.id = e.file_id{where} "
+                "ORDER BY e.ts DESC LIMIT ?", params + [limit])
+            rows = cursor.fetchall()
+        keys = ("ts", "kind", "ip", "port", "attack_type", "method", "path", "status", "file", "offset")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def count_by(self, field, limit=100, **filters):
+        """Top values of a field (ip, port, attack_type, kind, bucket) with counts"""
+        if field not in ("ip", "port", "attack_type", "kind", "bucket", "path", "status"):
+            raise ValueError(f"Cannot group by {field}")
+        where, params = self._where(**filters)
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {field}, COUNT(*) AS hits FROM events{where} GROUP BY {field} "
+                "ORDER BY hits DESC LIMIT ?", params + [limit]).fetchall()
+        return rows
+
+    def ips_for_port(self, port, start=None, end=None):
+        """Which IPs hit a port in a time range, e.g. ips_for_port(3389, start='24h')"""
+        return self.count_by("ip", port=port, kind="attack", start=start, end=end)
+
+    def close(self):
+        self.stop()
+        with self.lock:
+            self.db.close()
+
+
+def _to_epoch(value):
+    """Accept epoch seconds, datetime, ISO strings or relative ages like '24h' / '7d'"""
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str) and value[:-1].isdigit() and value[-1] in 'smhd':
+        unit = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}[value[-1]]
+        return (datetime.now() - timedelta(**{unit: int(value[:-1])})).timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index and query firewall.log")
+    parser.add_argument("log", nargs="?", default="firewall.log")
+    parser.add_argument("--db", default="data/log_index.db")
+    parser.add_argument("--ip", help="address or CIDR prefix, e.g. 10.0.0.0/8")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--type", dest="attack_type")
+    parser.add_argument("--kind")
+    parser.add_argument("--since", help="e.g. 24h, 7d or an ISO timestamp")
+    parser.add_argument("--until")
+    parser.add_argument("--group-by", help="ip, port, attack_type, kind, bucket, path or status")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    index = LogIndex(args.db)
+    added = index.index_logs(args.log)
+    print(f"Indexed {added} new events")
+    filters = dict(ip=args.ip, port=args.port, attack_type=args.attack_type, kind=args.kind,
+                   start=args.since, end=args.until)
+    if args.group_by:
+        for value, hits in index.count_by(args.group_by, limit=args.limit, **filters):
+            print(f"{value}\t{hits}")
+    else:
+        for event in index.query(limit=args.limit, **filters):
+            print(event)
+    index.close()
@@ -1,16 +1,260 @@
 import logging
 import os
+import sys
+import copy
+import json
+import time
+import atexit
+import threading
+from collections import deque
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            "timestamp": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RotatingFileSink:
+    """Append-only file with size and/or time based rotation (file.1 ... file.N)"""
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, rotate_interval=None, backup_count=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.stream = None
+        self.size = 0
+        self.opened_at = 0
+        self._open()
+
+    def _open(self):
+        self.stream = open(self.path, 'a', encoding='utf-8')
+        self.size = self.stream.tell()
+        self.opened_at = time.time()
+
+    def _should_rotate(self, incoming):
+        if self.max_bytes and self.size + incoming > self.max_bytes and self.size > 0:
+            return True
+        if self.rotate_interval and time.time() - self.opened_at >= self.rotate_interval:
+            return True
+        return False
+
+    def rotate(self):
+        """Shift file.N-1 -> file.N ... file -> file.1 and reopen"""
+        self.stream.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, text):
+        encoded_size = len(text.encode('utf-8'))
+        if self._should_rotate(encoded_size):
+            self.rotate()
+        self.stream.write(text)
+        self.size += encoded_size
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+
+class StreamSink:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+
+    def write(self, text):
+        self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class AsyncLogPipeline:
+    """Bounded record queue drained in batches by one background writer"""
+
+    def __init__(self, sinks, queue_size=10000, batch_size=256, flush_interval=0.5,
+                 drop_report_interval=5.0):
+        self.sinks = sinks  # [(sink, formatter)]
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_report_interval = drop_report_interval
+        self.records = deque()
+        self.not_empty = threading.Condition(threading.Lock())
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0}
+        self.pending_drops = 0
+        self.last_drop_report = 0
+        self.is_running = False
+        self.writer_thread = None
+
+    def enqueue(self, record):
+        """Called on the logging thread: O(1), never blocks on I/O"""
+        with self.not_empty:
+            if len(self.records) >= self.queue_size:
+                self.stats["dropped"] += 1
+                self.pending_drops += 1
+                return
+            self.records.append(record)
+            self.stats["enqueued"] += 1
+            if len(self.records) >= self.batch_size:
+                self.not_empty.notify()
+
+    def _take_batch(self):
+        with self.not_empty:
+            if len(self.records) < self.batch_size and self.is_running:
+                self.not_empty.wait(self.flush_interval)
+            batch = []
+            while self.records and len(batch) < self.batch_size:
+                batch.append(self.records.popleft())
+            drops = 0
+            now = time.monotonic()
+            if self.pending_drops and now - self.last_drop_report >= self.drop_report_interval:
+                drops = self.pending_drops
+                self.pending_drops = 0
+                self.last_drop_report = now
+            return batch, drops
+
+    def _write_batch(self, batch, drops):
+        for sink, formatter in self.sinks:
+            chunks = []
+            for record in batch:
+                try:
+                    chunks.append(formatter.format(record))
+                except Exception:
+                    chunks.append(f"Unformattable log record: {record.msg!r}")
+            if drops:
+                chunks.append(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - logger - WARNING - "
+                              f"Log queue full, dropped {drops} records")
+            if chunks:
+                sink.write('\n'.join(chunks) + '\n')
+                sink.flush()
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+
+    def _writer_loop(self):
+        while self.is_running or self.records:
+            batch, drops = self._take_batch()
+            if batch or drops:
+                try:
+                    self._write_batch(batch, drops)
+                except Exception as e:
+                    sys.stderr.write(f"Log writer error: {e}\n")
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="log-writer", daemon=True)
+        self.writer_thread.start()
+
+    def stop(self):
+        """Drain the queue and close the sinks"""
+        if not self.is_running:
+            return
+        with self.not_empty:
+            self.is_running = False
+            self.not_empty.notify()
+        self.writer_thread.join(timeout=5)
+        for sink, _ in self.sinks:
+            sink.close()
+
+
+class AsyncHandler(logging.Handler):
+    """logging.Handler that hands records to an AsyncLogPipeline"""
+
+    def __init__(self, pipeline, level=logging.NOTSET):
+        super().__init__(level)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        """Like QueueHandler.prepare: render the message now, while the args still hold their
+        current values, and keep the traceback as text rather than frames"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.pipeline.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+_exception_formatter = logging.Formatter()
+_pipeline = None
+_stop_registered = False
+
+
+def _stop_pipeline():
+    if _pipeline:
+        _pipeline.stop()
+
+
+def setup_logging(log_file="data/logs/firewall_honeypot.log", level=logging.INFO, json_format=False,
+                  max_bytes=10 * 1024 * 1024, rotate_interval=None, backup_count=5,
+                  queue_size=10000, console=True):
+    global _pipeline, _stop_registered
+    log_dir = os.path.dirname(log_file)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    file_formatter = JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT)
+    sinks = [(RotatingFileSink(log_file, max_bytes, rotate_interval, backup_count), file_formatter)]
+    if console:
+        sinks.append((StreamSink(), logging.Formatter(LOG_FORMAT)))
+
+    if _pipeline:
+        _pipeline.stop()
+    _pipeline = AsyncLogPipeline(sinks, queue_size=queue_size)
+    _pipeline.start()
+    if not _stop_registered:
+        atexit.register(_stop_pipeline)
+        _stop_registered = True
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(AsyncHandler(_pipeline))
+    root.setLevel(level)
 
-def setup_logging(log_file="data/logs/firewall_honeypot.log", level=logging.INFO):
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
-    
     return logging.getLogger("App")
+
+
+def get_logging_stats():
+    """Counters of the async pipeline (enqueued, written, dropped, batches)"""
+    if not _pipeline:
+        return {}
+    return dict(_pipeline.stats, queued=len(_pipeline.records))
@@ -1,21 +1,19 @@
-import threading
-import time
 import logging
-from flask import Flask, render_template, jsonify
-from flask_socketio import SocketIO
+from flask import Flask, render_template, jsonify, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import random
 from datetime import datetime, timedelta
+import argparse
 import requests
+from logger import setup_logging
+from firewall_engine import DynamicFirewall
+from firewall_backends import add_backend_arguments, backend_from_args
+from clock import SYSTEM_CLOCK
+from supervisor import supervisor_for
+import wire_format
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("firewall.log"),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging: batched background writer with rotation of firewall.log
+setup_logging("firewall.log")
 
 logger = logging.getLogger(__name__)
 
@@ -23,19 +21,26 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'hackathon_secret_key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Clients that opted into the compact wire format get wire_format frames in their own room
+JSON_ROOM = 'clients_json'
+COMPACT_ROOM = 'clients_compact'
+compact_clients = set()
+
+def broadcast(event, payload):
+    """Emit to every client in its wire format, encoding the payload once"""
+    socketio.emit(event, payload, to=JSON_ROOM)
+    if compact_clients:
+        socketio.emit(event, wire_format.encode(payload), to=COMPACT_ROOM)
+
+class BroadcastEmitter:
+    """The `socketio` handed to the firewall engine, so its events follow the client formats"""
+    
+    def emit(self, event, data=None, **kwargs):
+        broadcast(event, data)
+
 # Global state
 class SystemState:
     def __init__(self):
-        self.firewall = {
-            "open_ports": [80, 443, 8080],
-            "rotation_interval": 30,
-            "attack_count": 0,
-            "suspicious_ips": {},
-            "rotation_count": 0,
-            "port_history": [],
-            "ip_shift_history": []
-        }
-        
         self.honeypot = {
             "total_attacks": 0,
             "recent_attacks": [],
@@ -72,15 +77,20 @@ class SystemState:
     def _init_timeline(self):
         """Initialize empty timeline for the last hour"""
         timeline = {}
-        now = datetime.now()
+        now = clock.now()
         for i in range(12):
             time_key = (now - timedelta(minutes=55 - i*5)).strftime("%H:%M")
             timeline[time_key] = 0
         return timeline
 
 # Create instances
+clock = SYSTEM_CLOCK  # timestamps and simulation sleeps; swap for a VirtualClock to fast-forward
+supervisor = supervisor_for(clock)
+attack_pool = supervisor.pool("main.attacks", max_workers=1)  # one attack simulation at a time
+attack_task = None
 state = SystemState()
-ports = [80, 443, 8080, 8443, 22, 3389, 21, 25, 53]
+firewall = DynamicFirewall(BroadcastEmitter(), clock=clock)  # the one firewall engine, simulated backend until __main__ picks one
+ports = firewall.ports
 attack_types = ["Port Scan", "Brute Force", "SQL Injection", "XSS", "DDoS", "Phishing", "Malware"]
 ip_pool = [f"192.168.1.{i}" for i in range(1, 50)] + [f"10.0.0.{i}" for i in range(1, 50)]
 
@@ -90,52 +100,87 @@ def index():
 
 @app.route('/api/status')
 def get_status():
-    return jsonify({
-        "firewall": state.firewall,
+    return jsonify(build_status())
+
+def build_status():
+    """Status snapshot; usable from background threads without a request context"""
+    return {
+        "firewall": firewall.get_status(),
         "honeypot": state.honeypot,
         "traffic": state.traffic,
         "ml_analysis": state.ml_analysis,
         "monitoring": state.monitoring
-    })
+    }
 
 @app.route('/api/traffic/start', methods=['POST'])
 def start_traffic():
-    # Start attack simulation in background
-    attack_thread = threading.Thread(target=run_attacks, daemon=True)
-    attack_thread.start()
+    global attack_task
+    # Start attack simulation in background, unless one is already running
+    task = attack_pool.submit("main.run_attacks", run_attacks, cancellable=True)
+    if task is None:
+        return jsonify({"status": "running", "message": "Traffic generation is already running"}), 409
+    attack_task = task
     return jsonify({"status": "started", "message": "Traffic generation started"})
 
 @app.route('/api/traffic/stop', methods=['POST'])
 def stop_traffic():
-    # In a real implementation, you would stop the attack simulation
+    # The simulation checks its cancel event between attacks
+    if attack_task is None or attack_task.finished:
+        return jsonify({"status": "stopped", "message": "Traffic generation is not running"})
+    attack_task.cancel()
     return jsonify({"status": "stopped", "message": "Traffic generation stopped"})
 
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
+    """io({auth: {format: 'compact'}}) opts into the compact format"""
     logger.info("Client connected to dashboard")
-    socketio.emit('status_update', get_status().json)
+    join_room(JSON_ROOM)
+    if isinstance(auth, dict) and auth.get('format'):
+        set_client_format(request.sid, auth['format'])
+    broadcast('status_update', build_status())
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    compact_clients.discard(request.sid)
+
+@socketio.on('set_format')
+def handle_set_format(data):
+    """Switch the client's wire format: {"format": "compact"} or {"format": "json"}"""
+    set_client_format(request.sid, (data or {}).get('format'))
+
+def set_client_format(sid, wire):
+    compact = wire == wire_format.FORMAT_NAME
+    if compact:
+        compact_clients.add(sid)
+    else:
+        compact_clients.discard(sid)
+    leave_room(JSON_ROOM if compact else COMPACT_ROOM)
+    join_room(COMPACT_ROOM if compact else JSON_ROOM)
+    emit('wire_format', wire_format.describe() if compact else {"format": "json"})
 
-def run_attacks():
-    """Run attack simulations in the background"""
-    while True:
+def run_attacks(cancel):
+    """Run attack simulations in the background until `cancel` is set"""
+    while not cancel.is_set():
         try:
             # Simulate port scanning
             simulate_port_scan()
-            time.sleep(random.uniform(5, 15))
+            if clock.wait(cancel, random.uniform(5, 15)):
+                break
             
             # Simulate brute force attacks
             if random.random() < 0.7:
                 simulate_brute_force()
-                time.sleep(random.uniform(3, 10))
+                if clock.wait(cancel, random.uniform(3, 10)):
+                    break
             
             # Simulate API probing
             if random.random() < 0.5:
                 simulate_api_probing()
-                time.sleep(random.uniform(2, 8))
+                clock.wait(cancel, random.uniform(2, 8))
                 
         except Exception as e:
             logger.error(f"Error in attack simulation: {e}")
-            time.sleep(10)
+            clock.wait(cancel, 10)
 
 def simulate_port_scan():
     """Simulate port scanning activity"""
@@ -143,110 +188,49 @@ def simulate_port_scan():
     source_ip = random.choice(ip_pool)
     
     for port in target_ports:
-        if port not in state.firewall["open_ports"]:
+        if port not in firewall.current_open_ports:
             # This is an attack on a closed port
             attack_type = "Port Scan"
             simulate_attack(source_ip, port, attack_type)
-        time.sleep(0.2)
+        clock.sleep(0.2)
 
 def simulate_brute_force():
     """Simulate brute force attacks"""
     source_ip = random.choice(ip_pool)
     target_port = random.choice([22, 3389, 21])  # Common brute force targets
     
-    if target_port not in state.firewall["open_ports"]:
+    if target_port not in firewall.current_open_ports:
         for i in range(random.randint(3, 8)):
             attack_type = "Brute Force"
             simulate_attack(source_ip, target_port, attack_type)
-            time.sleep(0.5)
+            clock.sleep(0.5)
 
 def simulate_api_probing():
     """Simulate API endpoint probing"""
     source_ip = random.choice(ip_pool)
     target_port = random.choice([80, 443, 8080])
     
-    if target_port not in state.firewall["open_ports"]:
+    if target_port not in firewall.current_open_ports:
         attack_type = random.choice(["SQL Injection", "XSS", "API Probe"])
         for i in range(random.randint(2, 5)):
             simulate_attack(source_ip, target_port, attack_type)
-            time.sleep(0.3)
+            clock.sleep(0.3)
 
-def firewall_rotation():
-    """Simulate firewall port rotation and monitoring"""
-    while True:
-        time.sleep(state.firewall["rotation_interval"])
-        
-        # Store current state in history
-        timestamp = datetime.now().isoformat()
-        state.firewall["port_history"].append({
-            "timestamp": timestamp,
-            "ports": state.firewall["open_ports"].copy()
-        })
-        
-        # Keep only last 20 history entries
-        if len(state.firewall["port_history"]) > 20:
-            state.firewall["port_history"] = state.firewall["port_history"][-20:]
-        
-        # Rotate ports
-        current_ports = state.firewall["open_ports"].copy()
-        
-        # Close 1-2 ports
-        ports_to_close = min(2, len(current_ports))
-        for _ in range(ports_to_close):
-            if current_ports:
-                port = random.choice(current_ports)
-                current_ports.remove(port)
-        
-        # Open 1-2 new ports
-        ports_to_open = random.randint(1, 2)
-        for _ in range(ports_to_open):
-            available_ports = [p for p in ports if p not in current_ports]
-            if available_ports:
-                new_port = random.choice(available_ports)
-                current_ports.append(new_port)
-        
-        # Ensure we always have at least 2 ports open
-        while len(current_ports) < 2:
-            available_ports = [p for p in ports if p not in current_ports]
-            if available_ports:
-                new_port = random.choice(available_ports)
-                current_ports.append(new_port)
-        
-        state.firewall["open_ports"] = current_ports
-        state.firewall["rotation_count"] += 1
-        
-        # Record IP shift
-        state.firewall["ip_shift_history"].append({
-            "timestamp": timestamp,
-            "ip_count": len(state.firewall["suspicious_ips"]),
-            "new_ips": random.randint(0, 3)
-        })
-        
-        if len(state.firewall["ip_shift_history"]) > 15:
-            state.firewall["ip_shift_history"] = state.firewall["ip_shift_history"][-15:]
-        
-        # Update ML analysis
-        update_ml_analysis()
-        
-        # Update monitoring data
-        update_monitoring_data()
-        
-        # Emit update to all clients
-        socketio.emit('status_update', get_status().json)
+def handle_rotation(history_entry):
+    """Refresh the derived dashboard state after each firewall rotation"""
+    update_ml_analysis()
+    update_monitoring_data()
+    broadcast('status_update', build_status())
 
 def simulate_attack(ip, port, attack_type):
     """Simulate a cyber attack"""
-    # Update firewall stats
-    state.firewall["attack_count"] += 1
-    if ip in state.firewall["suspicious_ips"]:
-        state.firewall["suspicious_ips"][ip] += 1
-    else:
-        state.firewall["suspicious_ips"][ip] = 1
+    # The firewall engine logs the blocked attempt and tracks the suspicious IP
+    firewall.check_access(ip, port)
     
     # Update honeypot stats
     state.honeypot["total_attacks"] += 1
     attack_entry = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": clock.now().isoformat(),
         "ip": ip,
         "type": attack_type,
         "details": f"Attempted {attack_type} on port {port}",
@@ -280,7 +264,7 @@ def simulate_attack(ip, port, attack_type):
     
     # Add to live threats
     state.monitoring["live_threats"].append({
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": clock.now().isoformat(),
         "ip": ip,
         "type": attack_type,
         "severity": attack_entry["severity"]
@@ -290,13 +274,12 @@ def simulate_attack(ip, port, attack_type):
         state.monitoring["live_threats"] = state.monitoring["live_threats"][-10:]
     
     # Emit individual events
-    socketio.emit('firewall_attack', attack_entry)
-    socketio.emit('honeypot_attack', attack_entry)
-    socketio.emit('live_threat', state.monitoring["live_threats"][-1])
+    broadcast('honeypot_attack', attack_entry)
+    broadcast('live_threat', state.monitoring["live_threats"][-1])
 
 def update_timeline(is_attack=False):
     """Update traffic timeline"""
-    current_time = datetime.now()
+    current_time = clock.now()
     minute = int(current_time.strftime("%M"))
     rounded_minute = (minute // 5) * 5
     time_key = current_time.replace(minute=rounded_minute).strftime("%H:%M")
@@ -324,12 +307,12 @@ def update_timeline(is_attack=False):
 def update_ml_analysis():
     """Simulate ML analysis"""
     # Calculate threat level based on recent activity
-    base_threat = min(100, state.firewall["attack_count"] * 2 + len(state.firewall["suspicious_ips"]) * 3)
+    base_threat = min(100, len(firewall.attack_log) * 2 + len(firewall.suspicious_ips) * 3)
     threat_change = random.randint(-5, 10)
     state.ml_analysis["threat_level"] = max(0, min(100, base_threat + threat_change))
     
     # Update threat timeline
-    current_time = datetime.now()
+    current_time = clock.now()
     minute = int(current_time.strftime("%M"))
     rounded_minute = (minute // 5) * 5
     time_key = current_time.replace(minute=rounded_minute).strftime("%H:%M")
@@ -363,7 +346,7 @@ def update_ml_analysis():
     
     # Add to history
     analysis_entry = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": clock.now().isoformat(),
         "threat_level": state.ml_analysis["threat_level"],
         "patterns": state.ml_analysis["patterns_detected"].copy()
     }
@@ -373,11 +356,11 @@ def update_ml_analysis():
     if len(state.ml_analysis["history"]) > 10:
         state.ml_analysis["history"] = state.ml_analysis["history"][-10:]
     
-    socketio.emit('ml_update', state.ml_analysis)
+    broadcast('ml_update', state.ml_analysis)
 
 def update_monitoring_data():
     """Update real-time monitoring data for graphs"""
-    current_time = datetime.now().isoformat()
+    current_time = clock.now().isoformat()
     
     # Update real-time graph data
     state.monitoring["real_time_graphs"]["threat_level"].append({
@@ -401,8 +384,8 @@ def update_monitoring_data():
             graph.pop(0)
     
     # Update IP shift data
-    if state.firewall["ip_shift_history"]:
-        state.monitoring["ip_shift_data"] = state.firewall["ip_shift_history"][-10:]
+    if firewall.ip_shift_history:
+        state.monitoring["ip_shift_data"] = firewall.ip_shift_history[-10:]
     
     # Update attack patterns
     state.monitoring["attack_patterns"] = [
@@ -410,45 +393,40 @@ def update_monitoring_data():
         for atype, count in state.honeypot["attack_types"].items()
     ]
     
-    socketio.emit('monitoring_update', state.monitoring)
+    broadcast('monitoring_update', state.monitoring)
 
 def simulate_normal_traffic():
-    """Simulate normal traffic patterns"""
-    while True:
-        time.sleep(random.uniform(2, 8))
-        
-        # Simulate normal traffic
-        state.traffic["total_traffic"] += 1
-        state.traffic["normal_traffic"] += 1
-        update_timeline(False)
-        
-        # Update monitoring occasionally
-        if random.random() < 0.3:
-            update_monitoring_data()
-            socketio.emit('status_update', get_status().json)
+    """Simulate normal traffic patterns (every 2-8 seconds)"""
+    state.traffic["total_traffic"] += 1
+    state.traffic["normal_traffic"] += 1
+    update_timeline(False)
+    
+    # Update monitoring occasionally
+    if random.random() < 0.3:
+        update_monitoring_data()
+        broadcast('status_update', build_status())
 
 def continuous_monitoring():
-    """Continuous monitoring updates for real-time graphs"""
-    while True:
-        time.sleep(2)  # Update every 2 seconds
-        update_monitoring_data()
-        socketio.emit('monitoring_update', state.monitoring)
+    """Monitoring update for real-time graphs (every 2 seconds)"""
+    update_monitoring_data()
+    broadcast('monitoring_update', state.monitoring)
 
 def start_dashboard():
-    # Start firewall rotation in background
-    rotation_thread = threading.Thread(target=firewall_rotation, daemon=True)
-    rotation_thread.start()
-    
-    # Start traffic simulation in background
-    traffic_thread = threading.Thread(target=simulate_normal_traffic, daemon=True)
-    traffic_thread.start()
+    # Start firewall rotation on the engine's adaptive scheduler
+    firewall.on_rotate = handle_rotation
+    firewall.start_rotation()
     
-    # Start monitoring updates
-    monitoring_thread = threading.Thread(target=continuous_monitoring, daemon=True)
-    monitoring_thread.start()
+    # Normal traffic and monitoring updates run as periodic tasks on the supervisor
+    supervisor.every("main.normal_traffic", lambda: random.uniform(2, 8), simulate_normal_traffic)
+    supervisor.every("main.monitoring", 2, continuous_monitoring)
     
     logger.info("Starting dashboard on localhost:5000")
     socketio.run(app, host='127.0.0.1', port=5000, debug=False, use_reloader=False)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated firewall dashboard")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    # Before start_dashboard: the first rotation applies the initial ruleset
+    firewall.backend = backend_from_args(args)
     start_dashboard()
\ No newline at end of file
@@ -1,17 +1,23 @@
 import random
-import time
-import threading
 import logging
-from datetime import datetime, timedelta
 import json
+from process_metrics import record_event
+from instrumentation import REGISTRY, timed_emit
+from clock import SYSTEM_CLOCK
+from supervisor import supervisor_for
 
 logger = logging.getLogger(__name__)
 
+ANALYZE_REQUEST_SECONDS = REGISTRY.histogram(
+    'ml_analyze_request_seconds', 'Latency of MLSecurityAnalyzer.analyze_request')
+
 class MLSecurityAnalyzer:
-    def __init__(self, socketio=None):
+    def __init__(self, socketio=None, clock=None, supervisor=None):
         self.socketio = socketio
+        self.clock = clock or SYSTEM_CLOCK
+        self.supervisor = supervisor or supervisor_for(clock)
         self.is_running = False
-        self.analysis_thread = None
+        self.analysis_task = None
         self.threat_level = 0  # 0-100 scale
         self.patterns_detected = []
         self.analysis_history = []
@@ -22,26 +28,25 @@ class MLSecurityAnalyzer:
             return
             
         self.is_running = True
-        self.analysis_thread = threading.Thread(target=self._analysis_loop, daemon=True)
-        self.analysis_thread.start()
+        self.analysis_task = self.supervisor.every("ml.analysis", 10, self._analysis_tick, initial_delay=0)
         logger.info("ML Security Analyzer started")
     
     def stop_analysis(self):
         """Stop the analysis"""
         self.is_running = False
+        if self.analysis_task:
+            self.analysis_task.cancel()
+            self.analysis_task = None
         logger.info("ML Security Analyzer stopped")
     
-    def _analysis_loop(self):
-        """Main analysis loop that simulates ML behavior"""
-        while self.is_running:
-            # Simulate ML analysis by generating random insights
-            self._generate_insights()
-            
-            # Update dashboard
-            if self.socketio:
-                self.socketio.emit('ml_update', self.get_status())
-            
-            time.sleep(10)  # Analyze every 10 seconds
+    def _analysis_tick(self):
+        """One analysis round that simulates ML behavior (every 10 seconds)"""
+        # Simulate ML analysis by generating random insights
+        self._generate_insights()
+        
+        # Update dashboard
+        if self.socketio:
+            timed_emit(self.socketio, 'ml_update', self.get_status())
     
     def _generate_insights(self):
         """Generate simulated ML insights"""
@@ -70,7 +75,7 @@ class MLSecurityAnalyzer:
         
         # Log this analysis cycle
         analysis_entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self.clock.now().isoformat(),
             "threat_level": self.threat_level,
             "patterns": self.patterns_detected.copy()
         }
@@ -80,8 +85,11 @@ class MLSecurityAnalyzer:
         if len(self.analysis_history) > 20:
             self.analysis_history = self.analysis_history[-20:]
     
+    @ANALYZE_REQUEST_SECONDS.time()
     def analyze_request(self, request_data):
         """Analyze a single request (simulated ML analysis)"""
+        record_event("ml")
+        
         # Simple heuristic-based analysis (simulating ML)
         score = 0
         
@@ -0,0 +1,157 @@
+import threading
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+try:
+    from sklearn.ensemble import IsolationForest
+except ImportError:  # stream mode detectors retrain without sklearn
+    IsolationForest = None
+
+from streaming_detector import HalfSpaceTrees
+from supervisor import supervisor_for
+
+logger = logging.getLogger(__name__)
+
+
+def _fit_model(X, params, mode='batch'):
+    """Runs in the worker process: a fresh IsolationForest, or Half-Space Trees fed the snapshot"""
+    if mode == 'stream':
+        model = HalfSpaceTrees(**params)
+        model.learn(X)
+        return model
+    if IsolationForest is None:
+        raise Exception("Batch mode retraining needs scikit-learn")
+    model = IsolationForest(**params)
+    model.fit(X)
+    return model
+
+
+class RetrainScheduler:
+    """Periodically fits a new model on recent feature vectors in a worker process,
+    validates it on held-out vectors and hot-swaps it into the detector (batch or stream mode)"""
+
+    def __init__(self, detector, interval=300, snapshot_size=5000, min_samples=200,
+                 holdout_fraction=0.2, max_rate_shift=0.15, training_store=None, model_dir=None,
+                 clock=None, supervisor=None):
+        self.detector = detector
+        self.interval = interval
+        self.min_samples = min_samples
+        if detector.stream_model is not None:
+            # The training part of the snapshot has to fill at least one window
+            window = detector.stream_params["window_size"]
+            self.min_samples = max(min_samples, int(window / (1 - holdout_fraction)) + 1)
+        self.holdout_fraction = holdout_fraction
+        self.max_rate_shift = max_rate_shift
+        self.snapshot_size = snapshot_size
+        self.features = deque(maxlen=snapshot_size)
+        self.training_store = training_store  # model_store.TrainingDataStore, read for the snapshots
+        self.model_dir = model_dir  # save accepted models here when set
+        self.supervisor = supervisor or supervisor_for(clock)
+        self.features_lock = threading.Lock()
+        self.executor = None
+        self.is_running = False
+        self.retrain_task = None
+        self.retrain_lock = threading.Lock()
+        self.stats = {"retrains": 0, "accepted": 0, "rejected": 0, "last_result": None}
+
+    def record(self, X):
+        """Remember recent feature vectors for the next retrain (the training store is written
+        by whoever owns it, e.g. the FeaturePipeline)"""
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X[None, :]
+        with self.features_lock:
+            self.features.extend(X)
+
+    def _snapshot(self):
+        with self.features_lock:
+            snapshot = np.array(self.features)
+        if self.training_store is not None:
+            # The store also holds what was recorded before a restart
+            self.training_store.flush()
+            stored = self.training_store.read(limit=self.snapshot_size)
+            if len(stored) >= len(snapshot):
+                snapshot = stored.astype(float)
+        return snapshot
+
+    def _get_executor(self):
+        if self.executor is None:
+            # spawn: never fork a process that is running server threads
+            self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def validate(self, model, holdout):
+        """Reject models whose anomaly rate on held-out data is off, returns (ok, details)"""
+        expected = self.detector.contamination
+        if isinstance(model, HalfSpaceTrees) and not model.is_ready:
+            return False, {"holdout_samples": len(holdout), "reason": "no complete window"}
+        rate = float((model.predict(holdout) == -1).mean())
+        details = {"holdout_samples": len(holdout), "anomaly_rate": round(rate, 4)}
+        if abs(rate - expected) > self.max_rate_shift:
+            return False, dict(details, reason="anomaly rate out of range")
+        if self.detector.is_trained:
+            current_rate = float((self.detector.detect_anomalies(holdout) == -1).mean())
+            details["current_anomaly_rate"] = round(current_rate, 4)
+            if abs(rate - current_rate) > self.max_rate_shift:
+                return False, dict(details, reason="diverges from current model")
+        return True, details
+
+    def retrain_now(self):
+        """Fit on a snapshot in a worker process, validate and hot-swap; returns the new version or None"""
+        if not self.retrain_lock.acquire(blocking=False):
+            return None  # a retrain is already in flight
+        try:
+            snapshot = self._snapshot()
+            if len(snapshot) < self.min_samples:
+                return None
+            self.stats["retrains"] += 1
+            split = int(len(snapshot) * (1 - self.holdout_fraction))
+            order = np.random.default_rng().permutation(len(snapshot))
+            train, holdout = snapshot[order[:split]], snapshot[order[split:]]
+
+            if self.detector.stream_model is not None:
+                params, mode = self.detector.stream_params, 'stream'
+            else:
+                params, mode = self.detector.model_params, 'batch'
+            model = self._get_executor().submit(_fit_model, train, params, mode).result()
+            ok, details = self.validate(model, holdout)
+            self.stats["last_result"] = details
+            if not ok:
+                self.stats["rejected"] += 1
+                logger.warning("Rejected retrained model: %s", details)
+                return None
+            version = self.detector.swap_model(model, dict(details, source="retrain", samples=len(train)))
+            self.stats["accepted"] += 1
+            logger.info("Anomaly model v%s deployed (%s samples)", version, len(train))
+            if self.model_dir:
+                self.detector.save(self.model_dir)
+            return version
+        finally:
+            self.retrain_lock.release()
+
+    def _retrain_tick(self):
+        try:
+            self.retrain_now()
+        except Exception as e:
+            logger.error(f"Error retraining anomaly model: {e}")
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        # A retrain waits on the worker process for seconds, keep it off the shared periodic pool
+        self.retrain_task = self.supervisor.every("model.retrain", self.interval, self._retrain_tick,
+                                                  pool=self.supervisor.pool("model.retrain", max_workers=1))
+        logger.info("Anomaly model retraining scheduled every %ss", self.interval)
+
+    def stop(self):
+        self.is_running = False
+        if self.retrain_task:
+            self.retrain_task.cancel()
+            self.retrain_task = None
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,282 @@
+import os
+import json
+import glob
+import shutil
+import logging
+import threading
+
+import numpy as np
+
+from clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = "models/anomaly"
+TRAINING_DATA_DIR = "data/training_data"
+CURRENT_POINTER = "CURRENT"
+EULER_GAMMA = 0.5772156649015329
+
+
+def _average_path_length(n):
+    """c(n) from the Isolation Forest paper, vectorized"""
+    n = np.asarray(n, dtype=float)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    large = n > 2
+    result[large] = 2.0 * (np.log(n[large] - 1.0) + EULER_GAMMA) - 2.0 * (n[large] - 1.0) / n[large]
+    return result
+
+
+class FlatForest:
+    """IsolationForest scorer over flat node arrays (memory-mappable, no sklearn needed).
+
+    Matches IsolationForest.score_samples / predict for the exported model.
+    """
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.leaf_value = arrays["leaf_value"]
+        self.roots = arrays["roots"]
+        self.meta = meta
+        self.offset_ = meta["offset"]
+        self.denominator = meta["denominator"]
+        self.max_depth = meta["max_depth"]
+        self.n_features_in_ = meta["n_features"]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted sklearn IsolationForest"""
+        features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+        base = 0
+        max_depth = 0
+        for estimator, subset in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            n = tree.node_count
+            depth = np.zeros(n, dtype=np.int64)
+            for node in range(n):  # children always have larger ids than parents
+                for child in (tree.children_left[node], tree.children_right[node]):
+                    if child != -1:
+                        depth[child] = depth[node] + 1
+            is_leaf = tree.children_left == -1
+            max_depth = max(max_depth, int(depth.max()))
+            features.append(np.where(is_leaf, 0, np.asarray(subset)[np.maximum(tree.feature, 0)]))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, -1, tree.children_left + base))
+            rights.append(np.where(is_leaf, -1, tree.children_right + base))
+            leaf_values.append(np.where(is_leaf, depth + _average_path_length(tree.n_node_samples), 0.0))
+            roots.append(base)
+            base += n
+        arrays = {
+            "feature": np.concatenate(features).astype(np.int32),
+            "threshold": np.concatenate(thresholds).astype(np.float64),
+            "left": np.concatenate(lefts).astype(np.int32),
+            "right": np.concatenate(rights).astype(np.int32),
+            "leaf_value": np.concatenate(leaf_values).astype(np.float64),
+            "roots": np.asarray(roots, dtype=np.int32)
+        }
+        meta = {
+            "offset": float(model.offset_),
+            "denominator": float(len(model.estimators_) * _average_path_length([model._max_samples])[0]),
+            "max_depth": max_depth,
+            "n_features": int(model.n_features_in_)
+        }
+        return cls(arrays, meta)
+
+    def score_samples(self, X):
+        """Same convention as sklearn: lower is more abnormal"""
+        # sklearn trees compare float32 inputs against their thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        rows = np.arange(X.shape[0])[None, :]
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            left = self.left[nodes]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.right[nodes]), nodes)
+        depths = self.leaf_value[nodes].sum(axis=0)
+        return -(2.0 ** (-depths / self.denominator))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) >= 0, 1, -1)
+
+
+def _write_arrays(directory, arrays, meta):
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _read_arrays(directory, names, mmap=True):
+    mode = 'r' if mmap else None
+    return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in names}
+
+
+def save_detector(detector, directory=MODEL_DIR):
+    """Persist the current model as a new version directory and point CURRENT at it"""
+    version_dir = os.path.join(directory, f"v{detector.model_version:06d}")
+    tmp_dir = version_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    meta = {
+        "mode": detector.mode,
+        "version": detector.model_version,
+        "contamination": detector.contamination,
+        "saved_at": detector.clock.now().isoformat()
+    }
+    if detector.stream_model is not None:
+        hst = detector.stream_model
+        if not hst.is_ready:
+            raise Exception("Model not trained yet")
+        arrays = {"split_dim": hst.split_dim, "split_value": hst.split_value, "r_mass": hst.r_mass,
+                  "l_mass": hst.l_mass, "offset": hst.offset, "scale": hst.scale, "window": hst.window}
+        meta.update(n_trees=hst.n_trees, max_depth=hst.max_depth, window_size=hst.window_size,
+                    size_limit=hst.size_limit, threshold=hst.threshold, window_fill=hst.window_fill,
+                    windows_completed=hst.windows_completed)
+    else:
+        if not detector.is_trained:
+            raise Exception("Model not trained yet")
+        model = detector.model
+        flat = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+        arrays = {"feature": flat.feature, "threshold": flat.threshold, "left": flat.left,
+                  "right": flat.right, "leaf_value": flat.leaf_value, "roots": flat.roots}
+        meta["forest"] = flat.meta
+    _write_arrays(tmp_dir, arrays, meta)
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(tmp_dir, version_dir)
+
+    pointer = os.path.join(directory, CURRENT_POINTER)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(os.path.basename(version_dir))
+    os.replace(pointer + ".tmp", pointer)
+    logger.info("Saved anomaly model v%s to %s", detector.model_version, version_dir)
+    return version_dir
+
+
+def load_into(detector, directory=MODEL_DIR, mmap=True):
+    """Load the CURRENT model into a detector; returns False if nothing is saved"""
+    pointer = os.path.join(directory, CURRENT_POINTER)
+    if not os.path.exists(pointer):
+        return False
+    with open(pointer) as f:
+        version_dir = os.path.join(directory, f.read().strip())
+    with open(os.path.join(version_dir, "meta.json")) as f:
+        meta = json.load(f)
+
+    if meta["mode"] == 'stream':
+        if detector.stream_model is None:
+            raise Exception("Saved model is a streaming model, create the detector with mode='stream'")
+        hst = detector.stream_model
+        arrays = _read_arrays(version_dir, ["split_dim", "split_value", "r_mass", "l_mass", "offset",
+                                           "scale", "window"], mmap)
+        hst.n_trees, hst.max_depth = meta["n_trees"], meta["max_depth"]
+        hst.window_size, hst.size_limit = meta["window_size"], meta["size_limit"]
+        hst.n_internal = 2 ** hst.max_depth - 1
+        hst.n_nodes = 2 ** (hst.max_depth + 1) - 1
+        hst.split_dim, hst.split_value = arrays["split_dim"], arrays["split_value"]
+        hst.offset, hst.scale = arrays["offset"], arrays["scale"]
+        # Masses and the window keep changing, so those get private copies
+        hst.l_mass = np.array(arrays["l_mass"])
+        hst.window = np.array(arrays["window"])
+        hst.window_fill = meta["window_fill"]
+        hst.windows_completed = meta["windows_completed"]
+        hst.threshold = meta["threshold"]
+        hst.r_mass = np.array(arrays["r_mass"])
+        detector.is_trained = True
+    else:
+        arrays = _read_arrays(version_dir, ["feature", "threshold", "left", "right", "leaf_value", "roots"], mmap)
+        detector.model_version = meta["version"] - 1
+        detector.swap_model(FlatForest(arrays, meta["forest"]), {"source": "disk", "path": version_dir})
+    detector.model_version = meta["version"]
+    # After a rollback CURRENT is not the newest directory, new versions must not overwrite those
+    saved = [int(name[1:]) for name in os.listdir(directory)
+             if name.startswith("v") and name[1:].isdigit()]
+    detector.version_counter = max([detector.version_counter, meta["version"]] + saved)
+    logger.info("Loaded anomaly model v%s from %s", meta["version"], version_dir)
+    return True
+
+
+class TrainingDataStore:
+    """Append-only columnar feature store: one float32 .npy per column per chunk"""
+
+    def __init__(self, directory=TRAINING_DATA_DIR, columns=None, flush_rows=1000, clock=None):
+        self.directory = directory
+        self.columns = columns
+        self.flush_rows = flush_rows
+        self.clock = clock or SYSTEM_CLOCK
+        self.buffer = []
+        self.buffer_ts = []
+        self.lock = threading.Lock()  # the feature pipeline appends while retraining reads
+        os.makedirs(directory, exist_ok=True)
+        # Left behind by a flush that was interrupted before its rename
+        for tmp_dir in glob.glob(os.path.join(directory, "chunk_*.tmp")):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _chunks(self):
+        return sorted(p for p in glob.glob(os.path.join(self.directory, "chunk_*"))
+                      if os.path.isdir(p) and not p.endswith(".tmp"))
+
+    def append(self, X, timestamps=None):
+        """Buffer rows, writing a chunk every `flush_rows` rows"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if timestamps is None:
+            timestamps = np.full(len(X), self.clock.time())
+        with self.lock:
+            self.buffer.extend(X)
+            self.buffer_ts.extend(timestamps)
+            if len(self.buffer) >= self.flush_rows:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        X = np.asarray(self.buffer, dtype=np.float32)
+        names = self.columns or [f"f{i}" for i in range(X.shape[1])]
+        chunks = self._chunks()
+        index = int(os.path.basename(chunks[-1]).split('_')[1]) + 1 if chunks else 0
+        chunk_dir = os.path.join(self.directory, f"chunk_{index:06d}")
+        arrays = {name: X[:, i] for i, name in enumerate(names)}
+        arrays["ts"] = np.asarray(self.buffer_ts, dtype=np.float64)
+        _write_arrays(chunk_dir + ".tmp", arrays, {"columns": names, "rows": len(X)})
+        os.replace(chunk_dir + ".tmp", chunk_dir)
+        self.buffer = []
+        self.buffer_ts = []
+
+    def read(self, columns=None, since=None, limit=None):
+        """Memory-map the chunks and return a (rows, columns) array, newest `limit` rows"""
+        if limit is not None and limit <= 0:
+            return np.empty((0, len(columns or self.columns or [])), dtype=np.float32)
+        parts = []
+        rows = 0
+        for chunk_dir in reversed(self._chunks()):
+            with open(os.path.join(chunk_dir, "meta.json")) as f:
+                meta = json.load(f)
+            names = columns or meta["columns"]
+            arrays = _read_arrays(chunk_dir, names + ["ts"])
+            block = np.column_stack([arrays[name] for name in names])
+            if since is not None:
+                block = block[arrays["ts"] >= since]
+            parts.append(block)
+            rows += len(block)
+            if limit is not None and rows >= limit:
+                break
+        if not parts:
+            return np.empty((0, len(columns or self.columns or [])), dtype=np.float32)
+        data = np.concatenate(parts[::-1])
+        return data[max(0, len(data) - limit):] if limit is not None else data
@@ -1,21 +1,112 @@
+from datetime import datetime, timedelta
 import numpy as np
 
+HOURS_PER_WEEK = 168
+RATE = 0  # index of the request rate in the feature vectors
+
 class PatternPredictor:
-    def __init__(self):
+    def __init__(self, n_features=4, min_samples=3, attack_distance=4.0, peak_quantile=0.67):
         self.patterns = ['normal_day', 'peak_hours', 'weekend', 'attack']
+        self.n_features = n_features
+        self.min_samples = min_samples
+        self.attack_distance = attack_distance
+        self.peak_quantile = peak_quantile
+        # Time-of-week profiles: one bucket per weekday hour, Welford mean/variance per feature
+        self.counts = np.zeros(HOURS_PER_WEEK)
+        self.means = np.zeros((HOURS_PER_WEEK, n_features))
+        self.m2 = np.zeros((HOURS_PER_WEEK, n_features))
+    
+    @staticmethod
+    def bucket_of(moment):
+        """Time-of-week bucket (0 = Monday 00:00) for a datetime or epoch seconds"""
+        if not isinstance(moment, datetime):
+            moment = datetime.fromtimestamp(moment)
+        return moment.weekday() * 24 + moment.hour
+    
+    def observe(self, timestamp, features):
+        """Add one window's feature vector to its time-of-week profile"""
+        bucket = self.bucket_of(timestamp)
+        x = np.asarray(features, dtype=float)[:self.n_features]
+        self.counts[bucket] += 1
+        delta = x - self.means[bucket]
+        self.means[bucket] += delta / self.counts[bucket]
+        self.m2[bucket] += delta * (x - self.means[bucket])
+    
+    def fit(self, timestamps, X):
+        """Rebuild all profiles from recorded history in one vectorized pass"""
+        X = np.asarray(X, dtype=float)[:, :self.n_features]
+        buckets = np.array([self.bucket_of(ts) for ts in timestamps], dtype=np.int64)
+        counts = np.bincount(buckets, minlength=HOURS_PER_WEEK).astype(float)
+        sums = np.zeros((HOURS_PER_WEEK, self.n_features))
+        squares = np.zeros((HOURS_PER_WEEK, self.n_features))
+        np.add.at(sums, buckets, X)
+        np.add.at(squares, buckets, X * X)
+        safe = np.maximum(counts, 1)[:, None]
+        self.counts = counts
+        self.means = sums / safe
+        self.m2 = np.maximum(squares - sums * sums / safe, 0.0)
     
-    def predict(self, recent_traffic):
+    def _std(self):
+        return np.sqrt(self.m2 / np.maximum(self.counts - 1, 1)[:, None])
+    
+    def _bucket_labels(self, trained):
+        """Label every time-of-week bucket as weekend, peak_hours or normal_day"""
+        labels = np.array(['normal_day'] * HOURS_PER_WEEK, dtype=object)
+        weekday = np.arange(HOURS_PER_WEEK) < 5 * 24
+        rates = self.means[:, RATE]
+        weekday_trained = weekday & trained
+        if weekday_trained.any():
+            cutoff = np.quantile(rates[weekday_trained], self.peak_quantile)
+            labels[weekday_trained & (rates >= cutoff)] = 'peak_hours'
+        labels[~weekday] = 'weekend'
+        return labels
+    
+    def _heuristic(self, now):
+        """Fallback before enough history exists"""
+        if now.weekday() >= 5:
+            return 'weekend'
+        elif 9 <= now.hour <= 17:
+            return 'peak_hours'
+        return 'normal_day'
+    
+    def predict(self, recent_traffic, now=None):
         if len(recent_traffic) < 5:
             return 'normal_day'
         
-        # Simple heuristic prediction based on time
-        from datetime import datetime
-        hour = datetime.now().hour
-        weekday = datetime.now().weekday()
+        now = now or datetime.now()
+        bucket = self.bucket_of(now)
+        recent = np.asarray(recent_traffic, dtype=float)
+        trained = self.counts >= self.min_samples
+        if recent.ndim != 2 or not trained[bucket]:
+            return self._heuristic(now)
         
-        if weekday >= 5:
-            return 'weekend'
-        elif 9 <= hour <= 17:
-            return 'peak_hours'
-        else:
-            return 'normal_day'
\ No newline at end of file
+        current = recent[-5:, :self.n_features].mean(axis=0)
+        # Standardize with the pooled spread so no feature dominates the distance
+        scale = self._std()[trained].mean(axis=0) + 1e-9
+        distances = np.sqrt((((self.means - current) / scale) ** 2).sum(axis=1))
+        distances[~trained] = np.inf
+        
+        # Far above the profile expected for this hour of the week: treat as an attack
+        expected = self.means[bucket]
+        spread = self._std()[bucket] + scale * 0.1
+        if distances[bucket] > self.attack_distance and current[RATE] > expected[RATE] + self.attack_distance * spread[RATE]:
+            return 'attack'
+        return self._bucket_labels(trained)[int(np.argmin(distances))]
+    
+    def forecast_next_hour(self, now=None):
+        """Expected load for the next hour from its time-of-week profile"""
+        now = now or datetime.now()
+        bucket = self.bucket_of(now + timedelta(hours=1))
+        trained = self.counts >= self.min_samples
+        if not trained[bucket]:
+            return {"bucket": bucket, "samples": int(self.counts[bucket]), "expected_rate": None,
+                    "pattern": self._heuristic(now + timedelta(hours=1))}
+        week_mean = self.means[trained, RATE].mean()
+        return {
+            "bucket": bucket,
+            "samples": int(self.counts[bucket]),
+            "expected_rate": round(float(self.means[bucket, RATE]), 3),
+            "rate_std": round(float(self._std()[bucket, RATE]), 3),
+            "load_factor": round(float(self.means[bucket, RATE] / week_mean), 3) if week_mean else None,
+            "pattern": self._bucket_labels(trained)[bucket]
+        }
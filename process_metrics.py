@@ -0,0 +1,203 @@
+import gc
+import os
+import resource
+import threading
+import time
+import logging
+from collections import deque
+from clock import SYSTEM_CLOCK
+from supervisor import supervisor_for
+
+logger = logging.getLogger(__name__)
+
+try:
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = 100
+PAGE_SIZE = resource.getpagesize()
+
+
+def _read_proc_stat():
+    """Return (cpu_seconds, num_threads, rss_bytes) from /proc/self/stat or None"""
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces, so split after the closing paren
+    fields = data[data.rindex(b')') + 2:].split()
+    # fields[0] is field 3 (state) in proc(5) numbering
+    utime = int(fields[11])
+    stime = int(fields[12])
+    num_threads = int(fields[17])
+    rss_pages = int(fields[21])
+    return (utime + stime) / CLOCK_TICKS, num_threads, rss_pages * PAGE_SIZE
+
+
+def _read_proc_status():
+    """Return the memory and thread lines of /proc/self/status as a dict"""
+    values = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:', 'VmSize:', 'Threads:')):
+                    key, value = line.split(':', 1)
+                    values[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return values
+
+
+def _read_mem_total_kb():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class ProcessMetricsSampler:
+    def __init__(self, interval=2.0, history_size=300, clock=None, supervisor=None):
+        self.interval = interval
+        self.clock = clock or SYSTEM_CLOCK
+        self.supervisor = supervisor or supervisor_for(clock)
+        self.history = deque(maxlen=history_size)
+        self.latest = {}
+        self.on_sample = None  # optional callback(sample)
+        self.event_counts = {}
+        self.event_lock = threading.Lock()
+        self.mem_total_kb = _read_mem_total_kb()
+        self.gc_stats = {generation: {"pauses": 0, "total_pause_ms": 0.0, "max_pause_ms": 0.0}
+                         for generation in range(3)}
+        self._gc_start = None
+        self._last_cpu = None
+        self._last_wall = None
+        self._last_now = None
+        self._last_counts = {}
+        self.is_running = False
+        self.sampler_task = None
+
+    def record_event(self, component, count=1):
+        """Count an event for a component, used to compute per-component rates"""
+        with self.event_lock:
+            self.event_counts[component] = self.event_counts.get(component, 0) + count
+
+    def _gc_callback(self, phase, info):
+        """Measure collector pause times via gc.callbacks"""
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            pause_ms = (time.perf_counter() - self._gc_start) * 1000
+            self._gc_start = None
+            stats = self.gc_stats[info.get('generation', 0)]
+            stats["pauses"] += 1
+            stats["total_pause_ms"] += pause_ms
+            stats["max_pause_ms"] = max(stats["max_pause_ms"], pause_ms)
+
+    def sample(self):
+        """Take one sample of the process metrics"""
+        # CPU time is real, so its rate uses the real clock; event rates follow the injected clock
+        wall = time.monotonic()
+        now = self.clock.monotonic()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        proc_stat = _read_proc_stat()
+        proc_status = _read_proc_status()
+
+        if proc_stat:
+            cpu_seconds, num_threads, rss_bytes = proc_stat
+        else:
+            cpu_seconds = usage.ru_utime + usage.ru_stime
+            num_threads = threading.active_count()
+            rss_bytes = proc_status.get('VmRSS', usage.ru_maxrss) * 1024
+
+        cpu_percent = 0.0
+        if self._last_cpu is not None and wall > self._last_wall:
+            cpu_percent = (cpu_seconds - self._last_cpu) / (wall - self._last_wall) * 100
+
+        with self.event_lock:
+            counts = dict(self.event_counts)
+        event_rates = {}
+        if self._last_now is not None and now > self._last_now:
+            elapsed = now - self._last_now
+            for component, count in counts.items():
+                event_rates[component] = round((count - self._last_counts.get(component, 0)) / elapsed, 2)
+
+        self._last_cpu = cpu_seconds
+        self._last_wall = wall
+        self._last_now = now
+        self._last_counts = counts
+
+        rss_kb = rss_bytes // 1024
+        sample = {
+            "timestamp": self.clock.now().isoformat(),
+            "cpu_percent": round(cpu_percent, 2),
+            "rss_mb": round(rss_kb / 1024, 2),
+            "peak_rss_mb": round(proc_status.get('VmHWM', usage.ru_maxrss) / 1024, 2),
+            "memory_percent": round(rss_kb * 100 / self.mem_total_kb, 2) if self.mem_total_kb else 0,
+            "threads": num_threads,
+            "page_faults": {"minor": usage.ru_minflt, "major": usage.ru_majflt},
+            "context_switches": {"voluntary": usage.ru_nvcsw, "involuntary": usage.ru_nivcsw},
+            "gc": {
+                "counts": list(gc.get_count()),
+                "collections": [
+                    {"pauses": stats["pauses"],
+                     "total_pause_ms": round(stats["total_pause_ms"], 3),
+                     "max_pause_ms": round(stats["max_pause_ms"], 3)}
+                    for stats in self.gc_stats.values()
+                ]
+            },
+            "event_rates": event_rates,
+            "event_totals": counts
+        }
+        self.latest = sample
+        self.history.append(sample)
+        return sample
+
+    def _sample_tick(self):
+        """Periodic task (every `interval`): take a sample and hand it to on_sample"""
+        try:
+            sample = self.sample()
+            if self.on_sample:
+                self.on_sample(sample)
+        except Exception as e:
+            logger.error(f"Error sampling process metrics: {e}")
+
+    def start(self):
+        """Start sampling as a periodic task on the supervisor"""
+        if self.is_running:
+            return
+        self.is_running = True
+        gc.callbacks.append(self._gc_callback)
+        self.sampler_task = self.supervisor.every("metrics.sampler", self.interval, self._sample_tick,
+                                                  initial_delay=0)
+        logger.info("Process metrics sampler started")
+
+    def stop(self):
+        """Stop the periodic sampling"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self._gc_callback in gc.callbacks:
+            gc.callbacks.remove(self._gc_callback)
+        if self.sampler_task:
+            self.sampler_task.cancel()
+            self.sampler_task = None
+
+    def get_metrics(self, limit=60):
+        """Latest sample plus recent history for the API"""
+        return {
+            "interval": self.interval,
+            "latest": self.latest,
+            "history": list(self.history)[-limit:] if limit > 0 else []
+        }
+
+
+# Shared sampler so components can report events without holding a reference
+default_sampler = ProcessMetricsSampler()
+
+
+def record_event(component, count=1):
+    default_sampler.record_event(component, count)
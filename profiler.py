@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_FREQUENCY = 1000  # samples per second
+
+
+def _positive_number(name, value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    if not 0 < number < float('inf'):
+        raise ValueError(f"{name} must be a positive number, got {value!r}")
+    return number
+
+
+def parse_options(frequency=None, duration=None):
+    """Validate start() options from a request; returns (frequency, duration), raises ValueError"""
+    if frequency is not None:
+        frequency = max(1, min(int(_positive_number("frequency", frequency)), MAX_FREQUENCY))
+    if duration is not None:
+        duration = _positive_number("duration", duration)
+    return frequency, duration
+
+
+class SamplingProfiler:
+    def __init__(self, frequency=100, max_depth=64):
+        self.frequency = frequency
+        self.max_depth = max_depth
+        self.stacks = {}  # folded stack tuple -> sample count
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self.is_running = False
+        self.stop_event = threading.Event()
+        self.sampler_thread = None
+        self._labels = {}  # code object -> frame label
+        self.lock = threading.Lock()
+
+    def start(self, frequency=None, duration=None):
+        """Start sampling all threads; stops by itself after `duration` seconds.
+        Raises ValueError for a frequency or duration that is not a positive number."""
+        frequency, duration = parse_options(frequency, duration)
+        with self.lock:
+            if self.is_running:
+                return False
+            if frequency:
+                self.frequency = frequency
+            self.stacks = {}
+            self.samples = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.is_running = True
+            self.stop_event.clear()
+            self.sampler_thread = threading.Thread(
+                target=self._sampling_loop, args=(duration,), name="sampling-profiler", daemon=True)
+            self.sampler_thread.start()
+        logger.info(f"Sampling profiler started at {self.frequency} Hz")
+        return True
+
+    def stop(self):
+        """Stop sampling, the collected stacks stay available"""
+        with self.lock:
+            if not self.is_running:
+                return False
+            self.is_running = False
+            self.stop_event.set()
+            thread = self.sampler_thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=1)
+        self.stopped_at = time.time()
+        logger.info(f"Sampling profiler stopped after {self.samples} samples")
+        return True
+
+    def _frame_label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _sampling_loop(self, duration):
+        interval = 1.0 / self.frequency
+        deadline = time.monotonic() + duration if duration else None
+        own_ident = threading.get_ident()
+        thread_names = {}
+        while not self.stop_event.wait(interval):
+            if deadline and time.monotonic() >= deadline:
+                break
+            frames = sys._current_frames()
+            if len(thread_names) != len(frames):
+                thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                depth = 0
+                while frame is not None and depth < self.max_depth:
+                    stack.append(self._frame_label(frame.f_code))
+                    frame = frame.f_back
+                    depth += 1
+                stack.append(thread_names.get(ident, f"thread-{ident}"))
+                key = tuple(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+            del frames
+        if self.is_running:
+            self.stop()
+
+    def get_folded(self):
+        """Folded stacks ("root;child;leaf count") for flamegraph.pl / speedscope"""
+        stacks = dict(self.stacks)
+        lines = [f"{';'.join(stack)} {count}" for stack, count in stacks.items()]
+        lines.sort()
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def get_status(self):
+        """Profiler state for the dashboard"""
+        return {
+            "running": self.is_running,
+            "frequency": self.frequency,
+            "samples": self.samples,
+            "unique_stacks": len(self.stacks),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at
+        }
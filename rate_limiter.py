@@ -0,0 +1,109 @@
+import logging
+import threading
+from flask import request, jsonify
+from instrumentation import REGISTRY
+from clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = REGISTRY.counter('rate_limited_requests_total', 'Requests rejected with 429', ['app'])
+
+
+class TokenBucketLimiter:
+    """Per-source token buckets, optionally tighter per (source, route).
+
+    Buckets are [tokens, last_refill] lists in one dict and refill lazily on access;
+    buckets idle for `idle_seconds` are full again, so they are simply evicted. Server
+    threads share the limiter, so checks and sweeps run under one lock.
+    """
+
+    def __init__(self, rate=10.0, burst=20, route_limits=None, idle_seconds=300, max_keys=100000, name="app",
+                 clock=None):
+        self.rate = rate
+        self.burst = burst
+        self.route_limits = route_limits or {}  # route -> (rate, burst)
+        self.idle_seconds = idle_seconds
+        self.max_keys = max_keys
+        self.clock = clock or SYSTEM_CLOCK
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.last_sweep = self.clock.monotonic()
+        self.allowed = 0
+        self.limited = 0
+        self.rejected_counter = RATE_LIMITED.labels(name)
+
+    def _take(self, key, rate, burst, now):
+        """Take one token from the bucket for `key`; returns seconds to wait, 0 if allowed"""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key] = [burst - 1.0, now]
+            return 0.0
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return 0.0
+        bucket[0] = tokens
+        return (1.0 - tokens) / rate
+
+    def check(self, source, route=None, now=None):
+        """Seconds the caller has to wait; 0 means the request is admitted"""
+        now = self.clock.monotonic() if now is None else now
+        with self.lock:
+            if now - self.last_sweep > self.idle_seconds or len(self.buckets) > self.max_keys:
+                self._sweep(now)
+            wait = self._take(source, self.rate, self.burst, now)
+            limit = self.route_limits.get(route)
+            if not wait and limit is not None:
+                wait = self._take((source, route), limit[0], limit[1], now)
+            if wait:
+                self.limited += 1
+            else:
+                self.allowed += 1
+        if wait:
+            self.rejected_counter.inc()
+        return wait
+
+    def sweep(self, now=None):
+        """Drop buckets that have refilled completely (idle longer than idle_seconds)"""
+        now = self.clock.monotonic() if now is None else now
+        with self.lock:
+            self._sweep(now)
+
+    def _sweep(self, now):
+        cutoff = now - self.idle_seconds
+        stale = [key for key, bucket in self.buckets.items() if bucket[1] < cutoff]
+        for key in stale:
+            self.buckets.pop(key, None)
+        if len(self.buckets) > self.max_keys:
+            # Still too many live sources: forget the least recently seen half
+            keep = sorted(self.buckets.items(), key=lambda item: item[1][1])[len(self.buckets) // 2:]
+            self.buckets = dict(keep)
+            logger.warning("Rate limiter over %s sources, evicted the oldest half", self.max_keys)
+        self.last_sweep = now
+
+    def install(self, app, exempt=()):
+        """Register as a before_request hook answering 429 with Retry-After"""
+        exempt = set(exempt)
+
+        @app.before_request
+        def rate_limit():
+            route = request.url_rule.rule if request.url_rule is not None else None
+            if route in exempt:
+                return None
+            wait = self.check(request.remote_addr, route)
+            if wait:
+                response = jsonify({"error": "Too many requests", "retry_after": round(wait, 2)})
+                response.status_code = 429
+                response.headers["Retry-After"] = str(max(1, int(wait + 0.999)))
+                return response
+            return None
+
+        return rate_limit
+
+    def get_stats(self):
+        return {
+            "sources": len(self.buckets),
+            "allowed": self.allowed,
+            "limited": self.limited
+        }
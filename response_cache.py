@@ -0,0 +1,121 @@
+import gzip
+import json
+import hashlib
+import threading
+import logging
+from flask import request, Response
+from instrumentation import REGISTRY
+from clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = REGISTRY.counter('response_cache_requests_total', 'Cached endpoint requests by outcome',
+                                  ['route', 'result'])
+
+
+class CachedBody:
+    __slots__ = ('version', 'created', 'etag', 'compressed', 'size')
+
+    def __init__(self, version, created, etag, compressed, size):
+        self.version = version
+        self.created = created
+        self.etag = etag  # strong validator of the identity body
+        self.compressed = compressed
+        self.size = size
+
+
+def _compact_dumps(obj):
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True, default=str)
+
+
+class ResponseCache:
+    """Serialized JSON responses reused while the state version is unchanged and younger than `ttl`.
+
+    Bodies are stored gzip-compressed and sent as-is to clients accepting gzip; every
+    response carries a strong ETag so polling clients mostly get 304s.
+    """
+
+    def __init__(self, ttl=2.0, max_entries=64, compresslevel=6, dumps=None, clock=None):
+        self.ttl = ttl
+        self.clock = clock or SYSTEM_CLOCK
+        self.max_entries = max_entries
+        self.compresslevel = compresslevel
+        self.dumps = dumps or _compact_dumps
+        self.version = 0
+        self.entries = {}
+        self.building = {}  # key -> lock, so only one request rebuilds a stale entry
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def invalidate(self):
+        """Bump the state version: every entry is rebuilt on its next request"""
+        with self.lock:
+            self.version += 1
+
+    def _fresh(self, key, now):
+        entry = self.entries.get(key)
+        if entry is not None and entry.version == self.version and now - entry.created < self.ttl:
+            return entry
+        return None
+
+    def get(self, key, build):
+        """(entry, hit) for `key`, serializing build() when the entry is missing or stale"""
+        entry = self._fresh(key, self.clock.monotonic())
+        if entry is not None:
+            self.hits += 1
+            return entry, True
+        with self.lock:
+            build_lock = self.building.setdefault(key, threading.Lock())
+        with build_lock:
+            # A concurrent request may have rebuilt it while we waited
+            entry = self._fresh(key, self.clock.monotonic())
+            if entry is not None:
+                self.hits += 1
+                return entry, True
+            version = self.version  # read first, an invalidate during build() must win
+            body = self.dumps(build())
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+            entry = CachedBody(version, self.clock.monotonic(), etag, gzip.compress(body, self.compresslevel), len(body))
+            with self.lock:
+                if key not in self.entries and len(self.entries) >= self.max_entries:
+                    self.entries.pop(next(iter(self.entries)))
+                self.entries[key] = entry
+            self.misses += 1
+            return entry, False
+
+    def respond(self, key, build):
+        """Flask response for `key`: 304 on a matching If-None-Match, gzip body when accepted"""
+        entry, hit = self.get(key, build)
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        use_gzip = request.accept_encodings['gzip'] > 0
+        # Strong validators differ per content-coding; either one matches the same state
+        etag = entry.etag + '-gzip' if use_gzip else entry.etag
+        if request.if_none_match.contains(entry.etag) or request.if_none_match.contains(entry.etag + '-gzip'):
+            self.not_modified += 1
+            CACHE_REQUESTS.labels(route, 'not_modified').inc()
+            response = Response(status=304)
+        else:
+            CACHE_REQUESTS.labels(route, 'hit' if hit else 'miss').inc()
+            if use_gzip:
+                response = Response(entry.compressed, mimetype='application/json')
+                response.headers['Content-Encoding'] = 'gzip'
+            else:
+                response = Response(gzip.decompress(entry.compressed), mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def get_stats(self):
+        return {
+            "entries": len(self.entries),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "cached_bytes": sum(len(entry.compressed) for entry in list(self.entries.values()))
+        }
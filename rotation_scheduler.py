@@ -0,0 +1,248 @@
+import math
+import random
+import threading
+import logging
+from datetime import timedelta
+from clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    __slots__ = ('callback', 'args', 'target_tick', 'cancelled')
+
+    def __init__(self, callback, args, target_tick):
+        self.callback = callback
+        self.args = args
+        self.target_tick = target_tick
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Hashed timing wheel: O(1) schedule/cancel, one thread fires all timers"""
+
+    def __init__(self, resolution=0.1, slots=512, name="timer-wheel", clock=None):
+        self.resolution = resolution
+        self.clock = clock or SYSTEM_CLOCK
+        self.slots = [[] for _ in range(slots)]
+        self.name = name
+        self.tick = 0
+        self.started_at = None
+        self.cond = threading.Condition(threading.Lock())
+        self.is_running = False
+        self.stop_event = threading.Event()
+        self.wheel_thread = None
+
+    def schedule(self, delay, callback, *args):
+        """Run callback(*args) after `delay` seconds (0 = next tick), returns a TimerHandle"""
+        with self.cond:
+            ticks = max(1, math.ceil(delay / self.resolution))
+            handle = TimerHandle(callback, args, self.tick + ticks)
+            self.slots[handle.target_tick % len(self.slots)].append(handle)
+            return handle
+
+    def reschedule(self, handle, delay):
+        """Cancel a timer and schedule its callback again, returns the new handle"""
+        if handle is not None:
+            handle.cancel()
+            return self.schedule(delay, handle.callback, *handle.args)
+        return None
+
+    def _advance(self):
+        """Wait for the next tick and collect the timers due in it"""
+        with self.cond:
+            next_tick_at = self.started_at + (self.tick + 1) * self.resolution
+        remaining = next_tick_at - self.clock.monotonic()
+        if remaining > 0:
+            self.clock.wait(self.stop_event, remaining)
+            if not self.is_running or self.clock.monotonic() < next_tick_at:
+                return []
+        with self.cond:
+            self.tick += 1
+            slot = self.slots[self.tick % len(self.slots)]
+            due = [h for h in slot if h.target_tick <= self.tick]
+            if due:
+                slot[:] = [h for h in slot if h.target_tick > self.tick]
+            return [h for h in due if not h.cancelled]
+
+    def _run(self):
+        while self.is_running:
+            for handle in self._advance():
+                try:
+                    handle.callback(*handle.args)
+                except Exception as e:
+                    logger.error(f"Error in timer callback {handle.callback}: {e}")
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.stop_event.clear()
+        self.started_at = self.clock.monotonic() - self.tick * self.resolution
+        self.wheel_thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.wheel_thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.is_running = False
+            self.stop_event.set()
+        if self.wheel_thread and self.wheel_thread is not threading.current_thread():
+            self.wheel_thread.join(timeout=1)
+
+
+class RotationPolicy:
+    """Base policy: hooks may change the interval and the rotation plan"""
+
+    def adjust_interval(self, firewall, interval):
+        return interval
+
+    def adjust_plan(self, firewall, keep, avoid):
+        """Add ports to `keep` (never close) or `avoid` (never open)"""
+
+
+class ThreatAdaptivePolicy(RotationPolicy):
+    """Rotate faster as the threat level rises: interval scales down to `min_factor` at 100"""
+
+    def __init__(self, min_factor=0.2):
+        self.min_factor = min_factor
+
+    def adjust_interval(self, firewall, interval):
+        threat = firewall.monitoring_data.get("threat_level", 0)
+        return interval * (1 - (threat / 100.0) * (1 - self.min_factor))
+
+
+class ScanAvoidancePolicy(RotationPolicy):
+    """Do not open ports that were probed recently"""
+
+    def __init__(self, window_seconds=300, min_hits=3, lookback=500):
+        self.window_seconds = window_seconds
+        self.min_hits = min_hits
+        self.lookback = lookback
+
+    def scanned_ports(self, firewall):
+        cutoff = (firewall.clock.now() - timedelta(seconds=self.window_seconds)).isoformat()
+        hits = {}
+        for attack in reversed(firewall.attack_log[-self.lookback:]):
+            if attack["timestamp"] < cutoff:
+                break
+            hits[attack["port"]] = hits.get(attack["port"], 0) + 1
+        return {port for port, count in hits.items() if count >= self.min_hits}
+
+    def adjust_plan(self, firewall, keep, avoid):
+        avoid.update(self.scanned_ports(firewall))
+
+
+class ServicePortPolicy(RotationPolicy):
+    """Service ports stay open across rotations"""
+
+    def __init__(self, service_ports):
+        self.service_ports = set(service_ports)
+
+    def adjust_plan(self, firewall, keep, avoid):
+        keep.update(p for p in self.service_ports if p in firewall.ports)
+
+
+class RotationScheduler:
+    def __init__(self, firewall, policies=None, wheel=None, min_interval=2, max_interval=300,
+                 burst_threshold=10, min_open=2):
+        self.firewall = firewall
+        self.policies = policies if policies is not None else [ThreatAdaptivePolicy(), ScanAvoidancePolicy()]
+        self.wheel = wheel or TimerWheel(name="rotation-wheel", clock=firewall.clock)
+        self.owns_wheel = wheel is None
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.burst_threshold = burst_threshold  # attacks since last rotation that trigger one now
+        self.min_open = min_open
+        self.handle = None
+        self.attacks_since_rotation = 0
+        self.next_interval = firewall.rotation_interval
+        self.lock = threading.Lock()
+        self.is_running = False
+
+    def current_interval(self):
+        interval = self.firewall.rotation_interval
+        for policy in self.policies:
+            interval = policy.adjust_interval(self.firewall, interval)
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def plan(self):
+        """Pick (ports_to_close, ports_to_open) honouring the policies"""
+        firewall = self.firewall
+        keep, avoid = set(), set()
+        for policy in self.policies:
+            policy.adjust_plan(firewall, keep, avoid)
+
+        open_ports = list(firewall.current_open_ports)
+        closable = [p for p in open_ports if p not in keep]
+        to_close = random.sample(closable, min(2, len(closable)))
+
+        remaining = set(open_ports) - set(to_close)
+        candidates = [p for p in firewall.ports if p not in remaining and p not in to_close and p not in avoid]
+        if len(candidates) < 1:
+            # Everything is avoided: fall back to any closed port rather than leaving none to rotate to
+            candidates = [p for p in firewall.ports if p not in remaining and p not in to_close]
+        wanted = max(random.randint(1, 2), self.min_open - len(remaining))
+        to_open = random.sample(candidates, min(wanted, len(candidates)))
+        # Service ports that are currently closed get opened too
+        to_open.extend(p for p in keep if p not in remaining and p not in to_open)
+        return to_close, to_open
+
+    def _rotate(self):
+        with self.lock:
+            if not self.is_running:
+                return
+            self.handle = None  # on_attack must not queue a second rotation meanwhile
+            self.attacks_since_rotation = 0
+        try:
+            self.firewall.rotate_ports(self.plan())
+        except Exception as e:
+            logger.error(f"Error rotating ports: {e}")
+        with self.lock:
+            if self.is_running and self.handle is None:
+                self.next_interval = self.current_interval()
+                self.handle = self.wheel.schedule(self.next_interval, self._rotate)
+
+    def on_attack(self, port=None):
+        """Called for every blocked attempt; a burst brings the next rotation forward"""
+        with self.lock:
+            self.attacks_since_rotation += 1
+            if self.handle is not None and self.attacks_since_rotation == self.burst_threshold:
+                logger.info("Attack burst detected, rotating immediately")
+                self.handle = self.wheel.reschedule(self.handle, 0)
+
+    def reschedule(self, delay=None):
+        """Re-evaluate the interval now (e.g. after a threat level change)"""
+        with self.lock:
+            if self.handle is not None:
+                self.next_interval = self.current_interval() if delay is None else delay
+                self.handle = self.wheel.reschedule(self.handle, self.next_interval)
+
+    def start(self):
+        with self.lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            if self.owns_wheel:
+                self.wheel.start()
+            self.next_interval = self.current_interval()
+            self.handle = self.wheel.schedule(self.next_interval, self._rotate)
+
+    def stop(self):
+        with self.lock:
+            self.is_running = False
+            if self.handle:
+                self.handle.cancel()
+                self.handle = None
+        if self.owns_wheel:
+            self.wheel.stop()
+
+    def get_status(self):
+        return {
+            "running": self.is_running,
+            "next_interval": round(self.next_interval, 2),
+            "attacks_since_rotation": self.attacks_since_rotation,
+            "policies": [type(policy).__name__ for policy in self.policies]
+        }
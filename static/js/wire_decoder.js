@@ -0,0 +1,170 @@
+/*
+ * Decoder for the dashboard's compact Socket.IO frames (wire_format.py).
+ *
+ * Frames are MessagePack with map keys replaced by indexes into a key list and
+ * isoformat() timestamps sent as ext type 1 (int64 epoch milliseconds).
+ *
+ *   socket.on('wire_format', function (spec) { decoder = new WireDecoder(spec); });
+ *   socket.emit('set_format', {format: 'compact'});
+ *   socket.on('status_update', function (data) { render(decoder.decode(data)); });
+ *
+ * decode() passes plain objects through, so handlers work before and after opting in.
+ */
+(function (root) {
+    'use strict';
+
+    var textDecoder = typeof TextDecoder !== 'undefined' ? new TextDecoder('utf-8') : null;
+
+    function pad(value, width) {
+        var text = String(value);
+        while (text.length < width) {
+            text = '0' + text;
+        }
+        return text;
+    }
+
+    // Local-time ISO string without offset, like Python's datetime.isoformat()
+    function isoLocal(millis) {
+        var d = new Date(millis);
+        return d.getFullYear() + '-' + pad(d.getMonth() + 1, 2) + '-' + pad(d.getDate(), 2) +
+            'T' + pad(d.getHours(), 2) + ':' + pad(d.getMinutes(), 2) + ':' + pad(d.getSeconds(), 2) +
+            '.' + pad(d.getMilliseconds(), 3);
+    }
+
+    function WireDecoder(spec) {
+        spec = spec || {};
+        this.keys = spec.keys || [];
+        this.timestampExt = spec.timestamp_ext === undefined ? 1 : spec.timestamp_ext;
+        // 'iso' (default, same strings as the JSON format), 'date' or 'millis'
+        this.timestamps = spec.timestamps || 'iso';
+    }
+
+    WireDecoder.prototype.decode = function (data) {
+        var bytes;
+        if (data instanceof ArrayBuffer) {
+            bytes = new Uint8Array(data);
+        } else if (ArrayBuffer.isView(data)) {
+            bytes = new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+        } else {
+            return data;  // JSON payload
+        }
+        this.view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        this.bytes = bytes;
+        this.pos = 0;
+        var value = this.read();
+        this.view = this.bytes = null;
+        return value;
+    };
+
+    WireDecoder.prototype.str = function (size) {
+        var start = this.pos;
+        this.pos += size;
+        if (textDecoder) {
+            return textDecoder.decode(this.bytes.subarray(start, this.pos));
+        }
+        var text = '';
+        for (var i = start; i < this.pos; i++) {
+            text += String.fromCharCode(this.bytes[i]);
+        }
+        return decodeURIComponent(escape(text));
+    };
+
+    WireDecoder.prototype.map = function (size) {
+        var result = {};
+        for (var i = 0; i < size; i++) {
+            var key = this.read();
+            if (typeof key === 'number' && key >= 0 && key < this.keys.length) {
+                key = this.keys[key];
+            }
+            result[key] = this.read();
+        }
+        return result;
+    };
+
+    WireDecoder.prototype.array = function (size) {
+        var result = new Array(size);
+        for (var i = 0; i < size; i++) {
+            result[i] = this.read();
+        }
+        return result;
+    };
+
+    WireDecoder.prototype.int64 = function (signed) {
+        var high = signed ? this.view.getInt32(this.pos) : this.view.getUint32(this.pos);
+        var low = this.view.getUint32(this.pos + 4);
+        this.pos += 8;
+        return high * 4294967296 + low;  // exact up to 2^53, plenty for counters and epoch millis
+    };
+
+    WireDecoder.prototype.timestamp = function (millis) {
+        if (this.timestamps === 'millis') {
+            return millis;
+        }
+        if (this.timestamps === 'date') {
+            return new Date(millis);
+        }
+        return isoLocal(millis);
+    };
+
+    WireDecoder.prototype.read = function () {
+        var view = this.view;
+        var code = this.bytes[this.pos++];
+        var value;
+        if (code < 0x80) {
+            return code;
+        }
+        if (code >= 0xe0) {
+            return code - 0x100;
+        }
+        if (code >= 0xa0 && code <= 0xbf) {
+            return this.str(code & 0x1f);
+        }
+        if (code >= 0x80 && code <= 0x8f) {
+            return this.map(code & 0x0f);
+        }
+        if (code >= 0x90 && code <= 0x9f) {
+            return this.array(code & 0x0f);
+        }
+        switch (code) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: value = this.bytes[this.pos]; this.pos += 1; break;
+            case 0xc6: value = view.getUint32(this.pos); this.pos += 4; break;
+            case 0xca: value = view.getFloat32(this.pos); this.pos += 4; return value;
+            case 0xcb: value = view.getFloat64(this.pos); this.pos += 8; return value;
+            case 0xcc: return this.bytes[this.pos++];
+            case 0xcd: value = view.getUint16(this.pos); this.pos += 2; return value;
+            case 0xce: value = view.getUint32(this.pos); this.pos += 4; return value;
+            case 0xcf: return this.int64(false);
+            case 0xd0: value = view.getInt8(this.pos); this.pos += 1; return value;
+            case 0xd1: value = view.getInt16(this.pos); this.pos += 2; return value;
+            case 0xd2: value = view.getInt32(this.pos); this.pos += 4; return value;
+            case 0xd3: return this.int64(true);
+            case 0xd7:
+                if (this.bytes[this.pos] === this.timestampExt) {
+                    this.pos += 1;
+                    return this.timestamp(this.int64(true));
+                }
+                break;
+            case 0xd9: value = this.bytes[this.pos]; this.pos += 1; return this.str(value);
+            case 0xda: value = view.getUint16(this.pos); this.pos += 2; return this.str(value);
+            case 0xdb: value = view.getUint32(this.pos); this.pos += 4; return this.str(value);
+            case 0xdc: value = view.getUint16(this.pos); this.pos += 2; return this.array(value);
+            case 0xdd: value = view.getUint32(this.pos); this.pos += 4; return this.array(value);
+            case 0xde: value = view.getUint16(this.pos); this.pos += 2; return this.map(value);
+            case 0xdf: value = view.getUint32(this.pos); this.pos += 4; return this.map(value);
+        }
+        if (code === 0xc4 || code === 0xc6) {
+            var start = this.pos;
+            this.pos += value;
+            return this.bytes.slice(start, this.pos);
+        }
+        throw new Error('Unsupported wire format code 0x' + code.toString(16) + ' at offset ' + (this.pos - 1));
+    };
+
+    root.WireDecoder = WireDecoder;
+    if (typeof module !== 'undefined' && module.exports) {
+        module.exports = WireDecoder;
+    }
+})(typeof window !== 'undefined' ? window : this);
@@ -0,0 +1,248 @@
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class HalfSpaceTrees:
+    """Streaming Half-Space Trees (Tan, Ting & Liu 2011) with heap-ordered array trees.
+
+    The mass of the window being filled becomes the scoring reference once the window is full.
+    """
+
+    def __init__(self, n_trees=25, max_depth=10, window_size=250, size_limit=None,
+                 contamination=0.1, feature_range=None, seed=42):
+        self.n_trees = n_trees
+        self.max_depth = max_depth
+        self.window_size = window_size
+        self.size_limit = size_limit if size_limit is not None else max(1.0, 0.1 * window_size)
+        self.contamination = contamination
+        self.feature_range = feature_range
+        self.rng = np.random.default_rng(seed)
+        self.n_internal = 2 ** max_depth - 1
+        self.n_nodes = 2 ** (max_depth + 1) - 1
+        self.split_dim = None
+        self.split_value = None
+        self.r_mass = None  # reference masses used for scoring
+        self.l_mass = None  # masses of the window being filled
+        self.offset = None
+        self.scale = None
+        self.window = None  # preallocated buffer of the current window's samples
+        self.window_fill = 0
+        self.threshold = None
+        self.windows_completed = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Retrained models come back from a worker process, the lock does not pickle
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @property
+    def is_ready(self):
+        return self.r_mass is not None
+
+    def _build(self, n_features, lows, highs):
+        """Draw random half-space splits inside a randomly perturbed work space"""
+        span = np.where(highs > lows, highs - lows, 1.0)
+        self.offset = lows
+        self.scale = 1.0 / span
+        self.split_dim = np.empty((self.n_trees, self.n_internal), dtype=np.int64)
+        self.split_value = np.empty((self.n_trees, self.n_internal))
+        for t in range(self.n_trees):
+            s = self.rng.random(n_features)
+            radius = 2 * np.maximum(s, 1 - s)
+            mins = np.tile(s - radius, (self.n_nodes, 1))
+            maxs = np.tile(s + radius, (self.n_nodes, 1))
+            for node in range(self.n_internal):
+                q = self.rng.integers(n_features)
+                mid = (mins[node, q] + maxs[node, q]) / 2
+                self.split_dim[t, node] = q
+                self.split_value[t, node] = mid
+                left, right = 2 * node + 1, 2 * node + 2
+                mins[left], maxs[left] = mins[node], maxs[node]
+                mins[right], maxs[right] = mins[node], maxs[node]
+                maxs[left, q] = mid
+                mins[right, q] = mid
+        self.l_mass = np.zeros((self.n_trees, self.n_nodes))
+
+    def _paths(self, X):
+        """Node index per (depth, tree, sample) for a scaled batch"""
+        m = X.shape[0]
+        rows = np.arange(m)
+        trees = np.arange(self.n_trees)[:, None]
+        nodes = np.zeros((self.n_trees, m), dtype=np.int64)
+        paths = np.empty((self.max_depth + 1, self.n_trees, m), dtype=np.int64)
+        paths[0] = nodes
+        for depth in range(1, self.max_depth + 1):
+            dims = self.split_dim[trees, nodes]
+            go_left = X[rows, dims] < self.split_value[trees, nodes]
+            nodes = np.where(go_left, 2 * nodes + 1, 2 * nodes + 2)
+            paths[depth] = nodes
+        return paths
+
+    def _scale(self, X):
+        return (X - self.offset) * self.scale
+
+    def _accumulate(self, X):
+        """Add the batch to the latest-window masses"""
+        paths = self._paths(self._scale(X))
+        flat = (paths + (np.arange(self.n_trees) * self.n_nodes)[None, :, None]).ravel()
+        self.l_mass += np.bincount(flat, minlength=self.n_trees * self.n_nodes).reshape(self.l_mass.shape)
+
+    def _raw_scores(self, X, r_mass):
+        paths = self._paths(self._scale(X))
+        trees = np.arange(self.n_trees)[:, None]
+        m = X.shape[0]
+        scores = np.zeros(m)
+        done = np.zeros((self.n_trees, m), dtype=bool)
+        for depth in range(self.max_depth + 1):
+            mass = r_mass[trees, paths[depth]]
+            terminal = ~done & ((mass < self.size_limit) | (depth == self.max_depth))
+            scores += np.where(terminal, mass * (2.0 ** depth), 0.0).sum(axis=0)
+            done |= terminal
+        return scores
+
+    def _complete_window(self):
+        """Promote the filled window to the reference profile and refresh the threshold"""
+        self.r_mass = self.l_mass
+        self.l_mass = np.zeros_like(self.r_mass)
+        window_scores = self._normalize(self._raw_scores(self.window, self.r_mass))
+        self.threshold = float(np.quantile(window_scores, 1 - self.contamination))
+        self.window_fill = 0
+        self.windows_completed += 1
+
+    def _normalize(self, raw):
+        """Map mass scores to [0, 1], higher means more anomalous"""
+        best = np.log2(1 + self.window_size * 2.0 ** self.max_depth)
+        return 1.0 - np.minimum(np.log2(1 + raw / self.n_trees) / best, 1.0)
+
+    def learn(self, X):
+        """Incrementally update the model with a batch of feature vectors"""
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X[None, :]
+        with self.lock:
+            if self.window is None:
+                self.window = np.empty((self.window_size, X.shape[1]))
+            position = 0
+            while position < len(X):
+                take = min(self.window_size - self.window_fill, len(X) - position)
+                chunk = X[position:position + take]
+                self.window[self.window_fill:self.window_fill + take] = chunk
+                self.window_fill += take
+                position += take
+                if self.split_dim is not None:
+                    self._accumulate(chunk)
+                if self.window_fill == self.window_size:
+                    if self.split_dim is None:
+                        # First window: fix the feature scaling and build the trees from it
+                        if self.feature_range is not None:
+                            lows, highs = (np.asarray(v, dtype=float) for v in self.feature_range)
+                        else:
+                            lows, highs = self.window.min(axis=0), self.window.max(axis=0)
+                        self._build(X.shape[1], lows, highs)
+                        self._accumulate(self.window)
+                    self._complete_window()
+
+    def score_samples(self, X):
+        """Anomaly scores in [0, 1] for a batch (higher is more anomalous)"""
+        r_mass = self.r_mass
+        if r_mass is None:
+            raise Exception("Model not trained yet")
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X[None, :]
+        return self._normalize(self._raw_scores(X, r_mass))
+
+    def predict(self, X):
+        """sklearn-style labels: -1 for anomalies, 1 for inliers"""
+        return np.where(self.score_samples(X) > self.threshold, -1, 1)
+
+
+class MicroBatchScorer:
+    """Collects single-sample requests and scores them together in one vectorized call.
+
+    A sample reaching an idle scorer is scored at once. While requests keep coming the
+    worker waits up to `max_delay` for a batch to fill, so the gain is throughput: each
+    sample then pays its share of one score_fn call plus up to `max_delay` of latency.
+    """
+
+    def __init__(self, score_fn, max_batch=256, max_delay=0.002):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending = deque()
+        self.ready = threading.Condition(threading.Lock())
+        self.is_running = False
+        self.worker_thread = None
+        self.stats = {"batches": 0, "samples": 0}
+
+    def start(self):
+        with self.ready:
+            self._start()
+
+    def _start(self):
+        # Called with self.ready held, so concurrent submits start one worker
+        if self.is_running:
+            return
+        self.is_running = True
+        self.worker_thread = threading.Thread(target=self._worker_loop, name="micro-batch-scorer", daemon=True)
+        self.worker_thread.start()
+
+    def stop(self):
+        with self.ready:
+            self.is_running = False
+            self.ready.notify()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=1)
+
+    def submit(self, x):
+        """Queue one feature vector, returns a Future resolving to its score"""
+        future = Future()
+        with self.ready:
+            if not self.is_running:
+                self._start()
+            self.pending.append((x, future))
+            if len(self.pending) == 1 or len(self.pending) >= self.max_batch:
+                self.ready.notify()
+        return future
+
+    def score(self, x, timeout=1.0):
+        return self.submit(x).result(timeout)
+
+    def _take_batch(self):
+        with self.ready:
+            idle = not self.pending
+            while not self.pending and self.is_running:
+                self.ready.wait(0.1)
+            if not idle and len(self.pending) < self.max_batch and self.is_running:
+                # Requests are arriving back to back: give concurrent callers a moment to join this batch
+                self.ready.wait(self.max_delay)
+            count = min(len(self.pending), self.max_batch)
+            return [self.pending.popleft() for _ in range(count)]
+
+    def _worker_loop(self):
+        while self.is_running or self.pending:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            futures = [future for _, future in batch]
+            try:
+                scores = self.score_fn(np.asarray([x for x, _ in batch], dtype=float))
+                for future, score in zip(futures, scores):
+                    future.set_result(score)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            self.stats["batches"] += 1
+            self.stats["samples"] += len(batch)
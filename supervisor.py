@@ -0,0 +1,312 @@
+import time
+import logging
+import threading
+from collections import deque
+from instrumentation import REGISTRY
+from rotation_scheduler import TimerWheel
+from clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+TASK_SECONDS = REGISTRY.histogram(
+    'supervisor_task_seconds', 'Wall time of supervised tasks', ['task'])
+TASK_CPU_SECONDS = REGISTRY.counter(
+    'supervisor_task_cpu_seconds_total', 'Thread CPU time used by supervised tasks', ['task'])
+TASKS_REJECTED = REGISTRY.counter(
+    'supervisor_rejected_tasks_total', 'Tasks refused because their pool was full', ['pool'])
+
+
+class Task:
+    """One submitted job. cancel() sets its event: a queued job is dropped, a running
+    job started with cancellable=True sees the event and is expected to return."""
+
+    def __init__(self, name, func, args, kwargs, cancellable=False):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancellable = cancellable  # func(cancel_event, *args, **kwargs)
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.state = 'queued'  # queued, running, done, failed, cancelled
+        self.result = None
+        self.error = None
+        self.submitted = time.perf_counter()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.done_event.is_set()
+
+    def wait(self, timeout=None):
+        return self.done_event.wait(timeout)
+
+
+class WorkerPool:
+    """Named pool of at most `max_workers` threads, started on demand, and a queue of at
+    most `max_queue` waiting jobs; submit() returns None instead of queueing past that."""
+
+    def __init__(self, supervisor, name, max_workers=1, max_queue=0):
+        self.supervisor = supervisor
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.workers = []
+        self.running = set()
+        self.busy = 0
+        self.rejected = 0
+        self.is_running = True
+        self.rejected_counter = TASKS_REJECTED.labels(name)
+
+    def submit(self, name, func, *args, cancellable=False, **kwargs):
+        """Queue func(*args, **kwargs) as task `name`; None if the pool is full or stopped"""
+        task = Task(name, func, args, kwargs, cancellable)
+        with self.cond:
+            if not self.is_running or self.busy + len(self.queue) >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                self.rejected_counter.inc()
+                return None
+            self.queue.append(task)
+            if len(self.workers) < min(self.max_workers, self.busy + len(self.queue)):
+                worker = threading.Thread(target=self._worker, name=f"{self.name}-{len(self.workers)}", daemon=True)
+                self.workers.append(worker)
+                worker.start()
+            self.cond.notify()
+        return task
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while self.is_running and not self.queue:
+                    self.cond.wait()
+                if not self.queue:
+                    self.workers.remove(threading.current_thread())
+                    return
+                task = self.queue.popleft()
+                self.running.add(task)
+                self.busy += 1
+            try:
+                self.supervisor.run_task(task)
+            finally:
+                with self.cond:
+                    self.running.discard(task)
+                    self.busy -= 1
+
+    def stop(self, timeout=1.0):
+        """Cancel queued and running tasks and let the workers exit"""
+        with self.cond:
+            self.is_running = False
+            for task in list(self.queue) + list(self.running):
+                task.cancel()
+            self.cond.notify_all()
+            workers = list(self.workers)
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            if worker is not threading.current_thread():
+                worker.join(max(0, deadline - time.monotonic()))
+
+    def get_stats(self):
+        with self.cond:
+            return {
+                "workers": len(self.workers),
+                "max_workers": self.max_workers,
+                "busy": self.busy,
+                "queued": len(self.queue),
+                "max_queue": self.max_queue,
+                "rejected": self.rejected
+            }
+
+
+class PeriodicTask:
+    """Runs func every `interval` seconds (a number or a callable returning one), measured
+    from the end of the previous run so runs never overlap."""
+
+    def __init__(self, supervisor, name, interval, func, args, pool):
+        self.supervisor = supervisor
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.args = args
+        self.pool = pool
+        self.handle = None
+        self.cancelled = False
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def next_interval(self):
+        return self.interval() if callable(self.interval) else self.interval
+
+    def schedule(self, delay):
+        with self.lock:
+            if not self.cancelled:
+                self.handle = self.supervisor.wheel.schedule(delay, self._fire)
+
+    def _fire(self):
+        """Timer thread: hand the run to the pool, the timer never runs task code"""
+        if self.cancelled:
+            return
+        if self.pool.submit(self.name, self._run) is None:
+            self.skipped += 1
+            self.schedule(self.next_interval())
+
+    def _run(self):
+        try:
+            self.func(*self.args)
+        finally:
+            self.schedule(self.next_interval())
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.handle is not None:
+                self.handle.cancel()
+        self.supervisor.forget(self)
+
+
+class Supervisor:
+    """Owns the worker pools and periodic tasks of the process, and accounts their CPU and latency.
+
+    Periodic tasks share one timer thread (a TimerWheel on the supervisor's clock) that
+    only hands due runs to a pool, so a slow task delays nothing but itself.
+    """
+
+    def __init__(self, name="supervisor", clock=None, periodic_workers=4):
+        self.name = name
+        self.clock = clock or SYSTEM_CLOCK
+        self.wheel = TimerWheel(name=f"{name}-timer", clock=self.clock)
+        self.pools = {}
+        self.periodic = []
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.periodic_workers = periodic_workers
+
+    def pool(self, name, max_workers=1, max_queue=0):
+        """Get or create the pool `name`"""
+        with self.lock:
+            pool = self.pools.get(name)
+            if pool is None:
+                pool = self.pools[name] = WorkerPool(self, name, max_workers, max_queue)
+            return pool
+
+    def submit(self, pool_name, name, func, *args, **kwargs):
+        return self.pool(pool_name).submit(name, func, *args, **kwargs)
+
+    def every(self, name, interval, func, *args, initial_delay=None, pool=None):
+        """Run func(*args) periodically; returns a PeriodicTask, cancel() stops it"""
+        pool = pool or self.pool("periodic", max_workers=self.periodic_workers, max_queue=64)
+        task = PeriodicTask(self, name, interval, func, args, pool)
+        with self.lock:
+            self.periodic.append(task)
+        self.wheel.start()
+        task.schedule(task.next_interval() if initial_delay is None else initial_delay)
+        return task
+
+    def forget(self, periodic_task):
+        with self.lock:
+            if periodic_task in self.periodic:
+                self.periodic.remove(periodic_task)
+
+    def run_task(self, task):
+        """Run one task on the calling worker thread and record its accounting"""
+        if task.cancelled:
+            task.state = 'cancelled'
+            task.done_event.set()
+            self._account(task.name, None)
+            return
+        task.state = 'running'
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            if task.cancellable:
+                task.result = task.func(task.cancel_event, *task.args, **task.kwargs)
+            else:
+                task.result = task.func(*task.args, **task.kwargs)
+            task.state = 'cancelled' if task.cancelled else 'done'
+        except Exception as e:
+            task.error = e
+            task.state = 'failed'
+            logger.error(f"Task {task.name} failed: {e}")
+        finally:
+            wall = time.perf_counter() - start
+            self._account(task.name, task.state, wall, time.thread_time() - cpu_start, start - task.submitted)
+            task.done_event.set()
+
+    def _account(self, name, state, wall=0.0, cpu=0.0, queued=0.0):
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = {"runs": 0, "failed": 0, "cancelled": 0, "wall_seconds": 0.0,
+                                            "cpu_seconds": 0.0, "queue_seconds": 0.0, "max_wall_seconds": 0.0,
+                                            "last_wall_seconds": 0.0}
+            if state in (None, 'cancelled'):
+                stats["cancelled"] += 1
+            if state is None:
+                return
+            stats["runs"] += 1
+            stats["failed"] += state == 'failed'
+            stats["wall_seconds"] += wall
+            stats["cpu_seconds"] += cpu
+            stats["queue_seconds"] += queued
+            stats["max_wall_seconds"] = max(stats["max_wall_seconds"], wall)
+            stats["last_wall_seconds"] = wall
+        TASK_SECONDS.labels(name).observe(wall)
+        TASK_CPU_SECONDS.labels(name).inc(cpu)
+
+    def stop(self, timeout=2.0):
+        """Cancel periodic tasks, cancel and drain the pools, stop the timer thread"""
+        with self.lock:
+            periodic = list(self.periodic)
+            pools = list(self.pools.values())
+            self.periodic.clear()
+            self.pools.clear()
+        for task in periodic:
+            task.cancel()
+        self.wheel.stop()
+        for pool in pools:
+            pool.stop(timeout / max(1, len(pools)))
+
+    def get_stats(self):
+        with self.lock:
+            tasks = {}
+            for name, stats in self.stats.items():
+                runs = stats["runs"]
+                tasks[name] = {
+                    "runs": runs,
+                    "failed": stats["failed"],
+                    "cancelled": stats["cancelled"],
+                    "cpu_seconds": round(stats["cpu_seconds"], 4),
+                    "wall_seconds": round(stats["wall_seconds"], 4),
+                    "avg_ms": round(stats["wall_seconds"] / runs * 1000, 3) if runs else None,
+                    "max_ms": round(stats["max_wall_seconds"] * 1000, 3),
+                    "last_ms": round(stats["last_wall_seconds"] * 1000, 3),
+                    "avg_queue_ms": round(stats["queue_seconds"] / runs * 1000, 3) if runs else None
+                }
+            pools = list(self.pools.values())
+            periodic = {}
+            for task in self.periodic:
+                entry = periodic.setdefault(task.name, {"instances": 0, "skipped": 0})
+                entry["instances"] += 1
+                entry["skipped"] += task.skipped
+        return {"pools": {pool.name: pool.get_stats() for pool in pools}, "periodic": periodic, "tasks": tasks}
+
+
+SUPERVISOR = Supervisor()
+_clock_supervisors = {}
+
+
+def supervisor_for(clock=None):
+    """The process supervisor for the system clock, one shared supervisor per other clock"""
+    if clock is None or clock is SYSTEM_CLOCK:
+        return SUPERVISOR
+    supervisor = _clock_supervisors.get(clock)
+    if supervisor is None:
+        supervisor = _clock_supervisors.setdefault(clock, Supervisor(clock=clock))
+    return supervisor
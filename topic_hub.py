@@ -0,0 +1,88 @@
+import threading
+from clock import SYSTEM_CLOCK
+
+TOPICS = ('firewall', 'honeypot', 'traffic', 'ml', 'performance')
+
+DEFAULT_MAX_RATE = 1 / 3.0  # updates per second, matches the old 3 second broadcast
+MAX_RATE_LIMIT = 2.0  # hard ceiling a client may request
+
+
+class TopicHub:
+    def __init__(self, default_max_rate=DEFAULT_MAX_RATE, clock=None):
+        self.default_max_rate = default_max_rate
+        self.clock = clock or SYSTEM_CLOCK
+        self.clients = {}  # sid -> {"topics": set, "interval": float, "last_sent": {topic: ts}}
+        self.lock = threading.Lock()
+
+    def _interval_for(self, max_rate):
+        """Convert a requested rate into a minimum interval between sends"""
+        try:
+            rate = float(max_rate) if max_rate is not None else self.default_max_rate
+        except (TypeError, ValueError):
+            rate = self.default_max_rate
+        if rate <= 0:
+            rate = self.default_max_rate
+        return 1.0 / min(rate, MAX_RATE_LIMIT)
+
+    def subscribe(self, sid, topics, max_rate=None):
+        """Subscribe a client to topics, returns the accepted topic list"""
+        accepted = [t for t in (topics or []) if t in TOPICS]
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                client = {"topics": set(), "interval": self._interval_for(max_rate), "last_sent": {}}
+                self.clients[sid] = client
+            elif max_rate is not None:
+                client["interval"] = self._interval_for(max_rate)
+            client["topics"].update(accepted)
+            return sorted(client["topics"])
+
+    def unsubscribe(self, sid, topics=None):
+        """Drop some (or all) topics for a client"""
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                return []
+            if topics is None:
+                client["topics"].clear()
+            else:
+                client["topics"].difference_update(topics)
+            for topic in list(client["last_sent"]):
+                if topic not in client["topics"]:
+                    del client["last_sent"][topic]
+            return sorted(client["topics"])
+
+    def remove_client(self, sid):
+        """Forget a disconnected client"""
+        with self.lock:
+            self.clients.pop(sid, None)
+
+    def is_subscribed(self, sid):
+        with self.lock:
+            return sid in self.clients
+
+    def take_due(self, now=None, sid=None):
+        """Return {topic: [sids]} for deliveries allowed at `now` and mark them sent"""
+        now = self.clock.monotonic() if now is None else now
+        due = {}
+        with self.lock:
+            items = self.clients.items() if sid is None else [(sid, self.clients.get(sid))]
+            for client_sid, client in items:
+                if client is None:
+                    continue
+                for topic in client["topics"]:
+                    last = client["last_sent"].get(topic)
+                    if last is not None and now - last < client["interval"]:
+                        continue
+                    client["last_sent"][topic] = now
+                    due.setdefault(topic, []).append(client_sid)
+        return due
+
+    def get_stats(self):
+        """Subscriber counts per topic for monitoring"""
+        with self.lock:
+            counts = {topic: 0 for topic in TOPICS}
+            for client in self.clients.values():
+                for topic in client["topics"]:
+                    counts[topic] += 1
+            return {"clients": len(self.clients), "subscribers": counts}
@@ -1,14 +1,14 @@
 import numpy as np
 import random
-import time
 import threading
 import logging
-from datetime import datetime
 from app.config import Config
+from clock import SYSTEM_CLOCK
 
 class AITrafficGenerator:
-    def __init__(self, dashboard_callback=None):
+    def __init__(self, dashboard_callback=None, clock=None):
         self.dashboard_callback = dashboard_callback
+        self.clock = clock or SYSTEM_CLOCK
         self.logger = logging.getLogger("AITraffic")
         self.running = False
         
@@ -40,7 +40,7 @@ class AITrafficGenerator:
         for _ in range(int(features[0])):
             url = random.choices(urls, weights=weights)[0]
             self._make_request(url)
-            time.sleep(random.uniform(0.1, 0.5))
+            self.clock.sleep(random.uniform(0.1, 0.5))
         
         return features
     
@@ -56,7 +56,7 @@ class AITrafficGenerator:
         for _ in range(int(features[0])):
             url = random.choices(urls, weights=weights)[0]
             self._make_request(url)
-            time.sleep(random.uniform(0.05, 0.2))
+            self.clock.sleep(random.uniform(0.05, 0.2))
         
         return features
     
@@ -72,7 +72,7 @@ class AITrafficGenerator:
         for _ in range(int(features[0])):
             url = random.choices(urls, weights=weights)[0]
             self._make_request(url)
-            time.sleep(random.uniform(0.2, 1.0))
+            self.clock.sleep(random.uniform(0.2, 1.0))
         
         return features
     
@@ -87,7 +87,7 @@ class AITrafficGenerator:
         for _ in range(int(features[0] / 10)):
             url = random.choice(suspicious_urls)
             self._make_request(url, suspicious=True)
-            time.sleep(random.uniform(0.01, 0.1))
+            self.clock.sleep(random.uniform(0.01, 0.1))
         
         return features
     
@@ -123,8 +123,8 @@ class AITrafficGenerator:
             return None
     
     def adapt_pattern(self):
-        current_hour = datetime.now().hour
-        current_weekday = datetime.now().weekday()
+        current_hour = self.clock.now().hour
+        current_weekday = self.clock.now().weekday()
         
         if current_weekday >= 5:
             new_pattern = 'weekend'
@@ -153,7 +153,7 @@ class AITrafficGenerator:
         while self.running:
             self.adapt_pattern()
             self.traffic_patterns[self.current_pattern]()
-            time.sleep(60)
+            self.clock.sleep(60)
     
     def start(self):
         self.running = True
@@ -0,0 +1,274 @@
+import struct
+import logging
+from datetime import datetime
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "compact"
+FORMAT_VERSION = 1
+TIMESTAMP_EXT = 1  # ext payload: int64 big-endian epoch milliseconds
+
+# Map keys sent as one-byte integers (index = code, at most 128). Append only:
+# clients receive the list when they opt in
+KEYS = (
+    'timestamp', 'ip', 'type', 'port', 'count', 'first_seen', 'last_seen', 'threat_level',
+    'total', 'attacks', 'action', 'severity', 'details', 'patterns', 'status', 'message',
+    'firewall', 'honeypot', 'traffic', 'ml_analysis', 'system', 'uptime', 'open_ports', 'ports',
+    'rotation_interval', 'rotation_count', 'port_history', 'attack_count', 'suspicious_ips',
+    'recent_attacks', 'total_attacks', 'attack_types', 'traffic_timeline', 'history',
+    'patterns_detected', 'features', 'backend', 'monitoring', 'topic', 'data', 'running',
+    'intensity', 'total_traffic', 'attack_traffic', 'normal_traffic', 'performance', 'threats',
+    'cpu', 'memory', 'rss_mb', 'threads', 'event_rates', 'network', 'last_applied', 'path',
+    'method', 'user_agent', 'source', 'sources', 'anomalous_sources', 'pattern', 'forecast',
+    'trained_at', 'saved_at'
+)
+KEY_CODES = {key: code for code, key in enumerate(KEYS)}
+# String values under these keys are datetime.isoformat() output; all of them are in KEYS
+TIMESTAMP_KEYS = frozenset(('timestamp', 'first_seen', 'last_seen', 'last_applied', 'trained_at', 'saved_at'))
+
+_pack_byte = struct.Struct('>B').pack
+_pack_uint16 = struct.Struct('>BH').pack
+_pack_uint32 = struct.Struct('>BI').pack
+_pack_uint64 = struct.Struct('>BQ').pack
+_pack_int8 = struct.Struct('>Bb').pack
+_pack_int16 = struct.Struct('>Bh').pack
+_pack_int32 = struct.Struct('>Bi').pack
+_pack_int64 = struct.Struct('>Bq').pack
+_pack_double = struct.Struct('>Bd').pack
+_pack_timestamp = struct.Struct('>BBq').pack  # fixext 8 header, type, value
+
+
+def epoch_millis(value):
+    """isoformat() string -> epoch milliseconds, None if it does not parse"""
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return None
+
+
+def _pack_int(value, out):
+    if value >= 0:
+        if value < 0x80:
+            out.append(_pack_byte(value))
+        elif value <= 0xffff:
+            out.append(_pack_uint16(0xcd, value))
+        elif value <= 0xffffffff:
+            out.append(_pack_uint32(0xce, value))
+        elif value <= 0xffffffffffffffff:
+            out.append(_pack_uint64(0xcf, value))
+        else:
+            _pack_str(str(value), out)
+    elif -32 <= value:
+        out.append(_pack_byte(value & 0xff))
+    elif -0x80 <= value:
+        out.append(_pack_int8(0xd0, value))
+    elif -0x8000 <= value:
+        out.append(_pack_int16(0xd1, value))
+    elif -0x80000000 <= value:
+        out.append(_pack_int32(0xd2, value))
+    elif -0x8000000000000000 <= value:
+        out.append(_pack_int64(0xd3, value))
+    else:
+        _pack_str(str(value), out)
+
+
+def _pack_str(value, out):
+    data = value.encode('utf-8')
+    size = len(data)
+    if size < 32:
+        out.append(_pack_byte(0xa0 | size))
+    elif size <= 0xff:
+        out.append(b'\xd9' + _pack_byte(size))
+    elif size <= 0xffff:
+        out.append(_pack_uint16(0xda, size))
+    else:
+        out.append(_pack_uint32(0xdb, size))
+    out.append(data)
+
+
+def _pack_header(size, fix, fix_limit, code16, out):
+    if size < fix_limit:
+        out.append(_pack_byte(fix | size))
+    elif size <= 0xffff:
+        out.append(_pack_uint16(code16, size))
+    else:
+        out.append(_pack_uint32(code16 + 1, size))
+
+
+_FIXINTS = [bytes((i,)) for i in range(0x80)]
+_STRING_CACHE = {}  # short str -> encoded bytes; attack types, IPs and details repeat a lot
+_STRING_CACHE_SIZE = 4096
+
+
+def _encoded_str(value):
+    data = _STRING_CACHE.get(value)
+    if data is None:
+        out = []
+        _pack_str(value, out)
+        data = b''.join(out)
+        if len(value) <= 64:
+            if len(_STRING_CACHE) >= _STRING_CACHE_SIZE:
+                _STRING_CACHE.clear()
+            _STRING_CACHE[value] = data
+    return data
+
+
+def _pack(value, out):
+    """Append the MessagePack encoding of `value`, keys and timestamps substituted"""
+    kind = type(value)
+    if kind is str:
+        out.append(_encoded_str(value))
+    elif kind is int:
+        if 0 <= value < 0x80:
+            out.append(_FIXINTS[value])
+        else:
+            _pack_int(value, out)
+    elif kind is float:
+        out.append(_pack_double(0xcb, value))
+    elif kind is dict:
+        _pack_header(len(value), 0x80, 16, 0xde, out)
+        for key, item in value.items():
+            code = KEY_CODES.get(key)
+            if code is not None:
+                out.append(_FIXINTS[code])
+                if key in TIMESTAMP_KEYS and type(item) is str:
+                    millis = epoch_millis(item)
+                    if millis is not None:
+                        out.append(_pack_timestamp(0xd7, TIMESTAMP_EXT, millis))
+                        continue
+            else:
+                out.append(_encoded_str(key if type(key) is str else str(key)))
+            _pack(item, out)
+    elif kind is list or kind is tuple:
+        _pack_header(len(value), 0x90, 16, 0xdc, out)
+        for item in value:
+            _pack(item, out)
+    elif value is None:
+        out.append(b'\xc0')
+    elif value is True:
+        out.append(b'\xc3')
+    elif value is False:
+        out.append(b'\xc2')
+    elif isinstance(value, int):
+        _pack_int(int(value), out)
+    elif isinstance(value, float):
+        out.append(_pack_double(0xcb, value))
+    elif isinstance(value, str):
+        _pack(str(value), out)
+    elif isinstance(value, dict):
+        _pack(dict(value), out)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        _pack(list(value), out)
+    elif isinstance(value, (bytes, bytearray)):
+        size = len(value)
+        out.append(b'\xc4' + _pack_byte(size) if size <= 0xff else _pack_uint32(0xc6, size))
+        out.append(bytes(value))
+    elif hasattr(value, 'item'):
+        _pack(value.item(), out)  # numpy scalar
+    else:
+        _pack(str(value), out)
+
+
+def _compact(value):
+    """The same substitutions as _pack, producing objects for msgpack.packb"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            code = KEY_CODES.get(key)
+            if key in TIMESTAMP_KEYS and isinstance(item, str):
+                millis = epoch_millis(item)
+                if millis is not None:
+                    result[key if code is None else code] = msgpack.ExtType(TIMESTAMP_EXT, struct.pack('>q', millis))
+                    continue
+            result[(key if isinstance(key, str) else str(key)) if code is None else code] = _compact(item)
+        return result
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [_compact(item) for item in value]
+    return value
+
+
+def _default(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def encode(payload):
+    """Compact binary frame for `payload`: MessagePack with dictionary keys and epoch timestamps"""
+    if msgpack is not None:
+        return msgpack.packb(_compact(payload), default=_default, use_bin_type=True)
+    out = []
+    _pack(payload, out)
+    return b''.join(out)
+
+
+def _read(fmt, frame, pos):
+    size = struct.calcsize(fmt)
+    return struct.unpack_from(fmt, frame, pos)[0], pos + size
+
+
+def _unpack(frame, pos, keys):
+    code = frame[pos]
+    pos += 1
+    if code < 0x80:
+        return code, pos
+    if code >= 0xe0:
+        return code - 0x100, pos
+    if 0xa0 <= code <= 0xbf or code in (0xd9, 0xda, 0xdb):
+        if code <= 0xbf:
+            size = code & 0x1f
+        else:
+            size, pos = _read({0xd9: '>B', 0xda: '>H', 0xdb: '>I'}[code], frame, pos)
+        return frame[pos:pos + size].decode('utf-8'), pos + size
+    if 0x80 <= code <= 0x8f or code in (0xde, 0xdf):
+        size, pos = (code & 0x0f, pos) if code <= 0x8f else _read('>H' if code == 0xde else '>I', frame, pos)
+        result = {}
+        for _ in range(size):
+            key, pos = _unpack(frame, pos, keys)
+            if isinstance(key, int) and 0 <= key < len(keys):
+                key = keys[key]
+            result[key], pos = _unpack(frame, pos, keys)
+        return result, pos
+    if 0x90 <= code <= 0x9f or code in (0xdc, 0xdd):
+        size, pos = (code & 0x0f, pos) if code <= 0x9f else _read('>H' if code == 0xdc else '>I', frame, pos)
+        result = []
+        for _ in range(size):
+            item, pos = _unpack(frame, pos, keys)
+            result.append(item)
+        return result, pos
+    if code == 0xc0:
+        return None, pos
+    if code in (0xc2, 0xc3):
+        return code == 0xc3, pos
+    if code == 0xd7 and frame[pos] == TIMESTAMP_EXT:
+        millis, pos = _read('>q', frame, pos + 1)
+        return datetime.fromtimestamp(millis / 1000.0).isoformat(), pos
+    if code in (0xc4, 0xc6):
+        size, pos = _read('>B' if code == 0xc4 else '>I', frame, pos)
+        return bytes(frame[pos:pos + size]), pos + size
+    formats = {0xca: '>f', 0xcb: '>d', 0xcc: '>B', 0xcd: '>H', 0xce: '>I', 0xcf: '>Q',
+               0xd0: '>b', 0xd1: '>h', 0xd2: '>i', 0xd3: '>q'}
+    if code in formats:
+        return _read(formats[code], frame, pos)
+    raise ValueError(f"Unsupported wire format code 0x{code:02x} at offset {pos - 1}")
+
+
+def decode(frame, keys=KEYS):
+    """Inverse of encode(); timestamps come back as local isoformat() strings"""
+    value, _ = _unpack(memoryview(frame).cast('B') if not isinstance(frame, bytes) else frame, 0, keys)
+    return value
+
+
+def describe():
+    """What a client needs to decode frames, sent when it opts in"""
+    return {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "keys": list(KEYS),
+        "timestamp_ext": TIMESTAMP_EXT
+    }